@@ -5,6 +5,8 @@ import time
 from datetime import datetime
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from config import MetricsConfig
+from framing import LineFramer
 
 # Configurações do servidor
 HOST = '127.0.0.1'
@@ -17,6 +19,11 @@ INIT_COMMAND = 'OPENFAST'
 # Separador de campos
 FIELD_SEPARATOR = '\001'
 
+# Grupos de corretoras da configuração compartilhada com a aplicação principal
+GRUPOS = MetricsConfig().groups
+CORRETORAS_VAREJO = frozenset(GRUPOS['varejo'])
+CORRETORAS_AGRESSIVO = frozenset(GRUPOS['agressivo'])
+
 # Dicionário para armazenar as corretoras e seus dados
 brokers_data = {}
 
@@ -64,14 +71,11 @@ def calcular_valor_financeiro(net_saldo, ultimo_preco):
 
 # Função para atualizar a interface gráfica
 def update_gui():
-    global sock, buffer, net_saldo_passivo_liquido, financeiro_history, ultimo_preco_winj25, net_saldo_passivo_varejo, net_saldo_agressivo_varejo
+    global sock, net_saldo_passivo_liquido, financeiro_history, ultimo_preco_winj25, net_saldo_passivo_varejo, net_saldo_agressivo_varejo
     try:
-        data = sock.recv(BUFFER_SIZE).decode(ENCODING)
-        if data:
-            buffer += data
-
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)  
+        received = framer.recv_into(sock)
+        if received:
+            for line in framer.lines():
                 print(f'Dados recebidos: {line}')
 
                 if line.startswith('BRKSLD'):
@@ -98,8 +102,8 @@ def update_gui():
                         ultimo_preco_winj25 = fields[3]
 
             net_saldo_passivo_liquido = sum(float(row[7]) for row in brokers_data.values())
-            net_saldo_passivo_varejo = sum(float(row[7]) for row in brokers_data.values() if row[1] in ['XP', 'BTG', 'CLEAR', 'CM CAPITAL', 'TORO', 'GENIAL'])
-            net_saldo_agressivo_varejo = sum(float(row[6]) for row in brokers_data.values() if row[1] in ['XP', 'BTG', 'CLEAR', 'CM CAPITAL', 'TORO', 'GENIAL'])
+            net_saldo_passivo_varejo = sum(float(row[7]) for row in brokers_data.values() if row[1] in CORRETORAS_VAREJO)
+            net_saldo_agressivo_varejo = sum(float(row[6]) for row in brokers_data.values() if row[1] in CORRETORAS_AGRESSIVO)
             valor_financeiro = calcular_valor_financeiro(net_saldo_passivo_liquido, ultimo_preco_winj25)
 
             financeiro_history.append((datetime.now(), valor_financeiro))
@@ -111,6 +115,7 @@ def update_gui():
         sock.close()
         time.sleep(5)
         sock = create_socket_connection(HOST, PORT)
+        framer.clear()
     finally:
         root.after(500, update_gui)
 
@@ -198,7 +203,7 @@ last_price_response = request_last_price(sock, asset)
 print(f'Resposta do último preço: {last_price_response}')
 
 # Inicializa o buffer de dados
-buffer = ""
+framer = LineFramer(capacity=BUFFER_SIZE * 4, encoding=ENCODING, min_free=BUFFER_SIZE)
 
 # Iniciar a atualização da interface
 update_gui()
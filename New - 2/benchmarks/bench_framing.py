@@ -0,0 +1,98 @@
+"""Microbenchmark do enquadramento de linhas do fluxo OpenFast.
+
+Compara o laço antigo (decode + str.split('\\n', 1)) com o LineFramer
+sobre rajadas de linhas BRKSLD entregues em blocos do tamanho do recv.
+
+Uso: python benchmarks/bench_framing.py [--lines 10000 20000 50000]
+"""
+import argparse
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from framing import LineFramer  # noqa: E402
+
+SEP = '\001'
+CHUNK = 65536
+
+
+def make_burst(n_lines: int) -> bytes:
+    """Gera uma rajada com n_lines linhas BRKSLD de 26 campos"""
+    lines = []
+    for i in range(n_lines):
+        code = str(i % 400)
+        fields = ['BRKSLD', 'WINJ25', '0', code, f'CORRETORA {code}', str(1000 + i), '',
+                  '128345.50', str(500 + i), str(300 + i)] + ['0'] * 5 + [str(i * 7), str(i * 3)] + ['0'] * 9
+        lines.append(SEP.join(fields))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def chunks(data: bytes, size: int = CHUNK):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def bench_split(data: bytes) -> int:
+    """Laço original de MarketConnection.process_data"""
+    buffer = ""
+    count = 0
+    for chunk in chunks(data):
+        buffer += chunk.decode('utf-8')
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            count += 1
+    return count
+
+
+def bench_framer(data: bytes) -> int:
+    framer = LineFramer()
+    count = 0
+    for chunk in chunks(data):
+        framer.feed(chunk)
+        for _ in framer.lines():
+            count += 1
+    return count
+
+
+def bench_framer_socket(data: bytes) -> int:
+    """LineFramer lendo de um socketpair com recv_into"""
+    reader, writer = socket.socketpair()
+    sender = threading.Thread(target=lambda: (writer.sendall(data), writer.close()))
+    sender.start()
+    framer = LineFramer()
+    count = 0
+    while framer.recv_into(reader):
+        for _ in framer.lines():
+            count += 1
+    sender.join()
+    reader.close()
+    return count
+
+
+def run(name: str, func, data: bytes, expected: int) -> None:
+    start = time.perf_counter()
+    count = func(data)
+    elapsed = time.perf_counter() - start
+    assert count == expected, f"{name}: {count} linhas, esperado {expected}"
+    print(f"  {name:<16} {elapsed * 1000:9.1f} ms  {count / elapsed:14,.0f} linhas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[10000, 20000, 50000])
+    args = parser.parse_args()
+
+    for n_lines in args.lines:
+        data = make_burst(n_lines)
+        print(f"{n_lines:,} linhas BRKSLD ({len(data) / 1e6:.1f} MB)")
+        run('split (antigo)', bench_split, data, n_lines)
+        run('framer', bench_framer, data, n_lines)
+        run('framer+socket', bench_framer_socket, data, n_lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Compara o parser BRKSLD em lote com o parser linha a linha.
+
+Aplica a mesma rajada pelos dois caminhos de MarketConnection, confere que
+as tabelas de corretoras resultantes são idênticas (e que os totais
+incrementais batem com a varredura completa) e imprime linhas/s.
+
+Uso: python benchmarks/bench_parser.py [--lines 1000 10000 50000]
+"""
+import argparse
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_framing import make_burst  # noqa: E402
+from broker_store import NUMERIC_COLUMNS  # noqa: E402
+from config import ServerConfig  # noqa: E402
+from models import calcular_totais  # noqa: E402
+from network import MarketConnection  # noqa: E402
+
+
+def new_connection() -> MarketConnection:
+    connection = MarketConnection(ServerConfig(), autoconnect=False)
+    # Os logs de debug por linha dominariam a medição nos dois caminhos
+    connection.logger.setLevel(logging.INFO)
+    return connection
+
+
+def per_line(lines):
+    connection = new_connection()
+    for line in lines:
+        connection._process_line(line)
+    return connection
+
+
+def batch(lines):
+    connection = new_connection()
+    connection._process_brksld_block(lines)
+    return connection
+
+
+def check_equal(reference: MarketConnection, candidate: MarketConnection) -> None:
+    """Confere corretoras, nomes e todas as colunas numéricas (exceto o timestamp)"""
+    assert reference.assets.keys() == candidate.assets.keys()
+    for asset, state in reference.assets.items():
+        expected, actual = state.brokers, candidate.assets[asset].brokers
+        assert expected.codes == actual.codes, f"{asset}: códigos diferentes"
+        assert expected.names == actual.names, f"{asset}: nomes diferentes"
+        for column in NUMERIC_COLUMNS:
+            if column != 'timestamp':
+                assert getattr(expected, column) == getattr(actual, column), f"{asset}: coluna {column} diferente"
+        for connection in (reference, candidate):
+            totals = connection.assets[asset].aggregates.totals()
+            for key, value in calcular_totais(expected).items():
+                assert math.isclose(totals[key], value, abs_tol=1e-6), f"{asset}: total {key} diferente"
+
+
+def timed(func, lines):
+    start = time.perf_counter()
+    result = func(lines)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    for n_lines in args.lines:
+        lines = make_burst(n_lines).decode('utf-8').splitlines()
+        reference, t_line = timed(per_line, lines)
+        candidate, t_batch = timed(batch, lines)
+        check_equal(reference, candidate)
+        print(f"{n_lines:,} linhas BRKSLD: resultados idênticos")
+        print(f"  linha a linha {t_line * 1000:9.1f} ms  {n_lines / t_line:12,.0f} linhas/s")
+        print(f"  em lote       {t_batch * 1000:9.1f} ms  {n_lines / t_batch:12,.0f} linhas/s")
+
+
+if __name__ == '__main__':
+    main()
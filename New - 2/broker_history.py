@@ -0,0 +1,187 @@
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from broker_store import NUMERIC_COLUMNS
+from utils.logger import setup_logger
+
+ITEM_SIZE = array('d').itemsize
+
+
+class RingBuffer:
+    """Buffer circular de capacidade fixa sobre um array('d') pré-alocado"""
+    __slots__ = ('data', 'capacity', 'head', 'size')
+
+    def __init__(self, capacity: int):
+        self.data = array('d', bytes(capacity * ITEM_SIZE))
+        self.capacity = capacity
+        self.head = 0  # Próxima posição de escrita
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, value: float) -> None:
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def _start(self) -> int:
+        return (self.head - self.size) % self.capacity
+
+    def at(self, index: int) -> float:
+        """Elemento na posição lógica (0 = mais antigo)"""
+        return self.data[(self._start() + index) % self.capacity]
+
+    def slice(self, start: int, stop: int) -> array:
+        """Cópia ordenada das posições lógicas [start, stop), no máximo duas fatias do array"""
+        stop = min(stop, self.size)
+        if start >= stop:
+            return array('d')
+        first = (self._start() + start) % self.capacity
+        last = first + (stop - start)
+        if last <= self.capacity:
+            return self.data[first:last]
+        return self.data[first:] + self.data[:last - self.capacity]
+
+
+class BrokerSeries:
+    """Histórico de uma corretora: timestamps (epoch) e um buffer por campo"""
+    __slots__ = ('timestamps', 'fields', 'last_update')
+
+    def __init__(self, capacity: int, fields: Sequence[str]):
+        self.timestamps = RingBuffer(capacity)
+        self.fields = {name: RingBuffer(capacity) for name in fields}
+        self.last_update = 0.0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def bisect(self, timestamp: float, right: bool = False) -> int:
+        """Primeira posição lógica com timestamp >= timestamp (> se right), por busca binária"""
+        low, high = 0, len(self.timestamps)
+        at = self.timestamps.at
+        while low < high:
+            middle = (low + high) // 2
+            value = at(middle)
+            if value < timestamp or (right and value == timestamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class BrokerHistory:
+    """Evolução por corretora dos campos do BrokerStore de um ativo.
+
+    Cada corretora recebe, na primeira atualização, buffers circulares de
+    capacidade fixa para os timestamps e para cada campo acompanhado. O
+    orçamento de memória limita quantas corretoras cabem; ao estourá-lo, a
+    corretora atualizada há mais tempo é descartada. Corretoras sem
+    atualização há mais de idle_eviction segundos também são descartadas.
+    As leituras devolvem (timestamps, valores) prontos para o ChartPanel.
+    """
+
+    def __init__(self, fields: Sequence[str] = ('passive_net', 'net_aggr'),
+                 capacity: int = 3600, memory_budget: int = 64 << 20,
+                 idle_eviction: float = 1800.0):
+        unknown = set(fields) - set(NUMERIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"Campos desconhecidos no histórico por corretora: {sorted(unknown)}")
+        self.logger = setup_logger('ABDM.BrokerHistory')
+        self.field_names = tuple(fields)
+        self.capacity = capacity
+        self.idle_eviction = idle_eviction
+        self.bytes_per_broker = capacity * ITEM_SIZE * (1 + len(self.field_names))
+        self.max_brokers = max(1, memory_budget // self.bytes_per_broker)
+        # Ordem de atualização: a primeira entrada é a menos recente
+        self.series: 'OrderedDict[str, BrokerSeries]' = OrderedDict()
+        self.evicted = 0
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    @property
+    def memory_used(self) -> int:
+        return len(self.series) * self.bytes_per_broker
+
+    def record(self, store, row: int, timestamp: float) -> None:
+        """Acrescenta o estado atual da linha do BrokerStore ao histórico da corretora"""
+        code = store.codes[row]
+        with self._lock:
+            series = self.series.get(code)
+            if series is None:
+                if len(self.series) >= self.max_brokers:
+                    self._evict_oldest()
+                series = self.series[code] = BrokerSeries(self.capacity, self.field_names)
+            else:
+                self.series.move_to_end(code)
+            series.timestamps.append(timestamp)
+            for name, buffer in series.fields.items():
+                buffer.append(getattr(store, name)[row])
+            series.last_update = timestamp
+            if timestamp >= self._next_sweep:
+                self._evict_idle(timestamp)
+
+    def _evict_oldest(self) -> None:
+        code, _ = self.series.popitem(last=False)
+        self.evicted += 1
+        self.logger.debug(f"Histórico da corretora {code} descartado (orçamento de memória)")
+
+    def _evict_idle(self, now: float) -> None:
+        self._next_sweep = now + min(self.idle_eviction, 60.0)
+        limit = now - self.idle_eviction
+        while self.series:
+            code, series = next(iter(self.series.items()))
+            if series.last_update >= limit:
+                break
+            del self.series[code]
+            self.evicted += 1
+            self.logger.debug(f"Histórico da corretora {code} descartado (inativa)")
+
+    def codes(self) -> List[str]:
+        with self._lock:
+            return list(self.series)
+
+    def _result(self, series: BrokerSeries, field: str, start: int,
+                stop: int) -> Tuple[List[datetime], List[float]]:
+        values = series.fields.get(field)
+        if values is None:
+            raise KeyError(f"Campo '{field}' não é acompanhado no histórico por corretora")
+        # Em UTC, como os do HistoricalData; o ChartPanel converte para o fuso local
+        timestamps = [datetime.fromtimestamp(ts, timezone.utc) for ts in series.timestamps.slice(start, stop)]
+        return timestamps, values.slice(start, stop).tolist()
+
+    def last(self, code: str, field: str, n: int) -> Tuple[List[datetime], List[float]]:
+        """Últimos n pontos de um campo da corretora"""
+        with self._lock:
+            series = self.series.get(code)
+            if series is None:
+                return [], []
+            size = len(series)
+            return self._result(series, field, max(0, size - n), size)
+
+    def range(self, code: str, field: str, start: Optional[datetime] = None,
+              end: Optional[datetime] = None) -> Tuple[List[datetime], List[float]]:
+        """Pontos de um campo da corretora com start <= timestamp <= end"""
+        with self._lock:
+            series = self.series.get(code)
+            if series is None:
+                return [], []
+            first = series.bisect(start.timestamp()) if start is not None else 0
+            stop = series.bisect(end.timestamp(), right=True) if end is not None else len(series)
+            return self._result(series, field, first, stop)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'brokers': len(self.series),
+                'max_brokers': self.max_brokers,
+                'memory_mb': self.memory_used / 1e6,
+                'evicted': self.evicted,
+            }
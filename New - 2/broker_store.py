@@ -0,0 +1,199 @@
+import sys
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+# Colunas numéricas, convertidas uma única vez na entrada do dado
+NUMERIC_COLUMNS = (
+    'timestamp', 'volume', 'avg_price', 'aggr_buy', 'aggr_sell',
+    'net_aggr', 'passive_net', 'gross_pl',
+)
+
+
+class BrokerStore:
+    """Tabela colunar de corretoras de um ativo.
+
+    Cada corretora ocupa uma linha fixa, localizada pelo código (internado)
+    da corretora. Os campos numéricos ficam em arrays tipados ('d'), então
+    memória e custo por atualização não dependem de quantas corretoras há.
+    """
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.codes: List[str] = []
+        self.names: List[str] = []
+        self.stale = bytearray()
+        self.timestamp = array('d')  # Epoch em segundos da última atualização
+        self.volume = array('d')
+        self.avg_price = array('d')
+        self.aggr_buy = array('d')
+        self.aggr_sell = array('d')
+        self.net_aggr = array('d')
+        self.passive_net = array('d')
+        self.gross_pl = array('d')
+        self.last_timestamp = 0.0
+        # Motor de agregados incremental (models.AggregateEngine), se anexado
+        self.aggregates = None
+        # Histórico por corretora (broker_history.BrokerHistory), opcional
+        self.history = None
+        # Registro durável das atualizações (tick_store.TickRecorder), opcional
+        self.ticks = None
+        # Linhas alteradas desde a última publicação (consumido por quem publica)
+        self.changed_rows = set()
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def __iter__(self) -> Iterator['BrokerData']:
+        from models import BrokerData
+        for row in range(len(self.codes)):
+            yield BrokerData(self, row)
+
+    def row_for(self, code: str, name: str = '') -> int:
+        """Retorna a linha da corretora, alocando uma nova na primeira aparição"""
+        row = self.index.get(code)
+        if row is None:
+            code = sys.intern(code)
+            row = len(self.codes)
+            self.index[code] = row
+            self.codes.append(code)
+            self.names.append(sys.intern(name))
+            self.stale.append(0)
+            for column in NUMERIC_COLUMNS:
+                getattr(self, column).append(0.0)
+            if self.aggregates is not None:
+                self.aggregates.row_added(row)
+        return row
+
+    def update(self, code: str, name: str, volume: float, avg_price: float,
+               aggr_buy: float, aggr_sell: float, passive_net: float,
+               gross_pl: float, timestamp: Optional[float] = None) -> int:
+        """Grava os valores já convertidos de uma corretora e retorna sua linha"""
+        row = self.row_for(code, name)
+        aggregates = self.aggregates
+        if aggregates is not None:
+            aggregates.remove(row)
+        if self.names[row] != name:
+            self.names[row] = sys.intern(name)
+            if aggregates is not None:
+                aggregates.row_renamed(row)
+        if timestamp is None:
+            timestamp = time.time()
+        self.timestamp[row] = timestamp
+        self.last_timestamp = timestamp
+        self.volume[row] = volume
+        self.avg_price[row] = avg_price
+        self.aggr_buy[row] = aggr_buy
+        self.aggr_sell[row] = aggr_sell
+        self.net_aggr[row] = aggr_buy - aggr_sell
+        self.passive_net[row] = passive_net
+        self.gross_pl[row] = gross_pl
+        self.stale[row] = 0
+        if aggregates is not None:
+            aggregates.add(row)
+        if self.history is not None:
+            self.history.record(self, row, timestamp)
+        if self.ticks is not None:
+            self.ticks.record(self, row, timestamp)
+        self.changed_rows.add(row)
+        return row
+
+    def apply_batch(self, batch, timestamp: Optional[float] = None) -> int:
+        """Aplica um BrksldBatch de uma vez e retorna quantas linhas mudaram.
+
+        Com histórico ou registro de ticks anexado, cada linha do lote é
+        aplicada e registrada na ordem (as atualizações intermediárias de uma
+        corretora também são guardadas); sem eles, só a última linha de cada
+        corretora altera o estado final, e as anteriores são puladas.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        index = self.index
+        row_for = self.row_for
+        names = self.names
+        volume, avg_price = self.volume, self.avg_price
+        aggr_buy, aggr_sell, net_aggr = self.aggr_buy, self.aggr_sell, self.net_aggr
+        passive_net, gross_pl = self.passive_net, self.gross_pl
+        stamp, stale = self.timestamp, self.stale
+        aggregates = self.aggregates
+        history = self.history
+        ticks = self.ticks
+        changed = set()
+        last = None
+        if history is None and ticks is None:
+            last = {code: i for i, code in enumerate(batch.codes)}
+        for i, code in enumerate(batch.codes):
+            if last is not None and last[code] != i:
+                if code not in index:
+                    # Aloca na primeira aparição: a ordem das linhas é a mesma do caminho linha a linha
+                    changed.add(row_for(code, batch.names[i]))
+                continue
+            name = batch.names[i]
+            row = index.get(code)
+            if row is None:
+                row = row_for(code, name)
+                changed.add(row)
+            buy = batch.aggr_buy[i]
+            sell = batch.aggr_sell[i]
+            values = (batch.volume[i], batch.avg_price[i], buy, sell,
+                      batch.passive_net[i], batch.gross_pl[i])
+            stamp[row] = timestamp
+            if not stale[row] and names[row] == name and values == (
+                    volume[row], avg_price[row], aggr_buy[row], aggr_sell[row],
+                    passive_net[row], gross_pl[row]):
+                continue
+
+            # Só linhas alteradas tocam os agregados: sai a contribuição antiga, entra a nova
+            changed.add(row)
+            if aggregates is not None:
+                aggregates.remove(row)
+            (volume[row], avg_price[row], aggr_buy[row], aggr_sell[row],
+             passive_net[row], gross_pl[row]) = values
+            net_aggr[row] = buy - sell
+            stale[row] = 0
+            if names[row] != name:
+                names[row] = sys.intern(name)
+                if aggregates is not None:
+                    aggregates.row_renamed(row)
+            if aggregates is not None:
+                aggregates.add(row)
+            if history is not None:
+                history.record(self, row, timestamp)
+            if ticks is not None:
+                ticks.record(self, row, timestamp)
+        if batch.codes:
+            self.last_timestamp = timestamp
+        self.changed_rows.update(changed)
+        return len(changed)
+
+    def get(self, code: str) -> Optional['BrokerData']:
+        from models import BrokerData
+        row = self.index.get(code)
+        return None if row is None else BrokerData(self, row)
+
+    def mark_stale(self) -> None:
+        """Marca todas as linhas como desatualizadas (ex.: queda de conexão)"""
+        self.stale[:] = b'\x01' * len(self.stale)
+        self.changed_rows.update(range(len(self.stale)))
+
+    def latest_timestamp(self) -> float:
+        return self.last_timestamp
+
+    def copy(self) -> 'BrokerStore':
+        """Cópia independente para snapshots (cópia de memória das colunas)"""
+        clone = BrokerStore.__new__(BrokerStore)
+        clone.index = dict(self.index)
+        clone.codes = list(self.codes)
+        clone.names = list(self.names)
+        clone.stale = bytearray(self.stale)
+        for column in NUMERIC_COLUMNS:
+            setattr(clone, column, array('d', getattr(self, column)))
+        clone.last_timestamp = self.last_timestamp
+        clone.aggregates = None
+        clone.history = None
+        clone.ticks = None
+        clone.changed_rows = set()
+        return clone
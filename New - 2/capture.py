@@ -0,0 +1,127 @@
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
+
+from utils.logger import setup_logger
+
+# Arquivo: MAGIC seguido de registros (t_recv_ns: uint64, tamanho: uint32, bytes).
+# Cada abertura do CaptureWriter começa uma sessão com um registro de tamanho
+# SESSION_MARK (t = relógio de parede em ns, sem bytes): os instantes
+# monotônicos de sessões diferentes não são comparáveis.
+MAGIC = b'ABDMCAP2'
+MAGICS = (b'ABDMCAP1', MAGIC)  # CAP1: sem marcas de sessão
+RECORD_HEADER = struct.Struct('<QI')
+SESSION_MARK = 0xFFFFFFFF
+
+
+class CaptureWriter:
+    """Grava cada bloco recebido do socket com o instante monotônico de recepção.
+
+    Um arquivo existente recebe uma nova sessão no fim (append).
+    """
+
+    def __init__(self, path: Union[str, Path], buffer_size: int = 1 << 20):
+        self.logger = setup_logger('ABDM.Capture')
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file: Optional[BinaryIO] = self.path.open('ab', buffering=buffer_size)
+        if is_new:
+            self._file.write(MAGIC)
+        self._file.write(RECORD_HEADER.pack(time.time_ns(), SESSION_MARK))
+        self.records = 0
+        self.bytes = 0
+        self.logger.info(f"Captura do feed gravando em {self.path}")
+
+    def write(self, data, timestamp_ns: Optional[int] = None) -> None:
+        """Acrescenta um bloco (bytes ou memoryview) ao arquivo"""
+        if self._file is None:
+            return
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        self._file.write(RECORD_HEADER.pack(timestamp_ns, len(data)))
+        self._file.write(data)
+        self.records += 1
+        self.bytes += len(data)
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.logger.info(f"Captura encerrada: {self.records} blocos, {self.bytes / 1e6:.1f} MB")
+
+
+def read_capture(path: Union[str, Path]) -> Iterator[Tuple[int, bytes]]:
+    """Lê os registros (t_recv_ns, bytes) de um arquivo de captura em ordem.
+
+    Os instantes de cada sessão são deslocados para continuar do último
+    bloco da sessão anterior, então a sequência é sempre crescente e a
+    reprodução emenda as sessões sem espera entre elas. Um instante que
+    volta no tempo sem marca de sessão (capturas CAP1 anexadas) também
+    começa uma nova sessão.
+    """
+    with Path(path).open('rb') as f:
+        if f.read(len(MAGIC)) not in MAGICS:
+            raise ValueError(f"{path} não é um arquivo de captura válido")
+        header_size = RECORD_HEADER.size
+        offset = 0
+        last_ns = None
+        new_session = False
+        while True:
+            header = f.read(header_size)
+            if len(header) < header_size:
+                return
+            timestamp_ns, size = RECORD_HEADER.unpack(header)
+            if size == SESSION_MARK:
+                new_session = True
+                continue
+            data = f.read(size)
+            if len(data) < size:
+                # Registro truncado (processo encerrado durante a gravação)
+                return
+            if last_ns is not None and (new_session or timestamp_ns + offset < last_ns):
+                offset = last_ns - timestamp_ns
+            new_session = False
+            last_ns = timestamp_ns + offset
+            yield last_ns, data
+
+
+class ReplaySource:
+    """Reproduz uma captura respeitando os intervalos originais divididos por speed.
+
+    speed=1 reproduz em tempo real, speed=N acelera N vezes e speed=0
+    entrega os blocos o mais rápido possível.
+    """
+
+    def __init__(self, path: Union[str, Path], speed: float = 1.0):
+        self.path = Path(path)
+        self.speed = speed
+        self.records = 0
+        self.bytes = 0
+
+    def chunks(self, stop_event: Optional[threading.Event] = None) -> Iterator[bytes]:
+        start_wall = time.monotonic()
+        first_ns = None
+        for timestamp_ns, data in read_capture(self.path):
+            if stop_event is not None and stop_event.is_set():
+                return
+            if self.speed > 0:
+                if first_ns is None:
+                    first_ns = timestamp_ns
+                target = start_wall + (timestamp_ns - first_ns) / 1e9 / self.speed
+                delay = target - time.monotonic()
+                if delay > 0:
+                    if stop_event is not None:
+                        if stop_event.wait(delay):
+                            return
+                    else:
+                        time.sleep(delay)
+            self.records += 1
+            self.bytes += len(data)
+            yield data
@@ -1,7 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, List, Optional
+import json
 import os
 
+# Corretoras consideradas no passivo do varejo
+CORRETORAS_VAREJO = ['GENIAL', 'CM CAPITAL', 'NOVA FUTURA', 'SAFRA',
+                     'TORO', 'INTER', 'UBS', 'GUIDE', 'CLEAR', 'IDEAL',
+                     'XP', 'BTG', 'AGORA']
+
+# Corretoras consideradas na agressão do varejo
+CORRETORAS_AGRESSIVO = ['GENIAL', 'CM CAPITAL', 'NOVA FUTURA', 'SAFRA',
+                        'TORO', 'INTER', 'CLEAR', 'XP', 'BTG', 'AGORA']
+
 @dataclass
 class ServerConfig:
     host: str = '127.0.0.1'
@@ -10,10 +21,128 @@ class ServerConfig:
     encoding: str = 'utf-8'
     init_command: str = 'OPENFAST'
     field_separator: str = '\001'
+    read_timeout: float = 0.5  # Timeout do recv na thread de leitura (segundos)
+    update_queue_size: int = 16  # Máximo de snapshots pendentes para a UI
+    max_publish_rate: float = 10.0  # Snapshots por segundo publicados para a UI (0 = sem limite)
+    connect_timeout: float = 5.0
+    command_timeout: float = 10.0  # Tempo máximo aguardando a resposta de um comando
+    capture_path: Optional[Path] = None  # Grava o feed bruto para reprodução posterior
+    reconnect_initial_delay: float = 0.5  # Primeira espera após uma queda (segundos)
+    reconnect_max_delay: float = 30.0  # Teto do backoff exponencial (segundos)
+    reconnect_jitter: float = 0.2  # Variação aleatória relativa aplicada à espera
+
+@dataclass
+class MetricConfig:
+    """Métrica exibida na tabela de resultados e, opcionalmente, em um gráfico.
+
+    Uma métrica de soma acumula uma coluna do BrokerStore sobre um grupo de
+    corretoras (grupo vazio = todas). Uma métrica derivada é a soma ponderada
+    de outras métricas, ex.: combine={'passive_varejo': 1, 'aggressive_varejo': 1}.
+    """
+    key: str
+    label: str  # Descrição na tabela de resultados
+    column: str = ''  # Coluna do BrokerStore somada (passive_net, net_aggr, volume...)
+    group: str = ''
+    combine: Dict[str, float] = field(default_factory=dict)
+    chart: str = ''  # Título do gráfico; vazio = apenas na tabela
+
+@dataclass
+class MetricsConfig:
+    """Grupos de corretoras e métricas calculadas a cada atualização"""
+    groups: Dict[str, List[str]] = field(default_factory=lambda: {
+        'varejo': list(CORRETORAS_VAREJO),
+        'agressivo': list(CORRETORAS_AGRESSIVO),
+    })
+    metrics: List[MetricConfig] = field(default_factory=lambda: [
+        MetricConfig('passive_liquido', 'Net/Saldo passivo líquido',
+                     column='passive_net', chart='Market Maker'),
+        MetricConfig('passive_varejo', 'Net/Saldo passivo Varejo', column='passive_net',
+                     group='varejo', chart='Provedor de Liquidez - Varejo'),
+        MetricConfig('aggressive_varejo', 'Net/Saldo Agressivo Varejo', column='net_aggr',
+                     group='agressivo', chart='Corporativo'),
+        MetricConfig('net_varejo', 'Net/Saldo Varejo',
+                     combine={'passive_varejo': 1.0, 'aggressive_varejo': 1.0},
+                     chart='Exposição Varejo'),
+    ])
+
+    @classmethod
+    def load(cls, path: Path) -> 'MetricsConfig':
+        """Lê grupos e métricas de um JSON no mesmo formato dos campos acima"""
+        with Path(path).open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        defaults = cls()
+        return cls(
+            groups=data.get('groups', defaults.groups),
+            metrics=[MetricConfig(**metric) for metric in data['metrics']]
+            if 'metrics' in data else defaults.metrics,
+        )
+
+@dataclass
+class BrokerHistoryConfig:
+    """Histórico opcional da evolução de cada corretora"""
+    enabled: bool = False
+    fields: List[str] = field(default_factory=lambda: ['passive_net', 'net_aggr'])
+    capacity: int = 3600  # Pontos guardados por corretora e campo
+    memory_budget_mb: float = 64.0  # Teto de memória por ativo
+    idle_eviction: float = 1800.0  # Descarta corretoras sem atualização há mais que isso (segundos)
+
+@dataclass
+class PersistenceConfig:
+    """Gravação do histórico em thread própria (write-behind)"""
+    queue_size: int = 10000  # Pontos aguardando gravação; acima disso são descartados
+    batch_size: int = 500  # Grava assim que o lote atinge esse tamanho
+    flush_interval: float = 1.0  # Grava ao menos a cada intervalo: perda máxima em uma queda (s)
+    durability: str = 'interval'  # none: sem fsync | interval: fsync por intervalo | fsync: a cada lote
+    stats_interval: float = 60.0  # Intervalo entre logs de fila e latência (segundos)
+
+@dataclass
+class TickStoreConfig:
+    """Registro opcional de cada atualização das corretoras em SQLite (tick_store.py)"""
+    enabled: bool = False
+    path: Path = Path('ticks.db')
+    queue_size: int = 200000  # Atualizações aguardando gravação; acima disso são descartadas
+    batch_size: int = 5000  # Linhas por executemany/transação
+    flush_interval: float = 1.0  # Grava ao menos a cada intervalo (segundos)
+    synchronous: str = 'NORMAL'  # PRAGMA synchronous em WAL: OFF, NORMAL ou FULL
+    stats_interval: float = 60.0  # Intervalo entre logs de fila e latência (segundos)
+
+@dataclass
+class HistoryConfig:
+    """Histórico das métricas: um arquivo por ativo, dia e camada de resolução"""
+    directory: Path = Path('history')  # history/<ATIVO>/<AAAA-MM-DD>.<camada>.hist
+    capacity: int = 28800  # Pontos mantidos em memória por camada (raw, 1s, 10s, 1m)
+    retention_days: int = 30  # Dias mantidos em disco; 0 mantém tudo
 
 @dataclass
 class AppConfig:
     update_interval: float = 0.5
-    asset: str = 'WINJ25'
+    asset: str = 'WINJ25'  # Ativo exibido ao abrir a aplicação
+    assets: List[str] = field(default_factory=lambda: ['WINJ25'])  # Ativos assinados na mesma conexão
     period: int = 0
     log_file: Path = Path('app.log')
+    metrics_file: Path = Path('metrics.json')  # Substitui os grupos/métricas padrão, se existir
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    broker_history: BrokerHistoryConfig = field(default_factory=BrokerHistoryConfig)
+    persistence: PersistenceConfig = field(default_factory=PersistenceConfig)
+    history: HistoryConfig = field(default_factory=HistoryConfig)
+    tick_store: TickStoreConfig = field(default_factory=TickStoreConfig)
+
+    def __post_init__(self):
+        if self.asset not in self.assets:
+            self.assets.insert(0, self.asset)
+        if self.metrics_file is not None and Path(self.metrics_file).exists():
+            self.metrics = MetricsConfig.load(self.metrics_file)
+
+@dataclass
+class SimulatorConfig:
+    host: str = '127.0.0.1'
+    port: int = 557
+    brokers: int = 60  # Corretoras simuladas por ativo
+    rate: float = 200.0  # Linhas BRKSLD por segundo por ativo
+    price_rate: float = 2.0  # Linhas SQT por segundo por ativo
+    speed: float = 1.0  # Multiplicador de taxa (10x, 100x a produção)
+    tick: float = 0.01  # Intervalo entre lotes de envio (segundos)
+    burst_every: float = 0.0  # Intervalo entre rajadas (0 desativa)
+    burst_size: int = 0  # Linhas por rajada (0 = uma linha por corretora)
+    start_price: float = 128000.0
+    seed: Optional[int] = None
@@ -0,0 +1,113 @@
+"""Redução das séries dos gráficos a poucos pontos por pixel, preservando extremos.
+
+O gráfico tem algumas centenas de pixels de largura; desenhar mais de um
+mínimo e um máximo por coluna de pixel não muda a imagem, só o custo.
+minmax_decimate() faz essa redução em O(n) e MinMaxPyramid guarda
+mínimos e máximos por blocos de 8, 64, 512... pontos, atualizados a cada
+ponto novo, para que intervalos longos sejam reduzidos lendo só os blocos.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+POINTS_PER_PIXEL = 2  # Mínimo e máximo por coluna de pixel
+PYRAMID_FACTOR = 8  # Pontos por bloco no primeiro nível; cada nível agrupa 8 blocos do anterior
+
+
+def minmax_decimate(x: np.ndarray, low: np.ndarray, high: Optional[np.ndarray], pixels: int,
+                    x_range: Optional[Tuple[float, float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduz (x, low..high) a um mínimo e um máximo por coluna de pixel.
+
+    high é o máximo de cada ponto quando a entrada já é um envelope (blocos
+    da pirâmide); para uma série simples, passe None. x deve estar em ordem.
+    NaN (lacunas) é ignorado pelo mínimo/máximo de cada coluna.
+    """
+    if high is None:
+        high = low
+    if len(x) <= pixels * POINTS_PER_PIXEL and low is high:
+        return x, low
+    first, last = x_range if x_range is not None else (x[0], x[-1])
+    edges = np.linspace(first, last, pixels + 1)[:-1].astype(x.dtype)
+    starts = np.unique(np.searchsorted(x, edges))
+    starts = starts[starts < len(x)]
+    with np.errstate(invalid='ignore'):
+        mins = np.fmin.reduceat(low, starts)
+        maxs = np.fmax.reduceat(high, starts)
+    out_x = np.repeat(x[starts], 2)
+    out_y = np.empty(len(out_x))
+    out_y[0::2] = mins
+    out_y[1::2] = maxs
+    return out_x, out_y
+
+
+class _Level:
+    """Nível da pirâmide: mínimo/máximo por bloco de `block` pontos (buffer circular por id do bloco)"""
+    __slots__ = ('block', 'size', 'ids', 'first_ts', 'mins', 'maxs')
+
+    def __init__(self, block: int, capacity: int, columns: int):
+        self.block = block
+        self.size = capacity // block + 2  # Blocos que cabem no buffer de pontos, mais as pontas
+        self.ids = np.full(self.size, -1, dtype=np.int64)
+        self.first_ts = np.zeros(self.size, dtype=np.int64)
+        self.mins = np.zeros((self.size, columns))
+        self.maxs = np.zeros((self.size, columns))
+
+
+class MinMaxPyramid:
+    """Mínimos e máximos por bloco, em vários níveis, de um buffer circular de pontos.
+
+    Os pontos são identificados pelo número de sequência (contagem desde o
+    início), então os blocos não mudam quando o buffer dá a volta. add()
+    atualiza só o bloco corrente de cada nível; um ponto que substitui o
+    último (balde em aberto de uma camada consolidada) só amplia o envelope
+    do bloco, o que ainda reflete valores que de fato ocorreram.
+    """
+
+    def __init__(self, capacity: int, columns: int, factor: int = PYRAMID_FACTOR):
+        self.levels: List[_Level] = []
+        block = factor
+        while block <= capacity:
+            self.levels.append(_Level(block, capacity, columns))
+            block *= factor
+
+    def add(self, sequence: int, timestamp_ns: int, row) -> None:
+        for level in self.levels:
+            block_id = sequence // level.block
+            slot = block_id % level.size
+            if level.ids[slot] != block_id:
+                level.ids[slot] = block_id
+                level.first_ts[slot] = timestamp_ns
+                level.mins[slot] = row
+                level.maxs[slot] = row
+            else:
+                np.fmin(level.mins[slot], row, out=level.mins[slot])
+                np.fmax(level.maxs[slot], row, out=level.maxs[slot])
+
+    def build(self, timestamps: np.ndarray, rows: np.ndarray) -> None:
+        """Reconstrói todos os níveis para os pontos dados (sequências 0..n-1)"""
+        count = len(timestamps)
+        for level in self.levels:
+            level.ids.fill(-1)
+            if not count:
+                continue
+            starts = np.arange(0, count, level.block)
+            block_ids = starts // level.block
+            slots = block_ids % level.size
+            level.ids[slots] = block_ids
+            level.first_ts[slots] = timestamps[starts]
+            with np.errstate(invalid='ignore'):
+                level.mins[slots] = np.fmin.reduceat(rows, starts, axis=0)
+                level.maxs[slots] = np.fmax.reduceat(rows, starts, axis=0)
+
+    def blocks(self, first: int, stop: int, pixels: int, column: int):
+        """Blocos inteiros dentro das sequências [first, stop), no nível mais grosso com ao menos
+        `pixels` blocos: (primeira sequência, fim, timestamps, mínimos, máximos), ou None"""
+        for level in reversed(self.levels):
+            first_block = -(-first // level.block)
+            stop_block = stop // level.block
+            if stop_block - first_block < pixels:
+                continue
+            slots = np.arange(first_block, stop_block) % level.size
+            return (first_block * level.block, stop_block * level.block,
+                    level.first_ts[slots], level.mins[slots, column], level.maxs[slots, column])
+        return None
@@ -0,0 +1,216 @@
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional, Type
+
+from models import AssetSnapshot, MarketSnapshot
+from utils.logger import setup_logger
+
+logger = setup_logger('ABDM.Events')
+
+
+@dataclass(frozen=True)
+class Event:
+    """Base dos eventos publicados no barramento"""
+    asset: Optional[str]
+
+    def merge_key(self):
+        """Eventos com a mesma chave podem ser consolidados em uma fila"""
+        return type(self), self.asset
+
+    def merge(self, newer: 'Event') -> 'Event':
+        """Combina um evento pendente com um mais novo de mesma chave"""
+        return newer
+
+
+@dataclass(frozen=True)
+class BrokersChanged(Event):
+    """Linhas de corretoras alteradas (códigos) desde o último snapshot"""
+    snapshot: AssetSnapshot = field(repr=False, compare=False, default=None)
+    codes: FrozenSet[str] = frozenset()
+
+    def merge(self, newer: 'BrokersChanged') -> 'BrokersChanged':
+        return BrokersChanged(newer.asset, newer.snapshot, self.codes | newer.codes)
+
+
+@dataclass(frozen=True)
+class TotalsChanged(Event):
+    """Base de PriceChanged e AggregatesChanged (tabela de resultado e histórico).
+
+    Os dois compartilham a chave de consolidação: quem assina TotalsChanged
+    recebe uma única entrega por ativo em cada drain(), mesmo quando o
+    snapshot mudou preço e totais.
+    """
+    snapshot: AssetSnapshot = field(repr=False, compare=False, default=None)
+
+    def merge_key(self):
+        return TotalsChanged, self.asset
+
+
+@dataclass(frozen=True)
+class PriceChanged(TotalsChanged):
+    price: Optional[float] = None
+    previous: Optional[float] = None
+
+    def merge(self, newer: TotalsChanged) -> TotalsChanged:
+        if not isinstance(newer, PriceChanged):
+            return newer
+        return PriceChanged(newer.asset, newer.snapshot, newer.price, self.previous)
+
+
+@dataclass(frozen=True)
+class AggregatesChanged(TotalsChanged):
+    """Totais do MetricRegistry recalculados com valores diferentes dos anteriores"""
+    totals: Dict[str, float] = field(default_factory=dict, compare=False)
+
+
+@dataclass(frozen=True)
+class ConnectionStateChanged(Event):
+    state: str = ''
+    previous: Optional[str] = None
+
+    def merge(self, newer: 'ConnectionStateChanged') -> 'ConnectionStateChanged':
+        return ConnectionStateChanged(newer.asset, newer.state, self.previous)
+
+
+Handler = Callable[[Event], None]
+
+
+def _call(handler: Handler, event: Event) -> None:
+    try:
+        handler(event)
+    except Exception as e:
+        logger.error(f"Erro no assinante {getattr(handler, '__qualname__', handler)} "
+                     f"de {type(event).__name__}: {e}", exc_info=True)
+
+
+class QueuedDispatcher:
+    """Fila limitada de entregas, esvaziada por drain() na thread consumidora.
+
+    Políticas quando a mesma entrega (assinante + chave do evento) já está
+    pendente ou a fila está cheia:
+    - 'merge': consolida com o evento pendente de mesma chave; se cheia, descarta o mais antigo
+    - 'drop_oldest': descarta o evento pendente mais antigo
+    - 'drop_newest': descarta o evento que está chegando
+    """
+    POLICIES = ('merge', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, maxsize: int = 1024, policy: str = 'merge'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política desconhecida: {policy} (use {', '.join(self.POLICIES)})")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._lock = threading.Lock()
+        if policy == 'merge':
+            self._pending: 'OrderedDict' = OrderedDict()
+        else:
+            self._pending = deque()
+        self.delivered = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, handler: Handler, event: Event) -> None:
+        with self._lock:
+            if self.policy == 'merge':
+                key = (handler, event.merge_key())
+                pending = self._pending.get(key)
+                if pending is not None:
+                    self._pending[key] = pending.merge(event)
+                    self.merged += 1
+                    return
+                if len(self._pending) >= self.maxsize:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+                self._pending[key] = event
+            else:
+                if len(self._pending) >= self.maxsize:
+                    self.dropped += 1
+                    if self.policy == 'drop_newest':
+                        return
+                    self._pending.popleft()
+                self._pending.append((handler, event))
+
+    def drain(self, max_items: Optional[int] = None) -> int:
+        """Entrega os eventos pendentes na thread atual e retorna quantos foram entregues"""
+        with self._lock:
+            if self.policy == 'merge':
+                items = [(handler, event) for (handler, _), event in self._pending.items()]
+            else:
+                items = list(self._pending)
+            if max_items is not None:
+                items = items[:max_items]
+            for _ in range(len(items)):
+                if self.policy == 'merge':
+                    self._pending.popitem(last=False)
+                else:
+                    self._pending.popleft()
+        for handler, event in items:
+            _call(handler, event)
+        self.delivered += len(items)
+        return len(items)
+
+
+class EventBus:
+    """Barramento publish/subscribe em processo, com tópicos por tipo de evento.
+
+    Sem dispatcher, o assinante roda na thread de quem publica; com um
+    QueuedDispatcher, o evento é enfileirado e entregue quando a thread
+    consumidora (ex.: a do Tk) chamar drain().
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[Type[Event], List[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type: Type[Event], handler: Handler,
+                  dispatcher: Optional[QueuedDispatcher] = None) -> Callable[[], None]:
+        """Assina um tipo de evento (e seus subtipos); retorna a função que cancela a assinatura"""
+        entry = (handler, dispatcher)
+        with self._lock:
+            # Copia na escrita: publish itera sem trava
+            self._subscribers[event_type] = self._subscribers.get(event_type, []) + [entry]
+
+        def unsubscribe() -> None:
+            with self._lock:
+                entries = list(self._subscribers.get(event_type, []))
+                if entry in entries:
+                    entries.remove(entry)
+                    self._subscribers[event_type] = entries
+        return unsubscribe
+
+    def has_subscribers(self) -> bool:
+        return any(self._subscribers.values())
+
+    def publish(self, event: Event) -> None:
+        for event_type in type(event).__mro__:
+            for handler, dispatcher in self._subscribers.get(event_type, ()):
+                if dispatcher is None:
+                    _call(handler, event)
+                else:
+                    dispatcher.put(handler, event)
+            if event_type is Event:
+                break
+
+
+def snapshot_events(snapshot: MarketSnapshot, previous: Optional[MarketSnapshot]) -> List[Event]:
+    """Deriva os eventos de um snapshot comparando-o com o anterior"""
+    events: List[Event] = []
+    previous_state = previous.connection_state if previous is not None else None
+    if snapshot.connection_state != previous_state:
+        events.append(ConnectionStateChanged(None, snapshot.connection_state, previous_state))
+    for asset in sorted(snapshot.changed):
+        current = snapshot.assets.get(asset)
+        if current is None:
+            continue
+        before = previous.assets.get(asset) if previous is not None else None
+        if current.changed_codes:
+            events.append(BrokersChanged(asset, current, current.changed_codes))
+        old_price = before.market_data.ultimo_preco if before is not None else None
+        if before is None or current.market_data.ultimo_preco != old_price:
+            events.append(PriceChanged(asset, current, current.market_data.ultimo_preco, old_price))
+        if before is None or current.totals != before.totals:
+            events.append(AggregatesChanged(asset, current, current.totals))
+    return events
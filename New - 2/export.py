@@ -0,0 +1,257 @@
+"""Exporta o histórico das métricas e os ticks das corretoras para análise offline.
+
+Os dados são lidos em blocos por geradores e gravados à medida que chegam,
+então a memória não depende do tamanho do período exportado. Formatos:
+- csv: uma linha por ponto, com o horário local em ISO 8601
+- npy: um array estruturado (uma linha por ponto)
+- npz: colunar, um array por campo (np.load(...)['timestamp'] etc.)
+
+Uso:
+    python export.py history --asset WINJ25 --start 2026-03-20 --end 2026-03-21T18:00 -o winj25.npz
+    python export.py ticks --asset WINJ25 --db ticks.db --format csv -o ticks.csv
+"""
+import argparse
+import csv
+import sqlite3
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import HistoryConfig, TickStoreConfig
+from history_store import decode_records, partition_paths, segment_bounds, to_ns
+
+FORMATS = ('csv', 'npy', 'npz')
+CHUNK_RECORDS = 65536
+
+TICK_COLUMNS = ('ts', 'volume', 'avg_price', 'aggr_buy', 'aggr_sell', 'net_aggr', 'passive_net', 'gross_pl')
+
+
+@dataclass
+class ExportSource:
+    """Dados a exportar: dtype de cada linha, total de linhas e os blocos em ordem"""
+    dtype: np.dtype
+    count: int
+    chunks: Iterator[np.ndarray]
+    time_field: str  # Campo com o horário
+    time_scale: float  # Divisor para epoch em segundos (1e9 para ns)
+
+
+def history_source(directory: Path, asset: str, start_ns: Optional[int], end_ns: Optional[int],
+                   tier: str = 'raw', keys: Optional[Sequence[str]] = None,
+                   chunk_records: int = CHUNK_RECORDS) -> ExportSource:
+    """Pontos das partições do ativo no intervalo (limites achados por busca binária)"""
+    spans = []
+    latest_keys: List[str] = []
+    for path in partition_paths(Path(directory) / asset, tier, start_ns, end_ns):
+        with path.open('rb') as f:
+            file_keys, _, _, first, stop = segment_bounds(f, start_ns, end_ns)
+        if stop > first:
+            spans.append((path, first, stop))
+            latest_keys = file_keys  # As partições vêm em ordem: fica a mais recente com dados
+    if keys is None:
+        keys = latest_keys
+    keys = list(keys)
+    dtype = np.dtype([('timestamp', '<i8')] + [(key, '<f8') for key in keys])
+
+    def chunks() -> Iterator[np.ndarray]:
+        for path, first, stop in spans:
+            with path.open('rb') as f:
+                file_keys, data_offset, record, _, _ = segment_bounds(f)
+                position = first
+                f.seek(data_offset + first * record.size)
+                while position < stop:
+                    count = min(chunk_records, stop - position)
+                    timestamps, matrix = decode_records(f.read(count * record.size), file_keys, keys)
+                    out = np.empty(len(timestamps), dtype=dtype)
+                    out['timestamp'] = timestamps
+                    for column, key in enumerate(keys):
+                        out[key] = matrix[:, column]
+                    position += count
+                    yield out
+
+    return ExportSource(dtype, sum(stop - first for _, first, stop in spans), chunks(), 'timestamp', 1e9)
+
+
+def ticks_source(db_path: Path, asset: str, start: Optional[float], end: Optional[float],
+                 broker: Optional[str] = None, chunk_records: int = CHUNK_RECORDS) -> ExportSource:
+    """Ticks do registro SQLite, na ordem do índice (corretora, horário): sem ordenação em memória"""
+    where = "asset = ? AND ts BETWEEN ? AND ?"
+    params: List[object] = [asset, start if start is not None else float('-inf'),
+                            end if end is not None else float('inf')]
+    if broker is not None:
+        where += " AND broker = ?"
+        params.append(broker)
+    connection = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True, isolation_level=None)
+    # Contagem e leitura na mesma transação: em WAL, a gravação em curso não altera o que é exportado
+    connection.execute("BEGIN")
+    count, width = connection.execute(
+        f"SELECT COUNT(*), COALESCE(MAX(LENGTH(broker)), 1) FROM broker_ticks WHERE {where}", params
+    ).fetchone()
+    dtype = np.dtype([('broker', f'<U{width}')] + [(column, '<f8') for column in TICK_COLUMNS])
+
+    def chunks() -> Iterator[np.ndarray]:
+        try:
+            cursor = connection.execute(
+                f"SELECT broker, {', '.join(TICK_COLUMNS)} FROM broker_ticks WHERE {where} "
+                f"ORDER BY asset, broker, ts", params
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_records)
+                if not rows:
+                    break
+                yield np.array(rows, dtype=dtype)
+        finally:
+            connection.execute("COMMIT")
+            connection.close()
+
+    return ExportSource(dtype, count, chunks(), 'ts', 1.0)
+
+
+def write_csv(source: ExportSource, path: Path) -> int:
+    names = source.dtype.names
+    written = 0
+    with Path(path).open('w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('time',) + names)
+        fromtimestamp = datetime.fromtimestamp
+        for chunk in source.chunks:
+            times = [fromtimestamp(value / source.time_scale).isoformat()
+                     for value in chunk[source.time_field].tolist()]
+            writer.writerows(zip(times, *(chunk[name].tolist() for name in names)))
+            written += len(chunk)
+    return written
+
+
+def _npy_header(f, dtype: np.dtype, count: int) -> None:
+    # O total é conhecido antes da leitura, então o cabeçalho vai primeiro e os dados em fluxo
+    np.lib.format.write_array_header_2_0(f, {
+        'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,),
+    })
+
+
+def write_npy(source: ExportSource, path: Path) -> int:
+    written = 0
+    with Path(path).open('wb') as f:
+        _npy_header(f, source.dtype, source.count)
+        for chunk in source.chunks:
+            chunk = chunk[:source.count - written]
+            f.write(chunk.tobytes())
+            written += len(chunk)
+    if written != source.count:
+        raise RuntimeError(f"Esperadas {source.count} linhas, lidas {written}")
+    return written
+
+
+def write_npz(source: ExportSource, path: Path, compress: bool = False) -> int:
+    """Um .npy por campo em arquivos temporários (uma passada), depois reunidos no .npz"""
+    names = source.dtype.names
+    written = 0
+    with tempfile.TemporaryDirectory(dir=Path(path).resolve().parent) as tmp:
+        files = {}
+        try:
+            for name in names:
+                files[name] = (Path(tmp) / f'{name}.npy').open('wb')
+                _npy_header(files[name], source.dtype[name], source.count)
+            for chunk in source.chunks:
+                chunk = chunk[:source.count - written]
+                for name in names:
+                    files[name].write(np.ascontiguousarray(chunk[name]).tobytes())
+                written += len(chunk)
+        finally:
+            for f in files.values():
+                f.close()
+        if written != source.count:
+            raise RuntimeError(f"Esperadas {source.count} linhas, lidas {written}")
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(path, 'w', compression=compression, allowZip64=True) as archive:
+            for name in names:
+                archive.write(Path(tmp) / f'{name}.npy', f'{name}.npy')
+    return written
+
+
+def export(source: ExportSource, path: Path, fmt: str, compress: bool = False) -> int:
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt} (use {', '.join(FORMATS)})")
+    started = time.perf_counter()
+    if fmt == 'csv':
+        written = write_csv(source, path)
+    elif fmt == 'npy':
+        written = write_npy(source, path)
+    else:
+        written = write_npz(source, path, compress)
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    size = Path(path).stat().st_size
+    print(f"{written:,} linhas exportadas para {path}: {size / 1e6:.1f} MB em {elapsed:.2f} s "
+          f"({written / elapsed:,.0f} linhas/s, {size / 1e6 / elapsed:.1f} MB/s)")
+    return written
+
+
+def parse_start(value: str) -> datetime:
+    """Data (AAAA-MM-DD) ou data e hora em ISO 8601, no horário local"""
+    return datetime.fromisoformat(value)
+
+
+def parse_end(value: str) -> datetime:
+    """Como parse_start, mas uma data sem hora vai até o fim do dia"""
+    if len(value) == 10:
+        return datetime.combine(date.fromisoformat(value) + timedelta(days=1), datetime.min.time()) \
+            - timedelta(microseconds=1)
+    return datetime.fromisoformat(value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Exporta histórico e ticks para CSV, .npy ou .npz")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('history', "Métricas do histórico particionado"),
+                            ('ticks', "Atualizações das corretoras do registro SQLite")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--asset', required=True)
+        command.add_argument('--start', type=parse_start, help="Início (padrão: tudo)")
+        command.add_argument('--end', type=parse_end,
+                             help="Fim, inclusivo; uma data sem hora inclui o dia inteiro")
+        command.add_argument('--day', type=date.fromisoformat, help="Atalho para um único dia")
+        command.add_argument('--format', choices=FORMATS, help="Padrão: pela extensão da saída")
+        command.add_argument('--compress', action='store_true', help="Comprime o .npz")
+        command.add_argument('--chunk', type=int, default=CHUNK_RECORDS, help="Linhas por bloco")
+        command.add_argument('-o', '--output', type=Path, required=True)
+    history = commands.choices['history']
+    history.add_argument('--directory', type=Path, default=HistoryConfig().directory)
+    history.add_argument('--tier', default='raw', help="raw, 1s, 10s ou 1m")
+    history.add_argument('--keys', nargs='+', help="Métricas (padrão: as da partição mais recente)")
+    ticks = commands.choices['ticks']
+    ticks.add_argument('--db', type=Path, default=TickStoreConfig().path)
+    ticks.add_argument('--broker', help="Só uma corretora")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start, end = args.start, args.end
+    if args.day is not None:
+        start = parse_start(args.day.isoformat())
+        end = parse_end(args.day.isoformat())
+    fmt = args.format or args.output.suffix.lstrip('.').lower()
+    if fmt not in FORMATS:
+        raise SystemExit(f"Formato não reconhecido pela extensão de {args.output}; use --format")
+
+    if args.command == 'history':
+        source = history_source(args.directory, args.asset,
+                                to_ns(start) if start is not None else None,
+                                to_ns(end) if end is not None else None,
+                                args.tier, args.keys, args.chunk)
+    else:
+        source = ticks_source(args.db, args.asset,
+                              start.timestamp() if start is not None else None,
+                              end.timestamp() if end is not None else None,
+                              args.broker, args.chunk)
+    export(source, args.output, fmt, args.compress)
+
+
+if __name__ == '__main__':
+    main()
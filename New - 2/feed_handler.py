@@ -0,0 +1,74 @@
+"""Processo que concentra a conexão com o OpenFast e publica snapshots.
+
+Abre uma única MarketConnection, processa o feed uma vez e grava cada
+snapshot (corretoras, último preço e totais por ativo) em um anel de
+memória compartilhada. Qualquer número de UIs (main.py --shm NOME) ou
+processos de análise lê esse anel sem abrir socket nem reprocessar linhas.
+
+Uso: python feed_handler.py --assets WINJ25 WDOK25 --shm-name ABDM_FEED
+"""
+import argparse
+import signal
+import time
+
+from config import AppConfig, ServerConfig
+from network import MarketConnection
+from shm_ring import SnapshotRingWriter
+from utils.logger import setup_logger
+
+
+def parse_args():
+    defaults = AppConfig()
+    parser = argparse.ArgumentParser(description="Feed handler com fan-out em memória compartilhada")
+    parser.add_argument('--host', default=ServerConfig.host)
+    parser.add_argument('--port', type=int, default=ServerConfig.port)
+    parser.add_argument('--assets', nargs='+', default=defaults.assets)
+    parser.add_argument('--period', type=int, default=defaults.period)
+    parser.add_argument('--shm-name', default='ABDM_FEED')
+    parser.add_argument('--slots', type=int, default=8)
+    parser.add_argument('--slot-size', type=int, default=4 << 20, help="Bytes por slot")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger = setup_logger('ABDM.FeedHandler')
+    app_config = AppConfig()
+    # Antes da conexão: falha logo se outro feed handler já publica neste anel
+    ring = SnapshotRingWriter(args.shm_name, slots=args.slots, slot_size=args.slot_size)
+    market = MarketConnection(ServerConfig(host=args.host, port=args.port), metrics=app_config.metrics,
+                              tick_store=app_config.tick_store)
+
+    running = True
+
+    def stop(signum, frame):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for asset in args.assets:
+        market.subscribe(asset, args.period)
+    market.start_reader()
+
+    published = 0
+    last_report = time.monotonic()
+    try:
+        while running:
+            snapshot = market.get_snapshot(timeout=0.5)
+            if snapshot is not None and ring.publish(snapshot):
+                published += 1
+            now = time.monotonic()
+            if now - last_report >= 10:
+                logger.info(f"{published / (now - last_report):.1f} snapshots/s publicados (seq {ring.seq})")
+                published = 0
+                last_report = now
+    finally:
+        market.close()
+        ring.close()
+        logger.info("Feed handler encerrado")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import socket
+from typing import Iterator
+
+
+class LineFramer:
+    """Separa o fluxo OpenFast em linhas sem copiar o restante do buffer.
+
+    Os bytes ficam em um bytearray pré-alocado preenchido com recv_into.
+    A busca pelo delimitador continua de onde parou (offset de varredura),
+    apenas linhas completas são decodificadas e o buffer só é compactado
+    quando falta espaço livre no final.
+    """
+
+    def __init__(self, capacity: int = 262144, delimiter: bytes = b'\n',
+                 encoding: str = 'utf-8', min_free: int = 65536):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.min_free = min_free
+        self._buf = bytearray(max(capacity, min_free * 2))
+        self._view = memoryview(self._buf)
+        self._start = 0  # Início da primeira linha ainda não consumida
+        self._end = 0    # Fim dos dados válidos
+        self._scan = 0   # Posição a partir da qual o delimitador ainda não foi procurado
+
+    def __len__(self) -> int:
+        """Quantidade de bytes pendentes (linha parcial incluída)"""
+        return self._end - self._start
+
+    def clear(self) -> None:
+        """Descarta os dados pendentes, por exemplo após uma reconexão"""
+        self._start = self._end = self._scan = 0
+
+    def _reserve(self, nbytes: int) -> None:
+        """Garante pelo menos nbytes livres no final do buffer"""
+        if len(self._buf) - self._end >= nbytes:
+            return
+        pending = self._end - self._start
+        if self._start and len(self._buf) - pending >= nbytes:
+            # Compacta: move apenas a linha parcial para o início. Origem e destino
+            # podem se sobrepor, então a linha parcial passa por uma cópia em bytes
+            self._buf[:pending] = bytes(self._view[self._start:self._end])
+        else:
+            # Linha parcial maior que o buffer: dobra a capacidade
+            new_size = len(self._buf)
+            while new_size - pending < nbytes:
+                new_size *= 2
+            self._view.release()
+            new_buf = bytearray(new_size)
+            new_buf[:pending] = self._buf[self._start:self._end]
+            self._buf = new_buf
+            self._view = memoryview(self._buf)
+        self._scan -= self._start
+        self._start = 0
+        self._end = pending
+
+    def recv_into(self, sock: socket.socket, nbytes: int = 0) -> int:
+        """Lê do socket direto para o buffer; retorna 0 quando a conexão fecha"""
+        self._reserve(max(nbytes, self.min_free))
+        free = len(self._buf) - self._end
+        received = sock.recv_into(self._view[self._end:], min(nbytes, free) if nbytes else free)
+        self._end += received
+        return received
+
+    def tail(self, nbytes: int) -> memoryview:
+        """Visão (sem cópia) dos últimos nbytes recebidos, antes de serem consumidos"""
+        return self._view[self._end - nbytes:self._end]
+
+    def feed(self, data: bytes) -> None:
+        """Acrescenta bytes já recebidos por outra fonte (captura, simulador)"""
+        size = len(data)
+        self._reserve(size)
+        self._buf[self._end:self._end + size] = data
+        self._end += size
+
+    def lines(self) -> Iterator[str]:
+        """Gera as linhas completas disponíveis, já decodificadas e sem o delimitador"""
+        buf = self._buf
+        view = self._view
+        delimiter = self.delimiter
+        step = len(delimiter)
+        encoding = self.encoding
+        while True:
+            idx = buf.find(delimiter, self._scan, self._end)
+            if idx < 0:
+                # Um delimitador de vários bytes pode estar cortado no fim dos dados
+                self._scan = max(self._start, self._end - step + 1)
+                break
+            start = self._start
+            self._start = self._scan = idx + step
+            yield str(view[start:idx], encoding, 'replace')
+        if self._start == self._end:
+            # Buffer totalmente consumido: volta ao início sem copiar nada
+            self._start = self._end = self._scan = 0
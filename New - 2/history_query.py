@@ -0,0 +1,273 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from history_store import (TIERS, HistorySegment, decode_records, partition_paths, record_struct,
+                           segment_bounds, to_ns)
+from utils.logger import setup_logger
+
+RESAMPLE_METHODS = ('ohlc', 'last', 'mean')
+OHLC_FIELDS = ('open', 'high', 'low', 'close')  # Ordem das colunas do resultado 'ohlc'
+
+Instant = Union[datetime, int, None]  # datetime ou epoch em ns
+
+
+def _ns(value: Instant) -> Optional[int]:
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    return to_ns(value)
+
+
+def _interval_ns(interval: Union[float, timedelta]) -> int:
+    if isinstance(interval, timedelta):
+        interval = interval.total_seconds()
+    interval_ns = int(round(interval * 1e9))
+    if interval_ns <= 0:
+        raise ValueError(f"Intervalo de reamostragem inválido: {interval}")
+    return interval_ns
+
+
+@dataclass
+class Resampled:
+    """Série reamostrada em baldes de largura fixa alinhados ao epoch.
+
+    timestamps_ns traz o início de cada balde (grade completa, inclusive
+    baldes vazios). columns[key] tem uma linha por balde: um valor para
+    'last'/'mean' ou as quatro colunas de OHLC_FIELDS para 'ohlc'; baldes
+    vazios ficam NaN.
+    """
+    timestamps_ns: np.ndarray
+    columns: Dict[str, np.ndarray]
+    counts: np.ndarray  # Pontos da camada de origem em cada balde
+    how: str
+    tier: str
+
+    def __len__(self) -> int:
+        return len(self.timestamps_ns)
+
+    def times(self) -> np.ndarray:
+        return self.timestamps_ns.view('datetime64[ns]')
+
+
+class HistoryQuery:
+    """Consultas ao histórico particionado (history/<ativo>/<dia>.<camada>.hist).
+
+    Os registros têm largura fixa e estão em ordem de tempo, então o início
+    e o fim de um intervalo em cada partição são achados por busca binária
+    no arquivo e só o trecho pedido é lido. Os resultados ficam em um cache
+    LRU pequeno, invalidado quando algum arquivo envolvido cresce.
+    Pontos ainda na fila do PersistenceWorker não aparecem nas consultas.
+    """
+
+    def __init__(self, directory: Path = Path('history'), cache_size: int = 32):
+        self.logger = setup_logger('ABDM.HistoryQuery')
+        self.directory = Path(directory)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[tuple, object]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, asset: str, tier: str, start_ns: Optional[int], end_ns: Optional[int]) -> List[Path]:
+        return partition_paths(self.directory / asset, tier, start_ns, end_ns)
+
+    def _cached(self, key: tuple, paths: List[Path], compute):
+        # O tamanho dos arquivos entra na chave: dados novos invalidam a entrada
+        key = key + (tuple((path.name, os.stat(path).st_size) for path in paths),)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        result = compute()
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _read(self, paths: List[Path], keys: Sequence[str], start_ns: Optional[int],
+              end_ns: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        timestamps = []
+        matrices = []
+        for path in paths:
+            with path.open('rb') as f:
+                file_keys, data_offset, record, first, stop = segment_bounds(f, start_ns, end_ns)
+                if stop <= first:
+                    continue
+                f.seek(data_offset + first * record.size)
+                data = f.read((stop - first) * record.size)
+            day_timestamps, matrix = decode_records(data, file_keys, keys)
+            timestamps.append(day_timestamps)
+            matrices.append(matrix)
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(keys)))
+        return np.concatenate(timestamps), np.concatenate(matrices)
+
+    def _keys(self, keys: Optional[Sequence[str]], paths: List[Path]) -> Tuple[str, ...]:
+        if keys is not None:
+            return tuple(keys)
+        if not paths:
+            return ()
+        # Sem métricas pedidas: as da partição mais recente
+        with paths[-1].open('rb') as f:
+            return tuple(HistorySegment.read_header(f)[0])
+
+    def range(self, asset: str, start: Instant = None, end: Instant = None,
+              keys: Optional[Sequence[str]] = None, tier: str = 'raw') -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Pontos com start <= timestamp <= end: (timestamps em ns, {métrica: valores})"""
+        if tier not in dict(TIERS):
+            raise ValueError(f"Camada desconhecida: {tier} (use {', '.join(name for name, _ in TIERS)})")
+        start_ns, end_ns = _ns(start), _ns(end)
+        paths = self._paths(asset, tier, start_ns, end_ns)
+        keys = self._keys(keys, paths)
+
+        def compute():
+            timestamps, matrix = self._read(paths, keys, start_ns, end_ns)
+            timestamps.flags.writeable = False
+            matrix.flags.writeable = False
+            return timestamps, {key: matrix[:, column] for column, key in enumerate(keys)}
+        return self._cached(('range', asset, tier, keys, start_ns, end_ns), paths, compute)
+
+    def resample(self, asset: str, interval: Union[float, timedelta], start: Instant = None,
+                 end: Instant = None, keys: Optional[Sequence[str]] = None, how: str = 'last') -> Resampled:
+        """Reamostra em baldes de interval segundos alinhados ao epoch.
+
+        'last' lê a camada mais grossa cuja resolução divide o intervalo (o
+        último ponto de cada balde é preservado pelas camadas) e só o último
+        balde, que pode estar cortado por end ou ainda aberto, da camada raw;
+        'ohlc' e 'mean' precisam de todos os pontos e leem a camada raw.
+        """
+        if how not in RESAMPLE_METHODS:
+            raise ValueError(f"Reamostragem desconhecida: {how} (use {', '.join(RESAMPLE_METHODS)})")
+        interval_ns = _interval_ns(interval)
+        tier = 'raw'
+        if how == 'last':
+            for name, resolution in TIERS:
+                if resolution and interval_ns % resolution == 0:
+                    tier = name
+        start_ns, end_ns = _ns(start), _ns(end)
+        if start_ns is not None:
+            start_ns -= start_ns % interval_ns
+        paths = self._paths(asset, tier, start_ns, end_ns)
+        raw_paths = self._paths(asset, 'raw', start_ns, end_ns) if tier != 'raw' else paths
+        keys = self._keys(keys, raw_paths)
+
+        def compute():
+            if tier == 'raw':
+                timestamps, matrix = self._read(paths, keys, start_ns, end_ns)
+            else:
+                last_ns = end_ns if end_ns is not None else self._last_timestamp(raw_paths)
+                if last_ns is None:
+                    timestamps, matrix = self._read(paths, keys, start_ns, end_ns)
+                else:
+                    cut = last_ns - last_ns % interval_ns
+                    closed = self._read(paths, keys, start_ns, cut - 1)
+                    tail = self._read(raw_paths[-1:], keys, max(cut, start_ns or cut), last_ns)
+                    timestamps = np.concatenate((closed[0], tail[0]))
+                    matrix = np.concatenate((closed[1], tail[1]))
+            return self._buckets(timestamps, matrix, keys, interval_ns, start_ns, end_ns, how, tier)
+        return self._cached(('resample', asset, keys, interval_ns, start_ns, end_ns, how),
+                            paths + raw_paths[-1:], compute)
+
+    @staticmethod
+    def _edge_timestamp(paths: List[Path], last: bool) -> Optional[int]:
+        """Timestamp do primeiro (ou último) registro das partições, lendo só esse registro"""
+        for path in (reversed(paths) if last else paths):
+            with path.open('rb') as f:
+                file_keys, data_offset = HistorySegment.read_header(f)
+                record = record_struct(len(file_keys))
+                count = (f.seek(0, os.SEEK_END) - data_offset) // record.size
+                if count:
+                    f.seek(data_offset + (count - 1 if last else 0) * record.size)
+                    return int.from_bytes(f.read(8), 'little', signed=True)
+        return None
+
+    @classmethod
+    def _last_timestamp(cls, paths: List[Path]) -> Optional[int]:
+        return cls._edge_timestamp(paths, last=True)
+
+    @staticmethod
+    def _buckets(timestamps: np.ndarray, matrix: np.ndarray, keys: Sequence[str], interval_ns: int,
+                 start_ns: Optional[int], end_ns: Optional[int], how: str, tier: str) -> Resampled:
+        if start_ns is None:
+            start_ns = int(timestamps[0]) - int(timestamps[0]) % interval_ns if len(timestamps) else 0
+        last_ns = end_ns if end_ns is not None else (int(timestamps[-1]) if len(timestamps) else start_ns)
+        grid = np.arange(start_ns, last_ns + 1, interval_ns, dtype=np.int64)
+        # Início de cada balde nos pontos, por busca binária (sem varrer a série)
+        first = np.searchsorted(timestamps, grid)
+        counts = np.diff(np.append(first, len(timestamps)))
+        filled = counts > 0
+        starts = first[filled]
+        stops = starts + counts[filled] - 1
+        columns = {}
+        for column, key in enumerate(keys):
+            values = matrix[:, column]
+            if how == 'ohlc':
+                result = np.full((len(grid), len(OHLC_FIELDS)), np.nan)
+                if len(starts):
+                    result[filled, 0] = values[starts]
+                    result[filled, 1] = np.maximum.reduceat(values, starts)
+                    result[filled, 2] = np.minimum.reduceat(values, starts)
+                    result[filled, 3] = values[stops]
+            else:
+                result = np.full(len(grid), np.nan)
+                if len(starts):
+                    if how == 'last':
+                        result[filled] = values[stops]
+                    else:
+                        result[filled] = np.add.reduceat(values, starts) / counts[filled]
+            result.flags.writeable = False
+            columns[key] = result
+        grid.flags.writeable = False
+        return Resampled(grid, columns, counts, how, tier)
+
+    def aligned(self, series: Sequence[Tuple[str, str]], interval: Union[float, timedelta],
+                start: Instant, end: Instant, how: str = 'last') -> Tuple[np.ndarray, Dict[Tuple[str, str], np.ndarray]]:
+        """Várias séries (ativo, métrica) reamostradas na mesma grade: (inícios dos baldes, valores).
+
+        Sem start ou end, a grade vai do primeiro ao último ponto entre todos
+        os ativos, então cada ativo é reamostrado exatamente nos mesmos baldes.
+        """
+        by_asset: Dict[str, List[str]] = {}
+        for asset, key in series:
+            by_asset.setdefault(asset, []).append(key)
+        interval_ns = _interval_ns(interval)
+        start_ns, end_ns = _ns(start), _ns(end)
+        if start_ns is None or end_ns is None:
+            firsts = []
+            lasts = []
+            for asset in by_asset:
+                paths = self._paths(asset, 'raw', start_ns, end_ns)
+                first = self._edge_timestamp(paths, last=False)
+                if first is not None:
+                    firsts.append(first)
+                    lasts.append(self._edge_timestamp(paths, last=True))
+            if firsts:
+                if start_ns is None:
+                    start_ns = min(firsts)
+                if end_ns is None:
+                    end_ns = max(lasts)
+        if start_ns is not None:
+            start_ns -= start_ns % interval_ns
+        grid = None
+        values = {}
+        for asset, keys in by_asset.items():
+            resampled = self.resample(asset, interval, start_ns, end_ns, keys, how)
+            grid = resampled.timestamps_ns
+            for key in keys:
+                values[(asset, key)] = resampled.columns[key]
+        if grid is None:
+            grid = np.empty(0, dtype=np.int64)
+        return grid, values
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,392 @@
+import json
+import math
+import os
+import struct
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.logger import setup_logger
+
+MAGIC = b'ABDMHST1'
+VERSION = 1
+# Cabeçalho: magic, versão, tamanho do JSON com as métricas (o JSON vem em seguida)
+HEADER = struct.Struct('<8sHI')
+# Camadas de resolução (nome, largura do balde em ns); 'raw' guarda todos os pontos
+TIERS = (
+    ('raw', 0),
+    ('1s', 1_000_000_000),
+    ('10s', 10_000_000_000),
+    ('1m', 60_000_000_000),
+)
+
+
+def to_ns(timestamp: datetime) -> int:
+    """Datetime (local, como os do feed) para epoch em nanossegundos"""
+    return round(timestamp.timestamp() * 1e6) * 1000
+
+
+def from_ns(timestamp_ns: int) -> datetime:
+    return datetime.fromtimestamp(timestamp_ns / 1e9)
+
+
+def record_struct(count: int) -> struct.Struct:
+    """Registro de largura fixa: timestamp int64 (ns) e um float64 por métrica"""
+    return struct.Struct(f'<q{count}d')
+
+
+class HistorySegment:
+    """Arquivo de histórico append-only com registros binários de largura fixa.
+
+    Cada ponto é um registro '<q' + 'd' * métricas anexado ao fim do arquivo,
+    então gravar custa O(1) independentemente do tamanho do histórico. A cada
+    checkpoint_every registros (ou checkpoint_interval segundos) o arquivo é
+    sincronizado com o disco e o total de registros é gravado no arquivo
+    .ckpt (checkpoint_every=0 deixa os checkpoints para quem grava, ex.: o
+    PersistenceWorker); na abertura, um registro incompleto no fim (queda no
+    meio da escrita) é descartado.
+    """
+
+    def __init__(self, path: Path, keys: Sequence[str], checkpoint_every: int = 100,
+                 checkpoint_interval: float = 5.0):
+        self.logger = setup_logger('ABDM.HistoryStore')
+        self.path = Path(path)
+        self.checkpoint_path = self.path.with_name(self.path.name + '.ckpt')
+        self.keys = list(keys)
+        self.record = record_struct(len(self.keys))
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.pending = 0  # Registros gravados desde o último checkpoint
+        self.last_checkpoint = time.monotonic()
+        self.data_offset = 0
+        self.records = 0
+        self.file = None
+        # Leitura (thread da UI) e gravação (thread de persistência) compartilham o arquivo
+        self.lock = threading.RLock()
+        self._open()
+
+    def _header_bytes(self) -> bytes:
+        meta = json.dumps({'keys': self.keys}).encode('utf-8')
+        return HEADER.pack(MAGIC, VERSION, len(meta)) + meta
+
+    @staticmethod
+    def read_header(f) -> Tuple[List[str], int]:
+        """Lê o cabeçalho e retorna (métricas, deslocamento do primeiro registro)"""
+        raw = f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            raise ValueError("Cabeçalho do histórico incompleto")
+        magic, version, meta_size = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Arquivo de histórico inválido (magic {magic!r}, versão {version})")
+        meta = json.loads(f.read(meta_size).decode('utf-8'))
+        return meta['keys'], HEADER.size + meta_size
+
+    def _open(self) -> None:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('wb') as f:
+                f.write(self._header_bytes())
+            self.logger.info(f"Segmento de histórico criado: {self.path}")
+
+        with self.path.open('rb') as f:
+            keys, self.data_offset = self.read_header(f)
+        if keys != self.keys:
+            self._migrate(keys)
+
+        size = self.path.stat().st_size
+        self.records, torn = divmod(size - self.data_offset, self.record.size)
+        if torn:
+            # Queda durante a escrita: descarta o registro incompleto
+            self.logger.warning(f"{self.path}: registro incompleto de {torn} bytes descartado")
+            with self.path.open('r+b') as f:
+                f.truncate(size - torn)
+        expected = self._read_checkpoint()
+        if expected is not None and self.records < expected:
+            self.logger.warning(
+                f"{self.path}: {expected - self.records} registros perdidos desde o último checkpoint"
+            )
+        self.file = self.path.open('ab')
+
+    def _migrate(self, old_keys: List[str]) -> None:
+        """Regrava o segmento com as métricas atuais (métricas novas ficam NaN)"""
+        self.logger.info(f"Métricas do histórico mudaram ({old_keys} -> {self.keys}); regravando {self.path}")
+        timestamps, rows = read_segment(self.path)
+        positions = [old_keys.index(key) if key in old_keys else None for key in self.keys]
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with tmp.open('wb') as f:
+            f.write(self._header_bytes())
+            pack = self.record.pack
+            f.write(b''.join(
+                pack(ts, *(row[i] if i is not None else math.nan for i in positions))
+                for ts, row in zip(timestamps, rows)
+            ))
+        os.replace(tmp, self.path)
+        with self.path.open('rb') as f:
+            _, self.data_offset = self.read_header(f)
+
+    def _read_checkpoint(self) -> Optional[int]:
+        try:
+            with self.checkpoint_path.open('r', encoding='utf-8') as f:
+                return json.load(f)['records']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def append(self, timestamp_ns: int, values: Sequence[float]) -> None:
+        with self.lock:
+            self.file.write(self.record.pack(timestamp_ns, *values))
+            self.records += 1
+            self.pending += 1
+            self._maybe_checkpoint()
+
+    def append_many(self, records: Iterable[Tuple[int, Sequence[float]]]) -> int:
+        """Anexa vários registros com uma única escrita e retorna quantos foram gravados"""
+        pack = self.record.pack
+        data = b''.join(pack(ts, *values) for ts, values in records)
+        count = len(data) // self.record.size
+        if count:
+            with self.lock:
+                self.file.write(data)
+                self.records += count
+                self.pending += count
+                self._maybe_checkpoint()
+        return count
+
+    def _maybe_checkpoint(self) -> None:
+        if self.checkpoint_every and (self.pending >= self.checkpoint_every
+                or time.monotonic() - self.last_checkpoint >= self.checkpoint_interval):
+            self.checkpoint()
+
+    def flush(self) -> None:
+        """Entrega os registros ao sistema operacional, sem fsync nem checkpoint"""
+        with self.lock:
+            self.file.flush()
+
+    def checkpoint(self, sync: bool = True) -> None:
+        """Grava os buffers no disco e registra quantos registros estão garantidos"""
+        with self.lock:
+            self.file.flush()
+            if sync:
+                os.fsync(self.file.fileno())
+            tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + '.tmp')
+            with tmp.open('w', encoding='utf-8') as f:
+                json.dump({'records': self.records, 'time': datetime.now().isoformat()}, f)
+            os.replace(tmp, self.checkpoint_path)
+            self.pending = 0
+            self.last_checkpoint = time.monotonic()
+
+    def read_tail(self, count: Optional[int] = None) -> Tuple[List[int], List[Tuple[float, ...]]]:
+        """Lê os últimos count registros (todos, se None) com uma única leitura"""
+        with self.lock:
+            self.file.flush()
+            return read_segment(self.path, count, self.record, self.data_offset)
+
+    def read_tail_bytes(self, count: Optional[int] = None) -> bytes:
+        """Como read_tail, mas devolve os registros brutos (para np.frombuffer)"""
+        with self.lock:
+            self.file.flush()
+            return read_segment_bytes(self.path, count, self.record, self.data_offset)[1]
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.checkpoint()
+                self.file.close()
+                self.file = None
+
+
+def bisect_records(f, data_offset: int, record_size: int, count: int, timestamp_ns: int,
+                   right: bool = False) -> int:
+    """Busca binária no arquivo: primeiro registro com timestamp >= (> se right) timestamp_ns"""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        f.seek(data_offset + middle * record_size)
+        value = int.from_bytes(f.read(8), 'little', signed=True)
+        if value < timestamp_ns or (right and value == timestamp_ns):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def segment_bounds(f, start_ns: Optional[int] = None,
+                   end_ns: Optional[int] = None) -> Tuple[List[str], int, struct.Struct, int, int]:
+    """Localiza no segmento aberto os registros com start_ns <= timestamp <= end_ns.
+
+    Retorna (métricas, deslocamento dos dados, registro, primeiro, fim) com
+    fim exclusivo; só o cabeçalho e log2(n) timestamps são lidos.
+    """
+    f.seek(0)
+    keys, data_offset = HistorySegment.read_header(f)
+    record = record_struct(len(keys))
+    count = (f.seek(0, os.SEEK_END) - data_offset) // record.size
+    first = bisect_records(f, data_offset, record.size, count, start_ns) if start_ns is not None else 0
+    stop = bisect_records(f, data_offset, record.size, count, end_ns, right=True) if end_ns is not None else count
+    return keys, data_offset, record, first, max(first, stop)
+
+
+def read_segment_bytes(path: Path, count: Optional[int] = None, record: Optional[struct.Struct] = None,
+                       data_offset: Optional[int] = None) -> Tuple[List[str], bytes]:
+    """Lê com uma única leitura os bytes dos últimos count registros: (métricas, dados)"""
+    keys = None
+    with Path(path).open('rb') as f:
+        if record is None or data_offset is None:
+            keys, data_offset = HistorySegment.read_header(f)
+            record = record_struct(len(keys))
+        size = f.seek(0, os.SEEK_END)
+        total = (size - data_offset) // record.size
+        first = total - min(total, count) if count is not None else 0
+        f.seek(data_offset + first * record.size)
+        return keys, f.read((total - first) * record.size)
+
+
+def decode_records(data: bytes, keys: Sequence[str], wanted: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Registros brutos para (timestamps, matriz com as colunas de wanted); métricas ausentes ficam NaN"""
+    keys = list(keys)
+    records = np.frombuffer(data, dtype=np.dtype([
+        ('timestamp', '<i8'), ('values', '<f8', (len(keys),)),
+    ]))
+    if list(wanted) == keys:
+        return records['timestamp'], records['values']
+    matrix = np.full((len(records), len(wanted)), np.nan)
+    for column, key in enumerate(wanted):
+        if key in keys:
+            matrix[:, column] = records['values'][:, keys.index(key)]
+    return records['timestamp'], matrix
+
+
+def read_segment(path: Path, count: Optional[int] = None, record: Optional[struct.Struct] = None,
+                 data_offset: Optional[int] = None) -> Tuple[List[int], List[Tuple[float, ...]]]:
+    """Lê registros de um segmento: (timestamps em ns, tuplas de valores)"""
+    keys, data = read_segment_bytes(path, count, record, data_offset)
+    if record is None:
+        record = record_struct(len(keys))
+    timestamps = []
+    rows = []
+    for values in record.iter_unpack(data):
+        timestamps.append(values[0])
+        rows.append(values[1:])
+    return timestamps, rows
+
+
+def partition_path(directory: Path, day: date, tier: str) -> Path:
+    return Path(directory) / f'{day.isoformat()}.{tier}.hist'
+
+
+def partition_days(directory: Path) -> List[date]:
+    """Dias com partição gravada no diretório do ativo, em ordem crescente"""
+    days = set()
+    for path in Path(directory).glob('*.raw.hist'):
+        try:
+            days.add(date.fromisoformat(path.name.split('.', 1)[0]))
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def partition_paths(asset_dir: Path, tier: str, start_ns: Optional[int] = None,
+                    end_ns: Optional[int] = None) -> List[Path]:
+    """Partições da camada que se sobrepõem ao intervalo, em ordem de tempo"""
+    paths = []
+    for day in partition_days(asset_dir):
+        day_start, day_end = day_bounds(day)
+        if (start_ns is not None and day_end <= start_ns) or (end_ns is not None and day_start > end_ns):
+            continue
+        path = partition_path(asset_dir, day, tier)
+        if path.exists():
+            paths.append(path)
+    return paths
+
+
+def day_bounds(day: date) -> Tuple[int, int]:
+    """Início e fim (exclusivo) do dia local em epoch ns"""
+    start = datetime.combine(day, dt_time())
+    return to_ns(start), to_ns(start + timedelta(days=1))
+
+
+def prune_partitions(directory: Path, retention_days: int, today: Optional[date] = None) -> int:
+    """Apaga as partições (todas as camadas) com mais de retention_days dias"""
+    if retention_days <= 0:
+        return 0
+    limit = (today or date.today()) - timedelta(days=retention_days)
+    removed = 0
+    for path in Path(directory).glob('*/*.hist*'):
+        try:
+            day = date.fromisoformat(path.name.split('.', 1)[0])
+        except ValueError:
+            continue
+        if day < limit:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+class Rollup:
+    """Consolida pontos em baldes de largura fixa, guardando o último ponto de cada balde"""
+    __slots__ = ('resolution', 'bucket', 'last')
+
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        self.bucket = None
+        self.last = None
+
+    def add(self, timestamp_ns: int, values: Sequence[float]) -> Optional[Tuple[int, Sequence[float]]]:
+        """Registra o ponto; retorna o ponto do balde anterior quando este se fecha"""
+        bucket = timestamp_ns // self.resolution
+        closed = self.last if self.bucket is not None and bucket != self.bucket else None
+        self.bucket = bucket
+        self.last = (timestamp_ns, values)
+        return closed
+
+    def flush(self) -> Optional[Tuple[int, Sequence[float]]]:
+        """Fecha o balde em aberto (fim do dia ou encerramento)"""
+        closed = self.last
+        self.bucket = self.last = None
+        return closed
+
+
+class DayPartition:
+    """Histórico de um ativo em um dia: um HistorySegment por camada.
+
+    Cada ponto vai para a camada 'raw'; as demais recebem o último ponto de
+    cada balde assim que ele se fecha, então as camadas são mantidas
+    incrementalmente, sem reprocessar o dia.
+    """
+
+    def __init__(self, directory: Path, day: date, keys: Sequence[str], checkpoint_every: int = 100):
+        self.day = day
+        self.start_ns, self.end_ns = day_bounds(day)
+        self.segments: Dict[str, HistorySegment] = {
+            tier: HistorySegment(partition_path(directory, day, tier), keys, checkpoint_every)
+            for tier, _ in TIERS
+        }
+        self.rollups = {tier: Rollup(resolution) for tier, resolution in TIERS if resolution}
+
+    def contains(self, timestamp_ns: int) -> bool:
+        return self.start_ns <= timestamp_ns < self.end_ns
+
+    def records(self, timestamp_ns: int, values: Sequence[float]) -> List[Tuple[HistorySegment, int, Sequence[float]]]:
+        """Registros (segmento, timestamp, valores) a gravar para um novo ponto"""
+        records = [(self.segments['raw'], timestamp_ns, values)]
+        for tier, rollup in self.rollups.items():
+            closed = rollup.add(timestamp_ns, values)
+            if closed is not None:
+                records.append((self.segments[tier],) + closed)
+        return records
+
+    def finish(self) -> List[Tuple[HistorySegment, int, Sequence[float]]]:
+        """Registros dos baldes ainda abertos"""
+        records = []
+        for tier, rollup in self.rollups.items():
+            closed = rollup.flush()
+            if closed is not None:
+                records.append((self.segments[tier],) + closed)
+        return records
+
+    def close(self) -> None:
+        for segment in self.segments.values():
+            segment.close()
@@ -1,10 +1,26 @@
+import argparse
 import logging
 import tkinter as tk
+from pathlib import Path
+from capture import ReplaySource
 from config import ServerConfig, AppConfig
 from network import MarketConnection
+from shm_ring import SharedMemoryMarket
 from ui.main_window import MainWindow
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dados das Corretoras e Resultado")
+    parser.add_argument('--capture', type=Path, help="Grava o feed bruto neste arquivo")
+    parser.add_argument('--replay', type=Path, help="Reproduz um arquivo de captura em vez de conectar")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Velocidade da reprodução (1 = tempo real, 0 = máxima)")
+    parser.add_argument('--shm', metavar='NOME',
+                        help="Lê os snapshots publicados pelo feed_handler em vez de conectar")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # Configurar logging
     logging.basicConfig(
         level=logging.INFO,
@@ -14,14 +30,22 @@ def main():
 
     try:
         # Inicializar configurações e conexão
-        server_config = ServerConfig()
+        server_config = ServerConfig(capture_path=args.capture)
         app_config = AppConfig()
-        market = MarketConnection(server_config)
+        if args.shm:
+            market = SharedMemoryMarket(args.shm)
+        else:
+            replay = ReplaySource(args.replay, args.speed) if args.replay else None
+            market = MarketConnection(server_config, replay=replay, metrics=app_config.metrics,
+                                      broker_history=app_config.broker_history,
+                                      tick_store=app_config.tick_store)
         
         # Iniciar interface gráfica
         root = tk.Tk()
         app = MainWindow(root, market, app_config)
         root.mainloop()
+        market.close()
+        app.close()
         
     except Exception as e:
         logging.error(f"Erro na aplicação: {e}")
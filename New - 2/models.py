@@ -1,25 +1,228 @@
+from array import array
 from dataclasses import dataclass, field  # Adicionado import de field
-from datetime import datetime
-from typing import Dict, List, Optional
-from collections import deque
+from datetime import date, datetime
+from typing import Dict, FrozenSet, List, Optional, Set
 import json
+import threading
+import time
 from pathlib import Path
+import numpy as np
+from broker_history import BrokerHistory
+from broker_store import NUMERIC_COLUMNS, BrokerStore
+from history_query import HistoryQuery
+from history_store import (TIERS, DayPartition, HistorySegment, day_bounds, decode_records, from_ns,
+                           partition_days, partition_path, read_segment_bytes, to_ns)
+from persistence import PersistenceWorker
+from tick_store import TickRecorder
+from config import MetricsConfig
+from decimation import POINTS_PER_PIXEL, MinMaxPyramid, minmax_decimate
 from utils.logger import setup_logger
 
 # Configuração do logger
 logger = setup_logger('ABDM.Models')
 
-@dataclass
+class MetricRegistry:
+    """Grupos de corretoras e métricas da MetricsConfig compilados para o cálculo.
+
+    Cada grupo vira um bit; cada corretora recebe, na primeira aparição, a
+    máscara dos grupos a que pertence. Para cada máscara distinta é montado
+    (uma vez) o plano com as métricas de soma que a afetam, então o custo por
+    corretora alterada não depende de quantas métricas derivadas existem.
+    """
+
+    def __init__(self, config: Optional[MetricsConfig] = None):
+        config = config or MetricsConfig()
+        if len(config.groups) > 64:
+            raise ValueError("No máximo 64 grupos de corretoras são suportados")
+        self.metrics = list(config.metrics)
+        self.keys = [metric.key for metric in self.metrics]
+        self.group_bits = {name: 1 << bit for bit, name in enumerate(config.groups)}
+        self._members = {name: frozenset(members) for name, members in config.groups.items()}
+        self._masks: Dict[str, int] = {}
+        self._plans: Dict[int, tuple] = {}
+
+        # Métricas de soma: (slot, coluna, bit do grupo; 0 = todas as corretoras)
+        self.sums = []
+        sum_slots = {}
+        for metric in self.metrics:
+            if metric.combine:
+                continue
+            if metric.column not in NUMERIC_COLUMNS:
+                raise ValueError(f"Métrica {metric.key}: coluna desconhecida '{metric.column}'")
+            if metric.group and metric.group not in self.group_bits:
+                raise ValueError(f"Métrica {metric.key}: grupo desconhecido '{metric.group}'")
+            sum_slots[metric.key] = len(self.sums)
+            self.sums.append((len(self.sums), metric.column, self.group_bits.get(metric.group, 0)))
+        self._sum_keys = list(sum_slots)
+
+        # Métricas derivadas em ordem de dependência
+        derived = {metric.key: metric.combine for metric in self.metrics if metric.combine}
+        self.derived = []
+        resolved = set(sum_slots)
+        while derived:
+            ready = [key for key, combine in derived.items() if resolved.issuperset(combine)]
+            if not ready:
+                raise ValueError(f"Métricas derivadas com dependência inválida ou circular: {sorted(derived)}")
+            for key in ready:
+                self.derived.append((key, tuple(derived.pop(key).items())))
+                resolved.add(key)
+
+    def mask_for(self, name: str) -> int:
+        """Máscara de grupos de uma corretora (calculada uma vez por nome)"""
+        mask = self._masks.get(name)
+        if mask is None:
+            mask = 0
+            for group, members in self._members.items():
+                if name in members:
+                    mask |= self.group_bits[group]
+            self._masks[name] = mask
+        return mask
+
+    def plan_for(self, mask: int) -> tuple:
+        """(slot, coluna) das métricas de soma afetadas por uma corretora com essa máscara"""
+        plan = self._plans.get(mask)
+        if plan is None:
+            plan = self._plans[mask] = tuple(
+                (slot, column) for slot, column, bit in self.sums if not bit or mask & bit
+            )
+        return plan
+
+    def finish(self, sums: List[float]) -> Dict[str, float]:
+        """Monta o dicionário de totais a partir das somas, calculando as derivadas"""
+        totals = dict(zip(self._sum_keys, sums))
+        for key, combine in self.derived:
+            totals[key] = sum(totals[dep] * weight for dep, weight in combine)
+        return {key: totals[key] for key in self.keys}
+
+    def evaluate(self, brokers: BrokerStore) -> Dict[str, float]:
+        """Calcula todas as métricas com uma varredura completa da tabela"""
+        sums = [0.0] * len(self.sums)
+        for row, name in enumerate(brokers.names):
+            for slot, column in self.plan_for(self.mask_for(name)):
+                sums[slot] += getattr(brokers, column)[row]
+        return self.finish(sums)
+
+
+# Registro usado quando nenhuma configuração é informada
+REGISTRO_PADRAO = MetricRegistry()
+
+
+def calcular_totais(brokers: BrokerStore, registry: Optional[MetricRegistry] = None) -> Dict[str, float]:
+    """Calcula os saldos agregados em contratos (varredura completa, referência)"""
+    return (registry or REGISTRO_PADRAO).evaluate(brokers)
+
+
+class AggregateEngine:
+    """Mantém as métricas do MetricRegistry de forma incremental.
+
+    O BrokerStore chama remove(row) antes de sobrescrever uma linha e
+    add(row) depois, então cada tick custa O(corretoras alteradas). A cada
+    RECOMPUTE_EVERY deltas as somas são refeitas do zero para não acumular
+    erro de ponto flutuante.
+    """
+    RECOMPUTE_EVERY = 100_000
+
+    def __init__(self, store: BrokerStore, registry: Optional[MetricRegistry] = None):
+        self.store = store
+        self.registry = registry or REGISTRO_PADRAO
+        self.masks = array('Q')
+        self._plans: Dict[int, tuple] = {}
+        self.deltas = 0
+        store.aggregates = self
+        self.recompute()
+
+    def recompute(self) -> None:
+        """Refaz máscaras e somas com uma varredura completa da tabela"""
+        self.masks = array('Q', map(self.registry.mask_for, self.store.names))
+        self.sums = [0.0] * len(self.registry.sums)
+        for row in range(len(self.store.codes)):
+            self.add(row)
+        self.deltas = 0
+
+    def row_added(self, row: int) -> None:
+        self.masks.append(self.registry.mask_for(self.store.names[row]))
+
+    def row_renamed(self, row: int) -> None:
+        self.masks[row] = self.registry.mask_for(self.store.names[row])
+
+    def _plan(self, mask: int) -> tuple:
+        # Resolve as colunas deste store uma única vez por máscara
+        plan = self._plans.get(mask)
+        if plan is None:
+            plan = self._plans[mask] = tuple(
+                (slot, getattr(self.store, column)) for slot, column in self.registry.plan_for(mask)
+            )
+        return plan
+
+    def add(self, row: int, sign: float = 1.0) -> None:
+        """Soma (ou, com sign=-1, subtrai) a contribuição de uma linha"""
+        sums = self.sums
+        for slot, values in self._plan(self.masks[row]):
+            sums[slot] += values[row] * sign
+
+    def remove(self, row: int) -> None:
+        self.add(row, -1.0)
+        self.deltas += 1
+        if self.deltas >= self.RECOMPUTE_EVERY:
+            # A linha é somada de volta pelo chamador logo em seguida
+            self.recompute()
+            self.add(row, -1.0)
+
+    def totals(self) -> Dict[str, float]:
+        """Mesmo formato de calcular_totais, sem varrer a tabela"""
+        return self.registry.finish(self.sums)
+
 class BrokerData:
-    timestamp: datetime
-    name: str
-    volume: float
-    avg_price: float
-    aggr_buy: float
-    aggr_sell: float
-    net_aggr: float
-    passive_net: float
-    gross_pl: float
+    """Visão de uma linha do BrokerStore; não copia nenhum valor"""
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: BrokerStore, row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def code(self) -> str:
+        return self._store.codes[self._row]
+
+    @property
+    def name(self) -> str:
+        return self._store.names[self._row]
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self._store.timestamp[self._row])
+
+    @property
+    def volume(self) -> float:
+        return self._store.volume[self._row]
+
+    @property
+    def avg_price(self) -> float:
+        return self._store.avg_price[self._row]
+
+    @property
+    def aggr_buy(self) -> float:
+        return self._store.aggr_buy[self._row]
+
+    @property
+    def aggr_sell(self) -> float:
+        return self._store.aggr_sell[self._row]
+
+    @property
+    def net_aggr(self) -> float:
+        return self._store.net_aggr[self._row]
+
+    @property
+    def passive_net(self) -> float:
+        return self._store.passive_net[self._row]
+
+    @property
+    def gross_pl(self) -> float:
+        return self._store.gross_pl[self._row]
+
+    @property
+    def stale(self) -> bool:
+        return bool(self._store.stale[self._row])
 
     def to_row(self) -> List:
         return [
@@ -41,70 +244,476 @@ class MarketData:
     net_saldo_passivo_varejo: float = 0
     net_saldo_agressivo_varejo: float = 0
 
+@dataclass
+class ConnectionStats:
+    """Contadores de conexão e duração de cada queda"""
+    state: str = 'disconnected'
+    connects: int = 0
+    disconnects: int = 0
+    failed_attempts: int = 0
+    downtimes: List[float] = field(default_factory=list)  # Segundos por queda
+    disconnected_since: Optional[float] = None  # time.monotonic() da última queda
+
+@dataclass
+class AssetState:
+    """Estado vivo de um ativo assinado, alimentado pela thread de leitura"""
+    asset: str
+    period: int = 0
+    brokers: BrokerStore = field(default_factory=BrokerStore)
+    market_data: MarketData = field(default_factory=MarketData)
+    registry: MetricRegistry = field(default=REGISTRO_PADRAO, repr=False)
+    history: Optional[BrokerHistory] = field(default=None, repr=False)
+    ticks: Optional[TickRecorder] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.aggregates = AggregateEngine(self.brokers, self.registry)
+        self.brokers.history = self.history
+        self.brokers.ticks = self.ticks
+
+@dataclass
+class AssetSnapshot:
+    """Cópia imutável do estado de um ativo entregue à UI"""
+    asset: str
+    brokers: BrokerStore
+    market_data: MarketData
+    totals: Dict[str, float] = field(default_factory=dict)
+    changed_codes: FrozenSet[str] = frozenset()  # Corretoras alteradas desde o snapshot anterior
+
+@dataclass
+class MarketSnapshot:
+    """Estado consolidado publicado pela thread de leitura para a UI"""
+    timestamp: datetime
+    assets: Dict[str, AssetSnapshot]
+    changed: Set[str] = field(default_factory=set)
+    connection_state: str = 'connected'
+    raw_updates: Dict[str, int] = field(default_factory=dict)  # Linhas consolidadas neste snapshot, por ativo
+
+class TierRing:
+    """Buffer circular numpy de uma camada do histórico.
+
+    Timestamps (int64, epoch em ns) e valores (matriz float64, uma coluna
+    por métrica) ficam em arrays pré-alocados com o dobro da capacidade:
+    cada ponto é gravado na posição i e em i + capacity, então os pontos em
+    ordem são sempre uma fatia contígua e as leituras devolvem views sem
+    cópia. Com resolution > 0, pontos do mesmo balde substituem o último
+    (o balde em aberto aparece no gráfico antes de ser gravado). Uma
+    MinMaxPyramid acompanha os pontos para decimate().
+    """
+
+    def __init__(self, capacity: int, columns: int, resolution: int = 0):
+        self.capacity = capacity
+        self.resolution = resolution
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((2 * capacity, columns), dtype=np.float64)
+        self.head = 0  # Próxima posição de escrita (0 <= head < capacity)
+        self.size = 0
+        self.sequence = 0  # Pontos já adicionados; o ponto mais antigo tem sequência sequence - size
+        self.pyramid = MinMaxPyramid(capacity, columns)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def full(self) -> bool:
+        return self.size == self.capacity
+
+    def _window(self) -> slice:
+        start = (self.head - self.size) % self.capacity
+        return slice(start, start + self.size)
+
+    def timestamps_ns(self) -> np.ndarray:
+        return self._timestamps[self._window()]
+
+    def matrix(self) -> np.ndarray:
+        return self._values[self._window()]
+
+    def add(self, timestamp_ns: int, row) -> None:
+        last = (self.head - 1) % self.capacity
+        if (self.resolution and self.size
+                and timestamp_ns // self.resolution == self._timestamps[last] // self.resolution):
+            position = last
+        else:
+            position = self.head
+            self.head = (position + 1) % self.capacity
+            if self.size < self.capacity:
+                self.size += 1
+            self.sequence += 1
+        mirror = position + self.capacity
+        self._timestamps[position] = self._timestamps[mirror] = timestamp_ns
+        self._values[position] = self._values[mirror] = row
+        self.pyramid.add(self.sequence - 1, timestamp_ns, self._values[position])
+
+    def fill(self, timestamps: np.ndarray, rows: np.ndarray) -> None:
+        """Substitui o conteúdo pelos últimos pontos dados (ordem cronológica)"""
+        timestamps = timestamps[-self.capacity:]
+        rows = rows[-self.capacity:]
+        count = len(timestamps)
+        # Preenche as duas metades de uma vez: os pontos ficam em [0, count)
+        for offset in (0, self.capacity):
+            self._timestamps[offset:offset + count] = timestamps
+            self._values[offset:offset + count] = rows
+        self.head = count % self.capacity
+        self.size = count
+        self.sequence = count
+        self.pyramid.build(timestamps, rows)
+
+    def prepend(self, timestamps: np.ndarray, rows: np.ndarray) -> int:
+        """Insere pontos anteriores aos atuais no espaço livre; retorna quantos couberam"""
+        room = self.capacity - self.size
+        if room <= 0 or not len(timestamps):
+            return 0
+        timestamps = timestamps[-room:]
+        rows = rows[-room:]
+        self.fill(np.concatenate((timestamps, self.timestamps_ns())),
+                  np.concatenate((rows, self.matrix())))
+        return len(timestamps)
+
+    def bounds(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        """Posições [first, stop) dos pontos com start_ns <= timestamp <= end_ns"""
+        timestamps = self.timestamps_ns()
+        first = int(np.searchsorted(timestamps, start_ns)) if start_ns is not None else 0
+        stop = int(np.searchsorted(timestamps, end_ns, side='right')) if end_ns is not None else len(timestamps)
+        return first, stop
+
+    def window(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        """Views (timestamps, matriz) dos pontos com start_ns <= timestamp <= end_ns"""
+        first, stop = self.bounds(start_ns, end_ns)
+        return self.timestamps_ns()[first:stop], self.matrix()[first:stop]
+
+    def decimate(self, first: int, stop: int, column: int, pixels: int):
+        """Pontos [first, stop) de uma coluna reduzidos a mínimo e máximo por pixel: (timestamps, valores).
+
+        Os blocos inteiros do trecho vêm da pirâmide (nível com ao menos um
+        bloco por pixel); só as pontas, menores que um bloco, são lidas ponto
+        a ponto. O primeiro e o último ponto reais são mantidos: o último é o
+        valor mostrado no gráfico.
+        """
+        timestamps = self.timestamps_ns()[first:stop]
+        values = self.matrix()[first:stop, column]
+        if len(timestamps) <= pixels * POINTS_PER_PIXEL:
+            return timestamps, values
+        base = self.sequence - self.size  # Sequência da posição 0
+        blocks = self.pyramid.blocks(base + first, base + stop, pixels, column)
+        if blocks is None:
+            x, low, high = timestamps, values, None
+        else:
+            block_first, block_stop, block_ts, mins, maxs = blocks
+            head = slice(0, block_first - base - first)
+            tail = slice(block_stop - base - first, None)
+            x = np.concatenate((timestamps[head], block_ts, timestamps[tail]))
+            low = np.concatenate((values[head], mins, values[tail]))
+            high = np.concatenate((values[head], maxs, values[tail]))
+        x, y = minmax_decimate(x, low, high, pixels, (timestamps[0], timestamps[-1]))
+        return (np.concatenate((timestamps[:1], x, timestamps[-1:])),
+                np.concatenate((values[:1], y, values[-1:])))
+
+
+@dataclass
+class HistoryWindow:
+    """Trecho do histórico lido de uma camada, pronto para o ChartPanel (views sem cópia)"""
+    tier: str
+    timestamps_ns: np.ndarray
+    matrix: np.ndarray
+    key_index: Dict[str, int]
+    ring: Optional[TierRing] = field(default=None, repr=False)  # Camada de origem, para decimated()
+    first: int = 0  # Posição do trecho no ring
+
+    def __len__(self) -> int:
+        return len(self.timestamps_ns)
+
+    def times(self) -> np.ndarray:
+        return self.timestamps_ns.view('datetime64[ns]')
+
+    def values(self, key: str) -> np.ndarray:
+        return self.matrix[:, self.key_index[key]]
+
+    def decimated(self, key: str, pixels: int):
+        """(horários, valores) de uma métrica com no máximo ~POINTS_PER_PIXEL pontos por pixel"""
+        if self.ring is None:
+            timestamps, values = self.timestamps_ns, self.values(key)
+        else:
+            timestamps, values = self.ring.decimate(self.first, self.first + len(self),
+                                                    self.key_index[key], pixels)
+        return timestamps.view('datetime64[ns]'), values
+
+
 @dataclass
 class HistoricalData:
-    timestamps: deque = field(default_factory=lambda: deque(maxlen=1000))
-    passive_liquido: deque = field(default_factory=lambda: deque(maxlen=1000))
-    passive_varejo: deque = field(default_factory=lambda: deque(maxlen=1000))
-    aggressive_varejo: deque = field(default_factory=lambda: deque(maxlen=1000))
-    net_varejo: deque = field(default_factory=lambda: deque(maxlen=1000))
+    """Histórico das métricas de um ativo, particionado por dia e por camada.
+
+    Em disco há um arquivo por dia e camada (raw, 1s, 10s, 1m) em
+    directory/<ativo>; as camadas consolidadas são mantidas à medida que os
+    pontos chegam. Em memória, cada camada tem um TierRing de capacity
+    pontos, então o consumo é limitado qualquer que seja a duração da sessão.
+    window() escolhe a camada mais grossa que ainda preenche a largura do
+    gráfico em pixels.
+    """
+    asset: str = 'WINJ25'
+    directory: Path = Path('history')
+    capacity: int = 28800  # Pontos por camada em memória
+    keys: List[str] = field(default_factory=lambda: list(REGISTRO_PADRAO.keys))  # Métricas gravadas
+    legacy_file: Optional[Path] = None  # historical_data.json (e .hist) anteriores, importados uma vez
+    writer: Optional[PersistenceWorker] = field(default=None, repr=False)  # Gravação em segundo plano
 
     def __post_init__(self):
         self.logger = setup_logger('ABDM.Models.Historical')
-        self.logger.info("Inicializando HistoricalData")
-        self.data_file = Path('historical_data.json')
+        self.asset_dir = Path(self.directory) / self.asset
+        self.logger.info(f"Inicializando HistoricalData ({self.asset_dir}, {self.capacity} pontos por camada)")
+        self.key_index = {key: column for column, key in enumerate(self.keys)}
+        self.tiers = {tier: TierRing(self.capacity, len(self.keys), resolution)
+                      for tier, resolution in TIERS}
+        self.partition: Optional[DayPartition] = None  # Dia sendo gravado
+        self._retired: List[DayPartition] = []  # Dias anteriores da sessão (fechados em close())
+        self.days: List[date] = []  # Índice: dias com partição em disco
+        self._loader: Optional[threading.Thread] = None
+        self._older: Dict[str, tuple] = {}  # Camada -> (timestamps, valores) lidos pelo _loader
+        self._older_lock = threading.Lock()
+        self.query = HistoryQuery(self.directory)  # Consultas por intervalo sobre as partições em disco
+        if self.legacy_file is not None and not partition_days(self.asset_dir):
+            self.import_legacy()
         self.load_data()
 
+    def __len__(self) -> int:
+        return len(self.tiers['raw'])
+
+    def times(self) -> np.ndarray:
+        """View ordenada (sem cópia) dos timestamps da camada raw como datetime64[ns] (UTC)"""
+        return self.tiers['raw'].timestamps_ns().view('datetime64[ns]')
+
+    def values(self, key: str) -> np.ndarray:
+        """View ordenada (sem cópia) dos valores de uma métrica na camada raw"""
+        return self.tiers['raw'].matrix()[:, self.key_index[key]]
+
+    def session_start(self) -> Optional[int]:
+        """Início (ns) do dia do ponto mais recente"""
+        timestamps = self.tiers['raw'].timestamps_ns()
+        if not len(timestamps):
+            return None
+        return day_bounds(from_ns(int(timestamps[-1])).date())[0]
+
+    def window(self, pixels: int, start_ns: Optional[int] = None,
+               end_ns: Optional[int] = None) -> HistoryWindow:
+        """Pontos entre start_ns e end_ns (padrão: o dia atual) na camada mais adequada.
+
+        Entre as camadas que cobrem o início do intervalo, usa a mais grossa
+        com ao menos `pixels` pontos; se nenhuma tiver, a mais fina (mais
+        detalhe disponível). Se nenhuma cobrir, a mais grossa (maior alcance).
+        """
+        if start_ns is None:
+            start_ns = self.session_start()
+        self.ensure_loaded(start_ns)
+        covering = []
+        for tier, _ in TIERS:
+            ring = self.tiers[tier]
+            timestamps = ring.timestamps_ns()
+            if not ring.full or start_ns is None or (len(timestamps) and timestamps[0] <= start_ns):
+                covering.append(tier)
+        chosen = None
+        for tier in reversed(covering):
+            if len(self.tiers[tier].window(start_ns, end_ns)[0]) >= pixels:
+                chosen = tier
+                break
+        if chosen is None:
+            chosen = covering[0] if covering else TIERS[-1][0]
+        ring = self.tiers[chosen]
+        first, stop = ring.bounds(start_ns, end_ns)
+        return HistoryWindow(chosen, ring.timestamps_ns()[first:stop], ring.matrix()[first:stop],
+                             self.key_index, ring, first)
+
+    def _flush_partition(self) -> None:
+        # Sem writer, os registros podem estar no buffer do arquivo aberto
+        if self.partition is not None and self.writer is None:
+            for segment in self.partition.segments.values():
+                segment.flush()
+
+    def range(self, start=None, end=None, keys: Optional[List[str]] = None, tier: str = 'raw'):
+        """Pontos gravados do ativo entre start e end (ver HistoryQuery.range)"""
+        self._flush_partition()
+        return self.query.range(self.asset, start, end, keys, tier)
+
+    def resample(self, interval, start=None, end=None, keys: Optional[List[str]] = None, how: str = 'last'):
+        """Histórico gravado do ativo em baldes de interval segundos (ver HistoryQuery.resample)"""
+        self._flush_partition()
+        return self.query.resample(self.asset, interval, start, end, keys, how)
+
     def add_point(self, timestamp: datetime, values: Dict[str, float]):
-        """Adiciona um novo ponto aos dados históricos"""
+        """Adiciona um novo ponto às camadas em memória e às partições em disco"""
         try:
-            self.timestamps.append(timestamp)
-            self.passive_liquido.append(values.get('passive_liquido', 0))
-            self.passive_varejo.append(values.get('passive_varejo', 0))
-            self.aggressive_varejo.append(values.get('aggressive_varejo', 0))
-            self.net_varejo.append(values.get('net_varejo', 0))
-            
-            self.logger.debug(
-                f"Ponto adicionado - Timestamp: {timestamp}, "
-                f"Valores: passive_liquido={values.get('passive_liquido', 0)}, "
-                f"passive_varejo={values.get('passive_varejo', 0)}, "
-                f"aggressive_varejo={values.get('aggressive_varejo', 0)}, "
-                f"net_varejo={values.get('net_varejo', 0)}"
-            )
-            self.save_data()  # Salva os dados após adicionar um novo ponto
+            timestamp_ns = to_ns(timestamp)
+            row = [values.get(key, 0) for key in self.keys]
+            for ring in self.tiers.values():
+                ring.add(timestamp_ns, row)
+            self._store(self._partition_for(timestamp_ns).records(timestamp_ns, row))
         except Exception as e:
             self.logger.error(f"Erro ao adicionar ponto: {e}", exc_info=True)
             raise
 
+    def _partition_for(self, timestamp_ns: int) -> DayPartition:
+        partition = self.partition
+        if partition is None or not partition.contains(timestamp_ns):
+            if partition is not None:
+                # Virada do dia: fecha os baldes do dia anterior
+                self._store(partition.finish())
+                self._retired.append(partition)
+            day = from_ns(timestamp_ns).date()
+            # Com writer, os checkpoints seguem a política de durabilidade dele
+            partition = self.partition = DayPartition(self.asset_dir, day, self.keys,
+                                                      checkpoint_every=0 if self.writer else 100)
+            self.logger.info(f"Partição do histórico aberta: {self.asset_dir / day.isoformat()}")
+        return partition
+
+    def _store(self, records) -> None:
+        for segment, timestamp_ns, row in records:
+            if self.writer is not None:
+                self.writer.submit(segment, timestamp_ns, row)
+            else:
+                segment.append(timestamp_ns, row)
+
     def save_data(self):
-        """Salva os dados históricos em um arquivo JSON"""
+        """Força um checkpoint das partições abertas (os pontos já são gravados em add_point)"""
         try:
-            data = {
-                'timestamps': [ts.isoformat() for ts in self.timestamps],
-                'passive_liquido': list(self.passive_liquido),
-                'passive_varejo': list(self.passive_varejo),
-                'aggressive_varejo': list(self.aggressive_varejo),
-                'net_varejo': list(self.net_varejo),
-            }
-            with self.data_file.open('w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            self.logger.info("Dados históricos salvos com sucesso.")
+            if self.partition is not None:
+                for segment in self.partition.segments.values():
+                    segment.checkpoint()
         except Exception as e:
             self.logger.error(f"Erro ao salvar dados históricos: {e}", exc_info=True)
 
+    def close(self):
+        """Grava os baldes em aberto e fecha as partições; com writer, feche-o antes"""
+        if self.partition is not None:
+            for segment, timestamp_ns, row in self.partition.finish():
+                segment.append(timestamp_ns, row)
+            self._retired.append(self.partition)
+            self.partition = None
+        for partition in self._retired:
+            partition.close()
+        self._retired = []
+
+    def _read_days(self, tier: str, days: List[date], limit: int):
+        """Lê, do dia mais recente para trás, até limit pontos de uma camada (ordem cronológica)"""
+        chunks = []
+        remaining = limit
+        for day in reversed(days):
+            if remaining <= 0:
+                break
+            path = partition_path(self.asset_dir, day, tier)
+            if not path.exists():
+                continue
+            keys, data = read_segment_bytes(path, remaining)
+            timestamps, matrix = decode_records(data, keys, self.keys)
+            chunks.append((timestamps, matrix))
+            remaining -= len(timestamps)
+        if not chunks:
+            return None
+        chunks.reverse()
+        return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
     def load_data(self):
-        """Carrega os dados históricos de um arquivo JSON"""
+        """Carrega só o dia mais recente; os anteriores seguem em segundo plano.
+
+        O índice é a lista de partições do diretório do ativo: o último dia
+        basta para os gráficos iniciais (window() mostra o dia atual), então
+        a janela abre sem esperar pelos dias anteriores, que são lidos por
+        uma thread e incorporados às camadas na thread da UI em window().
+        """
+        started = time.perf_counter()
         try:
-            if self.data_file.exists():
-                with self.data_file.open('r', encoding='utf-8') as f:
-                    data = json.load(f)
-                self.timestamps.extend(datetime.fromisoformat(ts) for ts in data['timestamps'])
-                self.passive_liquido.extend(data['passive_liquido'])
-                self.passive_varejo.extend(data['passive_varejo'])
-                self.aggressive_varejo.extend(data['aggressive_varejo'])
-                self.net_varejo.extend(data['net_varejo'])
-                self.logger.info("Dados históricos carregados com sucesso.")
+            self.days = partition_days(self.asset_dir)
+            for tier, _ in TIERS:
+                loaded = self._read_days(tier, self.days[-1:], self.capacity)
+                if loaded is not None:
+                    self.tiers[tier].fill(*loaded)
+            if len(self):
+                self.logger.info(
+                    f"Histórico de {self.days[-1]} carregado em {(time.perf_counter() - started) * 1000:.1f} ms: "
+                    + ', '.join(f"{tier} {len(ring)}" for tier, ring in self.tiers.items())
+                )
             else:
-                self.logger.info("Nenhum arquivo de dados históricos encontrado. Iniciando vazio.")
+                self.logger.info("Nenhum dado histórico encontrado. Iniciando vazio.")
         except Exception as e:
             self.logger.error(f"Erro ao carregar dados históricos: {e}", exc_info=True)
+            self.days = []
+        if len(self.days) > 1:
+            self._loader = threading.Thread(target=self._load_older, name=f'ABDM-History-{self.asset}',
+                                            daemon=True)
+            self._loader.start()
+
+    def _load_older(self) -> None:
+        """Thread: lê os dias anteriores das camadas que ainda têm espaço"""
+        started = time.perf_counter()
+        try:
+            for tier, _ in TIERS:
+                room = self.capacity - len(self.tiers[tier])
+                loaded = self._read_days(tier, self.days[:-1], room) if room > 0 else None
+                if loaded is not None:
+                    with self._older_lock:
+                        self._older[tier] = loaded
+            self.logger.info(f"{len(self.days) - 1} dia(s) anteriores do histórico lidos em segundo plano "
+                             f"em {(time.perf_counter() - started) * 1000:.1f} ms")
+        except Exception as e:
+            self.logger.error(f"Erro ao carregar dias anteriores do histórico: {e}", exc_info=True)
+
+    def _merge_older(self) -> None:
+        """Incorpora às camadas (na thread da UI) os dias anteriores já lidos"""
+        if not self._older:
+            return
+        with self._older_lock:
+            older, self._older = self._older, {}
+        for tier, (timestamps, matrix) in older.items():
+            self.tiers[tier].prepend(timestamps, matrix)
+
+    def ensure_loaded(self, start_ns: Optional[int]) -> None:
+        """Garante em memória os dias anteriores a start_ns (ex.: ao voltar no gráfico)"""
+        loader = self._loader
+        if (start_ns is not None and loader is not None and loader.is_alive()
+                and start_ns < day_bounds(self.days[-1])[0]):
+            loader.join()
+        self._merge_older()
+
+    def _legacy_points(self):
+        """Pontos do histórico anterior (segmento .hist ou historical_data.json)"""
+        segment_file = self.legacy_file.with_suffix('.hist')
+        if segment_file.exists():
+            keys, data = read_segment_bytes(segment_file)
+            return decode_records(data, keys, self.keys), segment_file
+        if not self.legacy_file.exists():
+            return None, None
+        with self.legacy_file.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        count = len(data['timestamps'])
+        matrix = np.full((count, len(self.keys)), np.nan)
+        for column, key in enumerate(self.keys):
+            # Métricas novas não têm histórico: ficam NaN (lacuna no gráfico)
+            values = data.get(key, [])[-count:] if count else []
+            if values:
+                matrix[count - len(values):, column] = values
+        timestamps = np.array([to_ns(datetime.fromisoformat(ts)) for ts in data['timestamps']], dtype=np.int64)
+        return (timestamps, matrix), self.legacy_file
+
+    def import_legacy(self):
+        """Distribui o histórico anterior em partições diárias, construindo as camadas"""
+        points, source = self._legacy_points()
+        if points is None:
+            return
+        partition = None
+        pending: Dict[HistorySegment, list] = {}
+
+        def write(partition: DayPartition) -> None:
+            for segment, timestamp_ns, row in partition.finish():
+                pending.setdefault(segment, []).append((timestamp_ns, row))
+            for segment, records in pending.items():
+                segment.append_many(records)
+            pending.clear()
+            partition.close()
+
+        for timestamp_ns, row in zip(points[0].tolist(), points[1].tolist()):
+            if partition is None or not partition.contains(timestamp_ns):
+                if partition is not None:
+                    write(partition)
+                partition = DayPartition(self.asset_dir, from_ns(timestamp_ns).date(), self.keys,
+                                         checkpoint_every=0)
+            for segment, ts, values in partition.records(timestamp_ns, row):
+                pending.setdefault(segment, []).append((ts, values))
+        if partition is not None:
+            write(partition)
+        self.logger.info(f"{len(points[0])} pontos importados de {source} para {self.asset_dir}")
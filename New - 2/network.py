@@ -1,63 +1,576 @@
-import asyncio
-import logging
-from typing import Optional
-from config import ServerConfig
-from models import MarketData
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Deque, Dict, List, Optional, Tuple
+from broker_history import BrokerHistory
+from capture import CaptureWriter, ReplaySource
+from config import BrokerHistoryConfig, MetricsConfig, ServerConfig, TickStoreConfig
+from events import EventBus, snapshot_events
+from framing import LineFramer
+from parsing import to_float, parse_brksld_block
+from tick_store import TickStore
+from models import AssetSnapshot, AssetState, ConnectionStats, MarketSnapshot, MetricRegistry
 import socket
 from datetime import datetime
 from utils.logger import setup_logger
 
+class ConnectionState:
+    """Estados da máquina de reconexão"""
+    DISCONNECTED = 'disconnected'
+    CONNECTING = 'connecting'
+    CONNECTED = 'connected'
+    BACKOFF = 'backoff'
+    CLOSED = 'closed'
+
+@dataclass
+class PendingCommand:
+    """Comando enviado aguardando a resposta correspondente no fluxo de dados"""
+    kind: Optional[str]
+    asset: Optional[str]
+    command: str
+    future: Future
+    enqueued_at: float
+    sent_at: Optional[float] = None
+
 class MarketConnection:
-    def __init__(self, config: ServerConfig):
+    def __init__(self, config: ServerConfig, replay: Optional[ReplaySource] = None,
+                 autoconnect: bool = True, metrics: Optional[MetricsConfig] = None,
+                 broker_history: Optional[BrokerHistoryConfig] = None,
+                 tick_store: Optional[TickStoreConfig] = None):
         self.logger = setup_logger('ABDM.Network')
         self.config = config
+        # Grupos e métricas compilados uma vez e compartilhados por todos os ativos
+        self.registry = MetricRegistry(metrics)
+        self.broker_history = broker_history or BrokerHistoryConfig()
+        # Registro durável de cada atualização das corretoras (SQLite), opcional
+        tick_store = tick_store or TickStoreConfig()
+        self.tick_store = TickStore(tick_store) if tick_store.enabled else None
         self.socket = None
-        self.buffer = ""
-        self.market_data = MarketData()
-        self.brokers_data = {}
-        self.buffer = ""
-        self._connect()
-
-    def _connect(self):
-        """Estabelece conexão com o servidor"""
+        self.framer = LineFramer(
+            capacity=config.buffer_size * 4,
+            encoding=config.encoding,
+            min_free=config.buffer_size,
+        )
+        # Estado por ativo; todas as assinaturas compartilham o mesmo socket
+        self.assets: Dict[str, AssetState] = {}
+        self._dirty_assets = set()
+        # Conflação: o estado já guarda só o último valor por corretora e preço;
+        # a publicação para a UI é limitada a max_publish_rate snapshots/s
+        self._raw_updates: Dict[str, int] = {}
+        self._publish_interval = 1.0 / config.max_publish_rate if config.max_publish_rate > 0 else 0.0
+        self._next_publish = 0.0
+        self._socket_timeout = config.read_timeout
+        self._asset_snapshots: Dict[str, AssetSnapshot] = {}
+        # Eventos derivados de cada snapshot publicado (ver events.py)
+        self.events = EventBus()
+        self._last_published: Optional[MarketSnapshot] = None
+        self._state_lock = threading.Lock()
+        # Fila thread-safe com os snapshots prontos para a UI
+        self.updates = queue.Queue(maxsize=config.update_queue_size)
+        self._reader_thread = None
+        self._running = threading.Event()
+        self._stop_event = threading.Event()
+        self.stats = ConnectionStats()
+        # Pipeline de comandos: a escrita roda em thread própria e as respostas
+        # são associadas aos comandos pelo tipo da linha recebida
+        self._outbox = queue.Queue()
+        self._writer_thread = None
+        self._pending: Dict[Tuple[str, Optional[str]], Deque[PendingCommand]] = {}
+        self._pending_lock = threading.Lock()
+        self.command_latencies: Dict[str, Deque[float]] = {}
+        self.capture = CaptureWriter(config.capture_path) if config.capture_path else None
+        # Em modo de reprodução os dados vêm da captura e nenhum socket é aberto
+        self.replay = replay
+        if replay is None and autoconnect:
+            # Uma falha aqui não é fatal: a thread de leitura reconecta com backoff
+            self._connect()
+
+    @property
+    def state(self) -> str:
+        return self.stats.state
+
+    @property
+    def connected(self) -> bool:
+        return self.stats.state == ConnectionState.CONNECTED
+
+    def _set_state(self, state: str) -> None:
+        """Atualiza o estado da conexão e avisa a UI"""
+        if self.stats.state == state:
+            return
+        self.logger.info(f"Estado da conexão: {self.stats.state} -> {state}")
+        self.stats.state = state
+        if self._running.is_set():
+            self._publish_snapshot()
+
+    def _connect(self) -> bool:
+        """Estabelece conexão com o servidor e reenvia as assinaturas ativas"""
+        self._set_state(ConnectionState.CONNECTING)
+        sock = None
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.config.host, self.config.port))
-            self._send_command(self.config.init_command)
-            self.logger.info(f"Conectado ao servidor {self.config.host}:{self.config.port}")
-        except Exception as e:
-            self.logger.error(f"Erro ao conectar: {e}", exc_info=True)
-            raise
+            sock = socket.create_connection(
+                (self.config.host, self.config.port), timeout=self.config.connect_timeout
+            )
+            sock.settimeout(self.config.read_timeout)
+            self._socket_timeout = self.config.read_timeout
+            self.socket = sock
+            self.framer.clear()
+        except OSError as e:
+            self.logger.error(f"Erro ao conectar: {e}")
+            if sock is not None:
+                sock.close()
+            self.socket = None
+            self.stats.failed_attempts += 1
+            self._set_state(ConnectionState.DISCONNECTED)
+            return False
+
+        # A resposta do OPENFAST e das assinaturas chega pelo fluxo normal de leitura
+        self._send_command(self.config.init_command)
+        for state in list(self.assets.values()):
+            self.request_broker_balance(state.asset, state.period)
+            self.request_last_price(state.asset)
+
+        self.stats.connects += 1
+        if self.stats.disconnected_since is not None:
+            downtime = time.monotonic() - self.stats.disconnected_since
+            self.stats.downtimes.append(downtime)
+            self.stats.disconnected_since = None
+            self.logger.info(f"Reconectado após {downtime:.1f}s fora do ar")
+        self.logger.info(
+            f"Conectado ao servidor {self.config.host}:{self.config.port} "
+            f"({len(self.assets)} ativos reassinados)"
+        )
+        self._set_state(ConnectionState.CONNECTED)
+        return True
+
+    def _handle_disconnect(self, reason: str) -> None:
+        """Registra a queda, fecha o socket e marca os dados como desatualizados"""
+        self.logger.warning(f"Conexão perdida: {reason}")
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+        self.socket = None
+        self._expire_pending(ConnectionError(reason))
+        self.stats.disconnects += 1
+        if self.stats.disconnected_since is None:
+            self.stats.disconnected_since = time.monotonic()
+        self._mark_stale()
+        self._set_state(ConnectionState.DISCONNECTED)
+
+    def _mark_stale(self) -> None:
+        """Marca as linhas de corretoras como desatualizadas até chegarem dados novos"""
+        with self._state_lock:
+            for state in self.assets.values():
+                # Os snapshots já publicados têm cópias próprias da tabela
+                state.brokers.mark_stale()
+                self._dirty_assets.add(state.asset)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Espera exponencial com jitter para a tentativa informada"""
+        delay = min(
+            self.config.reconnect_max_delay,
+            self.config.reconnect_initial_delay * (2 ** attempt),
+        )
+        jitter = self.config.reconnect_jitter
+        return delay * random.uniform(1 - jitter, 1 + jitter)
 
-    def _send_command(self, command: str) -> str:
-        """Envia comando para o servidor e retorna a resposta"""
-        command += '\r\n'
-        self.socket.sendall(command.encode(self.config.encoding))
-        return self.socket.recv(self.config.buffer_size).decode(self.config.encoding)
+    def _send_command(self, command: str, kind: Optional[str] = None,
+                      asset: Optional[str] = None, expect_response: bool = True) -> Future:
+        """Enfileira um comando para a thread de escrita e retorna um Future da resposta.
 
-    def request_broker_balance(self, asset: str, period: int) -> str:
-        """Solicita saldo das corretoras"""
+        Nenhuma leitura é feita aqui: a resposta chega pelo fluxo normal do
+        framer e é associada ao comando pelo tipo (e ativo) da linha.
+        """
+        pending = PendingCommand(
+            kind=kind or command.split(self.config.field_separator, 1)[0],
+            asset=asset,
+            command=command,
+            future=Future(),
+            enqueued_at=time.monotonic(),
+        )
+        if expect_response:
+            with self._pending_lock:
+                self._pending.setdefault((pending.kind, asset), deque()).append(pending)
+        else:
+            pending.kind = None
+        self._ensure_writer()
+        self._outbox.put(pending)
+        return pending.future
+
+    def _ensure_writer(self) -> None:
+        """Inicia a thread de escrita se ainda não estiver rodando"""
+        if self._writer_thread and self._writer_thread.is_alive():
+            return
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop, name='ABDM-Writer', daemon=True
+        )
+        self._writer_thread.start()
+
+    def _writer_loop(self) -> None:
+        """Laço da thread de escrita: envia os comandos na ordem em que foram enfileirados"""
+        while True:
+            pending = self._outbox.get()
+            if pending is None:
+                break
+            sock = self.socket
+            try:
+                if sock is None:
+                    raise ConnectionError("sem conexão com o servidor")
+                sock.sendall((pending.command + '\r\n').encode(self.config.encoding))
+                pending.sent_at = time.monotonic()
+                if pending.kind is None:
+                    pending.future.set_result(None)
+            except OSError as e:
+                self.logger.error(f"Erro ao enviar comando {pending.command!r}: {e}")
+                self._discard_pending(pending)
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+
+    def _discard_pending(self, pending: PendingCommand) -> None:
+        """Remove um comando da lista de respostas aguardadas"""
+        with self._pending_lock:
+            waiting = self._pending.get((pending.kind, pending.asset))
+            if waiting and pending in waiting:
+                waiting.remove(pending)
+
+    def _match_response(self, kind: str, asset: Optional[str], line: str) -> None:
+        """Associa uma linha recebida ao comando mais antigo do mesmo tipo"""
+        with self._pending_lock:
+            waiting = self._pending.get((kind, asset))
+            if not waiting:
+                return
+            pending = waiting.popleft()
+            if not waiting:
+                del self._pending[(kind, asset)]
+        latency = time.monotonic() - (pending.sent_at or pending.enqueued_at)
+        self.command_latencies.setdefault(kind, deque(maxlen=100)).append(latency)
+        self.logger.info(f"Resposta de {kind} {asset or ''} em {latency * 1000:.1f} ms")
+        if not pending.future.done():
+            pending.future.set_result(line)
+
+    def _expire_pending(self, error: Optional[Exception] = None) -> None:
+        """Falha os comandos sem resposta há mais de command_timeout (ou todos, se error)"""
+        now = time.monotonic()
+        expired = []
+        with self._pending_lock:
+            for key in list(self._pending):
+                waiting = self._pending[key]
+                while waiting and (error is not None or
+                                   now - waiting[0].enqueued_at > self.config.command_timeout):
+                    expired.append(waiting.popleft())
+                if not waiting:
+                    del self._pending[key]
+        for pending in expired:
+            self.logger.warning(f"Comando sem resposta: {pending.command!r}")
+            if not pending.future.done():
+                pending.future.set_exception(error or TimeoutError(pending.command))
+
+    def _new_broker_history(self) -> Optional[BrokerHistory]:
+        config = self.broker_history
+        if not config.enabled:
+            return None
+        return BrokerHistory(
+            fields=config.fields,
+            capacity=config.capacity,
+            memory_budget=int(config.memory_budget_mb * 1e6),
+            idle_eviction=config.idle_eviction,
+        )
+
+    def _asset_state(self, asset: str) -> AssetState:
+        """Retorna (criando se necessário) o estado de um ativo"""
+        state = self.assets.get(asset)
+        if state is None:
+            with self._state_lock:
+                state = self.assets.get(asset)
+                if state is None:
+                    state = self.assets[asset] = AssetState(
+                        asset, registry=self.registry, history=self._new_broker_history(),
+                        ticks=self.tick_store.recorder(asset) if self.tick_store is not None else None,
+                    )
+        return state
+
+    def subscribe(self, asset: str, period: int = 0) -> None:
+        """Assina saldo das corretoras e último preço de um ativo nesta conexão"""
+        self._asset_state(asset).period = period
+        if self.socket is None:
+            # Sem conexão: a assinatura será enviada na próxima (re)conexão
+            self.logger.info(f"Ativo {asset} registrado; assinatura pendente de conexão")
+            return
+        self.request_broker_balance(asset, period)
+        self.request_last_price(asset)
+        self.logger.info(f"Ativo {asset} assinado (período {period})")
+
+    def unsubscribe(self, asset: str) -> None:
+        """Cancela as assinaturas de um ativo e descarta seu estado"""
+        sep = self.config.field_separator
+        state = self.assets.get(asset)
+        period = state.period if state else 0
+        with self._state_lock:
+            self.assets.pop(asset, None)
+            self._asset_snapshots.pop(asset, None)
+        if self.socket is not None:
+            self._send_command(f'off{sep}BRKSLD{sep}{asset}{sep}{period}', expect_response=False)
+            self._send_command(f'off{sep}SQT{sep}{asset}{sep}LAST', expect_response=False)
+        self.logger.info(f"Assinatura do ativo {asset} cancelada")
+
+    def request_broker_balance(self, asset: str, period: int) -> Future:
+        """Solicita saldo das corretoras; o Future recebe a primeira linha BRKSLD do ativo"""
+        self._asset_state(asset).period = period
         command = f'on{self.config.field_separator}BRKSLD{self.config.field_separator}{asset}{self.config.field_separator}{period}'
-        return self._send_command(command)
+        return self._send_command(command, kind='BRKSLD', asset=asset)
 
-    def request_last_price(self, asset: str) -> str:
-        """Solicita último preço do ativo"""
+    def request_last_price(self, asset: str) -> Future:
+        """Solicita último preço do ativo; o Future recebe a primeira linha SQT do ativo"""
+        self._asset_state(asset)
         command = f'on{self.config.field_separator}SQT{self.config.field_separator}{asset}{self.config.field_separator}LAST'
-        return self._send_command(command)
+        return self._send_command(command, kind='SQT', asset=asset)
+
+    def start_reader(self) -> None:
+        """Inicia a thread que lê o socket continuamente e publica snapshots"""
+        if self._reader_thread and self._reader_thread.is_alive():
+            return
+        self._running.set()
+        self._stop_event.clear()
+        self._reader_thread = threading.Thread(
+            target=self._replay_loop if self.replay else self._reader_loop,
+            name='ABDM-Reader', daemon=True
+        )
+        self._reader_thread.start()
+        self.logger.info("Thread de leitura iniciada")
+
+    def stop_reader(self, timeout: Optional[float] = None) -> None:
+        """Sinaliza a thread de leitura para parar e aguarda seu término"""
+        self._running.clear()
+        self._stop_event.set()
+        if self._reader_thread and self._reader_thread is not threading.current_thread():
+            self._reader_thread.join(
+                timeout if timeout is not None
+                else self.config.read_timeout + self.config.connect_timeout
+            )
+        self._reader_thread = None
 
-    def process_data(self) -> None:
-        """Processa os dados recebidos do servidor"""
+    def _reader_loop(self) -> None:
+        """Laço da thread de leitura: lê, processa, publica e reconecta sem tocar na UI"""
+        attempt = 0
+        while self._running.is_set():
+            if self.socket is None:
+                if attempt or self.stats.disconnects:
+                    # attempt conta as falhas seguidas (queda ou conexão recusada): a
+                    # primeira nova tentativa espera o atraso inicial configurado
+                    delay = self._backoff_delay(max(attempt - 1, 0))
+                    self.logger.warning(f"Nova tentativa de conexão em {delay:.1f}s (tentativa {attempt + 1})")
+                    self._set_state(ConnectionState.BACKOFF)
+                    # Espera interrompível: stop_reader acorda a thread imediatamente
+                    if self._stop_event.wait(delay):
+                        break
+                if not self._connect():
+                    attempt += 1
+                continue
+
+            if self._pending:
+                self._expire_pending()
+
+            # Com alterações pendentes, o recv espera no máximo até a próxima publicação
+            timeout = min(self.config.read_timeout, self._flush_due())
+            if timeout != self._socket_timeout:
+                self.socket.settimeout(timeout)
+                self._socket_timeout = timeout
+
+            try:
+                received = self.framer.recv_into(self.socket)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if not self._running.is_set():
+                    break
+                self._handle_disconnect(f"erro na leitura do socket: {e}")
+                attempt += 1
+                continue
+
+            if not received:
+                self._handle_disconnect("conexão encerrada pelo servidor")
+                attempt += 1
+                continue
+
+            # Só zera o backoff quando a conexão de fato entrega dados
+            attempt = 0
+            if self.capture:
+                self.capture.write(self.framer.tail(received))
+            self._process_lines(received)
+            self._flush_due()
+        self._running.clear()
+        self.logger.info("Thread de leitura finalizada")
+
+    def _replay_loop(self) -> None:
+        """Laço de reprodução: alimenta a captura pelo mesmo caminho de parsing do socket"""
+        self.logger.info(f"Reproduzindo {self.replay.path} (velocidade {self.replay.speed or 'máxima'})")
+        self._set_state(ConnectionState.CONNECTED)
+        started = time.perf_counter()
+        for data in self.replay.chunks(self._stop_event):
+            self.feed(data)
+            self._flush_due()
+        if self._dirty_assets:
+            self._publish_snapshot()
+        elapsed = time.perf_counter() - started
+        self.logger.info(
+            f"Reprodução concluída: {self.replay.records} blocos, "
+            f"{self.replay.bytes / 1e6:.1f} MB em {elapsed:.2f}s"
+        )
+        self._set_state(ConnectionState.DISCONNECTED)
+        self._running.clear()
+
+    def _count_update(self, asset: str, count: int = 1) -> None:
+        """Contabiliza atualizações brutas de um ativo até o próximo snapshot"""
+        self._raw_updates[asset] = self._raw_updates.get(asset, 0) + count
+
+    def _flush_due(self) -> float:
+        """Publica as alterações pendentes se o intervalo mínimo já passou.
+
+        Retorna quantos segundos faltam para a próxima publicação possível
+        (ou read_timeout se não há nada pendente).
+        """
+        if not self._dirty_assets:
+            return self.config.read_timeout
+        remaining = self._next_publish - time.monotonic()
+        if remaining > 0:
+            return remaining
+        self._publish_snapshot()
+        return self.config.read_timeout
+
+    def _publish_snapshot(self) -> None:
+        """Publica uma cópia do estado atual na fila da UI, descartando o mais antigo se cheia"""
+        self._next_publish = time.monotonic() + self._publish_interval
+        # Só os ativos alterados são copiados; os demais reaproveitam a última cópia
+        with self._state_lock:
+            changed, self._dirty_assets = self._dirty_assets, set()
+            raw_updates, self._raw_updates = self._raw_updates, {}
+            for asset in changed:
+                state = self.assets.get(asset)
+                if state is not None:
+                    brokers = state.brokers.copy()
+                    codes = state.brokers.codes
+                    changed_codes = frozenset(codes[row] for row in state.brokers.changed_rows)
+                    state.brokers.changed_rows.clear()
+                    self._asset_snapshots[asset] = AssetSnapshot(
+                        asset=asset,
+                        brokers=brokers,
+                        market_data=replace(state.market_data),
+                        totals=state.aggregates.totals(),
+                        changed_codes=changed_codes,
+                    )
+            snapshot = MarketSnapshot(
+                timestamp=datetime.now(),
+                assets=dict(self._asset_snapshots),
+                changed=changed,
+                connection_state=self.stats.state,
+                raw_updates=raw_updates,
+            )
+        self.logger.debug(
+            f"Snapshot publicado: {sum(raw_updates.values())} atualizações consolidadas "
+            f"({', '.join(sorted(changed)) or 'sem alterações'})"
+        )
+        if self.events.has_subscribers():
+            for event in snapshot_events(snapshot, self._last_published):
+                self.events.publish(event)
+        self._last_published = snapshot
+        while True:
+            try:
+                self.updates.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.updates.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get_snapshot(self, timeout: Optional[float] = None) -> Optional[MarketSnapshot]:
+        """Retorna o snapshot mais recente pendente (ou None), descartando os intermediários.
+
+        Com timeout, aguarda até esse tempo pelo primeiro snapshot.
+        """
+        snapshot = None
+        changed = set()
+        raw_updates: Dict[str, int] = {}
+
+        def merge(pending: MarketSnapshot) -> None:
+            changed.update(pending.changed)
+            for asset, count in pending.raw_updates.items():
+                raw_updates[asset] = raw_updates.get(asset, 0) + count
+
+        if timeout is not None:
+            try:
+                snapshot = self.updates.get(timeout=timeout)
+                merge(snapshot)
+            except queue.Empty:
+                return None
+        while True:
+            try:
+                snapshot = self.updates.get_nowait()
+                merge(snapshot)
+            except queue.Empty:
+                break
+        if snapshot is not None:
+            # Preserva ativos alterados e contagens dos snapshots descartados
+            snapshot.changed = changed
+            snapshot.raw_updates = raw_updates
+        return snapshot
+
+    def feed(self, data: bytes) -> None:
+        """Processa bytes vindos de outra fonte pelo mesmo caminho do socket"""
+        self.framer.feed(data)
+        self._process_lines(len(data))
+
+    def _process_lines(self, received: int) -> None:
+        """Processa as linhas completas disponíveis no framer"""
+        self.logger.debug(f"Dados recebidos: {received} bytes, {len(self.framer)} pendentes")
+        # Linhas BRKSLD são acumuladas e aplicadas em lote; as demais seguem linha a linha
+        brksld_lines = []
+        for line in self.framer.lines():
+            if self._pending:
+                self._correlate(line)
+            if line.startswith('BRKSLD'):
+                brksld_lines.append(line)
+            else:
+                self._process_line(line)
+        if brksld_lines:
+            self._process_brksld_block(brksld_lines)
+
+    def _process_brksld_block(self, lines: List[str]) -> None:
+        """Aplica um bloco de linhas BRKSLD às tabelas de corretoras de uma só vez"""
         try:
-            data = self.socket.recv(self.config.buffer_size).decode(self.config.encoding)
-            if data:
-                self.logger.debug(f"Dados recebidos: {data[:100]}...")  # Log primeiros 100 caracteres
-                self.buffer += data
-                while '\n' in self.buffer:
-                    line, self.buffer = self.buffer.split('\n', 1)
-                    self._process_line(line)
-        except Exception as e:
-            self.logger.error(f"Erro ao processar dados: {e}", exc_info=True)
-            raise
+            batches = parse_brksld_block(lines, self.config.field_separator)
+        except ValueError as e:
+            self.logger.error(f"Erro no parsing em lote, processando linha a linha: {e}")
+            for line in lines:
+                self._process_line(line)
+            return
+
+        timestamp = time.time()
+        parsed = 0
+        for asset, batch in batches.items():
+            parsed += len(batch)
+            self._count_update(asset, len(batch))
+            changed = self._asset_state(asset).brokers.apply_batch(batch, timestamp)
+            if changed:
+                self._dirty_assets.add(asset)
+            self.logger.debug(f"{asset}: {len(batch)} linhas BRKSLD, {changed} corretoras alteradas")
+        if parsed < len(lines):
+            self.logger.warning(f"{len(lines) - parsed} linhas BRKSLD com campos insuficientes ignoradas")
+
+    def _correlate(self, line: str) -> None:
+        """Verifica se a linha responde a algum comando pendente"""
+        sep = self.config.field_separator
+        kind, _, rest = line.partition(sep)
+        if kind in ('BRKSLD', 'SQT'):
+            self._match_response(kind, rest.partition(sep)[0], line)
+        else:
+            # Linhas de controle (ex.: versão da API) respondem ao comando inicial
+            self._match_response(self.config.init_command, None, line)
 
     def _process_line(self, line: str) -> None:
         """Processa uma linha de dados"""
@@ -66,57 +579,78 @@ class MarketConnection:
                 self.logger.debug(f"Processando dados de corretora: {line[:100]}...")
                 fields = line.split(self.config.field_separator)
                 if len(fields) >= 25:
-                    broker_code = fields[3]
-                    # Usar timestamp atual já que o dado não vem com timestamp
-                    data_timestamp = datetime.now()
-                    
+                    asset = fields[1]
+
                     # Log dos campos para debug
                     self.logger.debug(f"Campos processados: {', '.join(fields[:16])}")
-                    
+
                     try:
-                        self.brokers_data[broker_code] = {
-                            'timestamp': data_timestamp,
-                            'name': fields[4],
-                            'volume': fields[5],
-                            'avg_price': fields[7],
-                            'aggr_buy': float(fields[8]) if fields[8] else 0,
-                            'aggr_sell': float(fields[9]) if fields[9] else 0,
-                            'net_aggr': float(fields[8] if fields[8] else 0) - float(fields[9] if fields[9] else 0),
-                            'passive_net': fields[15],
-                            'gross_pl': fields[16] if len(fields) > 16 else '0',
-                            'last_update': datetime.now()
-                        }
-                        self.new_data = True
-                        self.logger.debug(f"Dados processados com sucesso para corretora: {fields[4]}")
+                        # Conversão numérica feita uma única vez, na entrada
+                        self._asset_state(asset).brokers.update(
+                            code=fields[3],
+                            name=fields[4],
+                            volume=to_float(fields[5]),
+                            avg_price=to_float(fields[7]),
+                            aggr_buy=to_float(fields[8]),
+                            aggr_sell=to_float(fields[9]),
+                            passive_net=to_float(fields[15]),
+                            gross_pl=to_float(fields[16]),
+                        )
+                        self._dirty_assets.add(asset)
+                        self._count_update(asset)
+                        self.logger.debug(f"Dados processados com sucesso para corretora: {fields[4]} ({asset})")
                     except (ValueError, IndexError) as e:
                         self.logger.error(f"Erro ao processar campos numéricos: {e}")
                 else:
                     self.logger.warning(f"Linha BRKSLD com campos insuficientes: {len(fields)} campos")
-            
+
             elif line.startswith('SQT'):
                 self.logger.debug(f"Processando último preço: {line}")
                 fields = line.split(self.config.field_separator)
                 if len(fields) >= 4 and fields[2] == 'LAST':
                     try:
-                        self.market_data.ultimo_preco = float(fields[3])
-                        self.logger.info(f"Último preço atualizado: {self.market_data.ultimo_preco}")
+                        asset = fields[1]
+                        market_data = self._asset_state(asset).market_data
+                        price = float(fields[3])
+                        self._count_update(asset)
+                        if price != market_data.ultimo_preco:
+                            market_data.ultimo_preco = price
+                            self._dirty_assets.add(asset)
+                            self.logger.info(f"Último preço de {asset} atualizado: {price}")
                     except ValueError as e:
                         self.logger.error(f"Erro ao converter último preço: {e}")
         except Exception as e:
             self.logger.error(f"Erro ao processar linha: {line[:100]}... Erro: {e}", exc_info=True)
 
-    def get_broker_data(self):
-        """Retorna os dados das corretoras"""
-        return self.brokers_data
+    def get_broker_data(self, asset: str):
+        """Retorna os dados das corretoras de um ativo"""
+        return self._asset_state(asset).brokers
+
+    def get_broker_history(self, asset: str) -> Optional[BrokerHistory]:
+        """Histórico por corretora do ativo (None se desativado na configuração)"""
+        state = self.assets.get(asset)
+        return state.history if state is not None else None
 
-    def get_market_data(self):
-        """Retorna os dados de mercado"""
-        return self.market_data
+    def get_market_data(self, asset: str):
+        """Retorna os dados de mercado de um ativo"""
+        return self._asset_state(asset).market_data
 
     def close(self):
         """Fecha a conexão com o servidor"""
+        self.stop_reader()
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._outbox.put(None)
+            self._writer_thread.join(self.config.read_timeout)
+        self._writer_thread = None
+        if self.capture:
+            self.capture.close()
+        if self.tick_store is not None:
+            self.tick_store.close()
+            self.tick_store = None
         if self.socket:
             self.socket.close()
+            self.socket = None
+        self.stats.state = ConnectionState.CLOSED
 
     def __del__(self):
         self.close()
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Dict, List, Sequence
+
+# Campos usados da linha BRKSLD: ativo, código, nome, volume, preço médio,
+# agressão compra, agressão venda, passivo líquido e L/P bruto
+BRKSLD_MIN_FIELDS = 25
+_brksld_fields = itemgetter(1, 3, 4, 5, 7, 8, 9, 15, 16)
+
+
+def to_float(value: str) -> float:
+    """Converte um campo numérico do OpenFast; campo vazio vale zero"""
+    return float(value) if value else 0.0
+
+
+@dataclass
+class BrksldBatch:
+    """Colunas extraídas de um bloco de linhas BRKSLD de um mesmo ativo.
+
+    Uma entrada por linha, na ordem do bloco: a mesma corretora pode
+    aparecer mais de uma vez (BrokerStore.apply_batch decide o que aplicar).
+    """
+    codes: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    volume: Sequence[float] = field(default_factory=list)
+    avg_price: Sequence[float] = field(default_factory=list)
+    aggr_buy: Sequence[float] = field(default_factory=list)
+    aggr_sell: Sequence[float] = field(default_factory=list)
+    passive_net: Sequence[float] = field(default_factory=list)
+    gross_pl: Sequence[float] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+def parse_brksld_block(lines: Sequence[str], separator: str = '\001') -> Dict[str, BrksldBatch]:
+    """Extrai em uma passada os campos de várias linhas BRKSLD, agrupados por ativo.
+
+    Todas as linhas são mantidas, inclusive as repetidas da mesma corretora:
+    o histórico por corretora e o registro de ticks guardam cada atualização.
+    Linhas com menos de BRKSLD_MIN_FIELDS campos são ignoradas. Os campos numéricos são
+    convertidos por coluna; um valor inválido levanta ValueError para que o
+    chamador volte ao parser linha a linha.
+    """
+    rows_by_asset: Dict[str, list] = {}
+    for line in lines:
+        fields = line.split(separator)
+        if len(fields) < BRKSLD_MIN_FIELDS:
+            continue
+        row = _brksld_fields(fields)
+        rows = rows_by_asset.get(row[0])
+        if rows is None:
+            rows = rows_by_asset[row[0]] = []
+        rows.append(row)
+
+    batches = {}
+    for asset, rows in rows_by_asset.items():
+        # Transpõe linhas em colunas e converte cada coluna numérica de uma vez
+        _, codes, names, volume, avg_price, aggr_buy, aggr_sell, passive_net, gross_pl = zip(*rows)
+        batches[asset] = BrksldBatch(
+            codes=list(codes),
+            names=list(names),
+            volume=list(map(to_float, volume)),
+            avg_price=list(map(to_float, avg_price)),
+            aggr_buy=list(map(to_float, aggr_buy)),
+            aggr_sell=list(map(to_float, aggr_sell)),
+            passive_net=list(map(to_float, passive_net)),
+            gross_pl=list(map(to_float, gross_pl)),
+        )
+    return batches
@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import PersistenceConfig
+from history_store import HistorySegment
+from utils.flush_stats import FlushStats
+from utils.logger import setup_logger
+
+DURABILITY_POLICIES = ('none', 'interval', 'fsync')
+_STOP = object()
+
+
+class PersistenceWorker:
+    """Grava pontos de histórico em uma thread própria (write-behind).
+
+    A UI apenas enfileira (segmento, timestamp, valores) em uma fila
+    limitada; a thread agrupa os pontos e grava por lote quando ele atinge
+    batch_size, quando flush_interval expira ou no encerramento. A política
+    de durabilidade decide quando há fsync:
+    - 'none': só entrega os dados ao sistema operacional
+    - 'interval': fsync no máximo a cada flush_interval (perda máxima de um intervalo)
+    - 'fsync': fsync a cada lote
+    """
+
+    def __init__(self, config: Optional[PersistenceConfig] = None):
+        self.config = config or PersistenceConfig()
+        if self.config.durability not in DURABILITY_POLICIES:
+            raise ValueError(
+                f"Durabilidade desconhecida: {self.config.durability} "
+                f"(use {', '.join(DURABILITY_POLICIES)})"
+            )
+        self.logger = setup_logger('ABDM.Persistence')
+        self.queue = queue.Queue(maxsize=self.config.queue_size)
+        self.flush_stats = FlushStats()
+        self._unsynced = set()  # Segmentos com dados ainda sem fsync
+        self._last_sync = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='ABDM-Persistence', daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def submit(self, segment: HistorySegment, timestamp_ns: int, values: Sequence[float]) -> bool:
+        """Enfileira um ponto sem bloquear; retorna False se a fila estiver cheia"""
+        try:
+            self.queue.put_nowait((segment, timestamp_ns, values))
+            return True
+        except queue.Full:
+            self.flush_stats.dropped += 1
+            dropped = self.flush_stats.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                self.logger.warning(f"Fila de persistência cheia: {dropped} pontos descartados")
+            return False
+
+    def _run(self) -> None:
+        config = self.config
+        pending: Dict[HistorySegment, List[Tuple[int, Sequence[float]]]] = {}
+        count = 0
+        deadline = time.monotonic() + config.flush_interval
+        next_stats = time.monotonic() + config.stats_interval
+        running = True
+        while running:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            # Junta ao lote o que mais estiver na fila, sem bloquear
+            while item is not None:
+                if item is _STOP:
+                    running = False
+                    break
+                segment, timestamp_ns, values = item
+                pending.setdefault(segment, []).append((timestamp_ns, values))
+                count += 1
+                if count >= config.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            now = time.monotonic()
+            if count >= config.batch_size or now >= deadline or not running:
+                if count or self._unsynced:
+                    # Ao fim de cada intervalo (ou no encerramento) o modo 'interval' faz fsync
+                    self._flush(pending, sync_due=now >= deadline or not running)
+                pending = {}
+                count = 0
+                deadline = time.monotonic() + config.flush_interval
+            if now >= next_stats:
+                self._log_stats()
+                next_stats = now + config.stats_interval
+
+    def _flush(self, pending: Dict[HistorySegment, list], sync_due: bool = False) -> None:
+        started = time.perf_counter()
+        written = 0
+        for segment, records in pending.items():
+            try:
+                written += segment.append_many(records)
+                if self.config.durability != 'none':
+                    self._unsynced.add(segment)
+            except Exception as e:
+                self.logger.error(f"Erro ao gravar {len(records)} pontos em {segment.path}: {e}", exc_info=True)
+
+        durability = self.config.durability
+        now = time.monotonic()
+        sync = durability == 'fsync' or (
+            durability == 'interval' and (sync_due or now - self._last_sync >= self.config.flush_interval)
+        )
+        try:
+            if sync:
+                # O checkpoint só registra registros que já passaram por fsync
+                for segment in list(self._unsynced):
+                    segment.checkpoint(sync=True)
+                self._unsynced.clear()
+                self._last_sync = now
+            elif durability == 'none':
+                for segment in pending:
+                    segment.checkpoint(sync=False)
+            else:
+                for segment in pending:
+                    segment.flush()
+        except Exception as e:
+            self.logger.error(f"Erro ao sincronizar o histórico: {e}", exc_info=True)
+
+        self.flush_stats.record(written, time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, float]:
+        return self.flush_stats.as_dict(self.queue_depth)
+
+    def _log_stats(self) -> None:
+        self.flush_stats.log(self.logger, "Persistência", "pontos", self.queue_depth)
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """Grava o que estiver pendente (com fsync, exceto em 'none') e encerra a thread.
+
+        Continua esperando enquanto a thread progride. Retorna False se ela
+        ficou timeout segundos sem gravar e ainda está viva: os segmentos não
+        devem ser fechados, pois ela ainda pode escrever neles.
+        """
+        written = self.flush_stats.written
+        stopping = False
+        while self._thread.is_alive():
+            if not stopping:
+                # put com timeout: com a fila cheia e a thread parada, um put bloqueante nunca voltaria
+                try:
+                    self.queue.put(_STOP, timeout=timeout)
+                    stopping = True
+                except queue.Full:
+                    pass
+            if stopping:
+                self._thread.join(timeout)
+            if not self._thread.is_alive():
+                break
+            if self.flush_stats.written == written:
+                self._log_stats()
+                self.logger.error(
+                    f"Persistência sem progresso em {timeout:g} s: {self.queue_depth} pontos na fila não gravados"
+                )
+                return False
+            self.logger.warning(
+                f"Persistência ainda gravando após {timeout:g} s ({self.queue_depth} pontos na fila); aguardando"
+            )
+            written = self.flush_stats.written
+        self._log_stats()
+        if self.queue_depth:
+            self.logger.error(f"Thread de persistência encerrada com {self.queue_depth} pontos na fila não gravados")
+        return True
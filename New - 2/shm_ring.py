@@ -0,0 +1,197 @@
+import os
+import pickle
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+from events import EventBus, snapshot_events
+from models import MarketSnapshot
+from utils.logger import setup_logger
+
+# Cabeçalho: magic, número de slots, tamanho do slot, último seq publicado, pid do escritor
+HEADER = struct.Struct('<8sIIQI4x')
+MAGIC = b'ABDMSHM2'
+# Cada slot: seqlock (par = estável, ímpar = escrita em andamento) e tamanho do payload
+SLOT_HEADER = struct.Struct('<QI')
+SEQ_OFFSET = 16  # Deslocamento do campo de seq publicado dentro do cabeçalho
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    try:
+        # Quem só abre o segmento não é dono dele: evita que o resource_tracker o apague
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # No Windows o segmento some com o último handle: se ainda existe, está em uso
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SnapshotRingWriter:
+    """Publica snapshots serializados em um anel de memória compartilhada.
+
+    Há um único escritor. Cada slot é protegido por um seqlock: o escritor
+    marca o slot com um valor ímpar, grava o payload e marca com o valor par
+    final; leitores copiam o payload e só o aceitam se o seq não mudou.
+    """
+
+    def __init__(self, name: str, slots: int = 8, slot_size: int = 4 << 20):
+        self.logger = setup_logger('ABDM.SharedMemory')
+        self.slots = slots
+        self.slot_size = slot_size
+        size = HEADER.size + slots * (SLOT_HEADER.size + slot_size)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._remove_stale(name)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.buf = self.shm.buf
+        HEADER.pack_into(self.buf, 0, MAGIC, slots, slot_size, 0, os.getpid())
+        self.seq = 0
+        self.logger.info(f"Anel de snapshots '{name}' criado: {slots} slots de {slot_size / 1e6:.1f} MB")
+
+    def _remove_stale(self, name: str) -> None:
+        """Remove o segmento de uma execução anterior encerrada sem limpeza.
+
+        Só apaga anéis cujo escritor registrado no cabeçalho não existe mais;
+        qualquer outro segmento com o mesmo nome (feed handler em execução,
+        formato desconhecido) gera FileExistsError.
+        """
+        old = shared_memory.SharedMemory(name=name)
+        header = bytes(old.buf[:HEADER.size])
+        old.close()
+        if len(header) < HEADER.size or not header.startswith(MAGIC):
+            _untrack(old)
+            raise FileExistsError(f"Memória compartilhada '{name}' já existe e não é um anel de snapshots "
+                                  f"reconhecido; use outro nome ou remova-a manualmente")
+        pid = HEADER.unpack(header)[4]
+        if _pid_alive(pid):
+            _untrack(old)
+            raise FileExistsError(f"Anel de snapshots '{name}' em uso pelo processo {pid}")
+        self.logger.warning(f"Removendo anel de snapshots '{name}' abandonado pelo processo {pid}")
+        old.unlink()
+
+    def _slot_offset(self, seq: int) -> int:
+        return HEADER.size + (seq % self.slots) * (SLOT_HEADER.size + self.slot_size)
+
+    def publish(self, snapshot: MarketSnapshot) -> Optional[int]:
+        """Grava o snapshot no próximo slot e retorna seu número de sequência"""
+        payload = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.slot_size:
+            self.logger.error(f"Snapshot de {len(payload)} bytes excede o slot de {self.slot_size} bytes")
+            return None
+        seq = self.seq + 1
+        offset = self._slot_offset(seq)
+        data_offset = offset + SLOT_HEADER.size
+        SLOT_HEADER.pack_into(self.buf, offset, seq * 2 - 1, len(payload))
+        self.buf[data_offset:data_offset + len(payload)] = payload
+        SLOT_HEADER.pack_into(self.buf, offset, seq * 2, len(payload))
+        struct.pack_into('<Q', self.buf, SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SnapshotRingReader:
+    """Lê o snapshot mais recente do anel sem travas e sem reprocessar o feed"""
+
+    def __init__(self, name: str):
+        self.shm = shared_memory.SharedMemory(name=name)
+        _untrack(self.shm)
+        self.buf = self.shm.buf
+        magic, self.slots, self.slot_size, _, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Memória compartilhada '{name}' não contém um anel de snapshots")
+        self.last_seq = 0
+        self.missed = 0  # Snapshots sobrescritos antes de serem lidos
+
+    def latest_seq(self) -> int:
+        return struct.unpack_from('<Q', self.buf, SEQ_OFFSET)[0]
+
+    def read_latest(self, retries: int = 3) -> Optional[MarketSnapshot]:
+        """Retorna o snapshot mais recente ainda não lido, ou None"""
+        for _ in range(retries):
+            seq = self.latest_seq()
+            if seq <= self.last_seq:
+                return None
+            offset = HEADER.size + (seq % self.slots) * (SLOT_HEADER.size + self.slot_size)
+            before, length = SLOT_HEADER.unpack_from(self.buf, offset)
+            if before != seq * 2:
+                continue  # Escrita em andamento ou slot já reutilizado
+            data_offset = offset + SLOT_HEADER.size
+            payload = bytes(self.buf[data_offset:data_offset + length])
+            after, _ = SLOT_HEADER.unpack_from(self.buf, offset)
+            if after != before:
+                continue
+            self.missed += max(0, seq - self.last_seq - 1)
+            self.last_seq = seq
+            return pickle.loads(payload)
+        return None
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+
+
+class SharedMemoryMarket:
+    """Fonte de dados para a UI alimentada pelo processo feed_handler.
+
+    Expõe a mesma interface usada pela MainWindow (subscribe, start_reader,
+    get_snapshot, close), mas apenas lê os snapshots já processados.
+    """
+
+    def __init__(self, name: str, attach_timeout: float = 10.0):
+        self.logger = setup_logger('ABDM.SharedMemory')
+        deadline = time.monotonic() + attach_timeout
+        while True:
+            try:
+                self.reader = SnapshotRingReader(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        self.events = EventBus()
+        self._last_snapshot: Optional[MarketSnapshot] = None
+        self.logger.info(f"Conectado ao anel de snapshots '{name}'")
+
+    def subscribe(self, asset: str, period: int = 0) -> None:
+        # As assinaturas pertencem ao processo feed_handler
+        self.logger.info(f"Ativo {asset} deve estar assinado no feed_handler")
+
+    def start_reader(self) -> None:
+        pass
+
+    def get_snapshot(self, timeout: Optional[float] = None) -> Optional[MarketSnapshot]:
+        last_seen = self.reader.last_seq
+        snapshot = self.reader.read_latest()
+        if snapshot is None:
+            return None
+        if self.reader.last_seq - last_seen > 1:
+            # Snapshots pulados podem ter alterado outros ativos e corretoras
+            snapshot.changed = set(snapshot.assets)
+            for asset_snapshot in snapshot.assets.values():
+                asset_snapshot.changed_codes = frozenset(asset_snapshot.brokers.codes)
+        for event in snapshot_events(snapshot, self._last_snapshot):
+            self.events.publish(event)
+        self._last_snapshot = snapshot
+        return snapshot
+
+    def close(self) -> None:
+        self.reader.close()
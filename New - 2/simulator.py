@@ -0,0 +1,259 @@
+"""Servidor OpenFast simulado para testes de carga e latência.
+
+Fala o mesmo protocolo que network.MarketConnection espera: handshake
+OPENFAST, assinaturas on/off de BRKSLD e SQT, linhas BRKSLD com 26 campos
+separados por \\001 e linhas SQT ... LAST.
+
+Uso: python simulator.py --port 5557 --brokers 120 --rate 500 --speed 100
+"""
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional
+
+from config import ServerConfig, SimulatorConfig
+from utils.logger import setup_logger
+
+SEP = ServerConfig.field_separator
+API_VERSION = 'SIMULADOR 1.0'
+
+# Nomes reais aparecem nos grupos de varejo da UI; os demais são genéricos
+BROKER_NAMES = [
+    'XP', 'BTG', 'CLEAR', 'GENIAL', 'CM CAPITAL', 'TORO', 'NOVA FUTURA', 'SAFRA',
+    'INTER', 'UBS', 'GUIDE', 'IDEAL', 'AGORA', 'ITAU', 'BRADESCO', 'SANTANDER',
+    'GOLDMAN', 'MORGAN', 'JP MORGAN', 'CREDIT SUISSE', 'BOFA', 'CITI',
+]
+
+
+@dataclass
+class SimulatedBroker:
+    code: str
+    name: str
+    volume: float = 0
+    avg_price: float = 0
+    aggr_buy: float = 0
+    aggr_sell: float = 0
+    passive_net: float = 0
+    gross_pl: float = 0
+
+
+@dataclass
+class SimulatedAsset:
+    """Livro de saldos de um ativo, evoluído aleatoriamente"""
+    asset: str
+    period: int
+    price: float
+    brokers: List[SimulatedBroker] = field(default_factory=list)
+    rng: random.Random = field(default_factory=random.Random)
+
+    @classmethod
+    def create(cls, asset: str, period: int, config: SimulatorConfig, rng: random.Random):
+        state = cls(asset, period, config.start_price, rng=rng)
+        for i in range(config.brokers):
+            name = BROKER_NAMES[i] if i < len(BROKER_NAMES) else f'CORRETORA {i}'
+            state.brokers.append(SimulatedBroker(code=str(i + 1), name=name, avg_price=config.start_price))
+        return state
+
+    def step_broker(self, broker: SimulatedBroker) -> bytes:
+        """Aplica um negócio aleatório à corretora e retorna sua linha BRKSLD"""
+        qty = self.rng.randint(1, 50)
+        if self.rng.random() < 0.5:
+            broker.aggr_buy += qty
+            broker.passive_net -= self.rng.randint(0, qty)
+        else:
+            broker.aggr_sell += qty
+            broker.passive_net += self.rng.randint(0, qty)
+        broker.volume += qty
+        broker.avg_price += (self.price - broker.avg_price) * qty / broker.volume
+        broker.gross_pl = (self.price - broker.avg_price) * (broker.aggr_buy - broker.aggr_sell)
+        return self.brksld_line(broker)
+
+    def brksld_line(self, broker: SimulatedBroker) -> bytes:
+        values = [
+            'BRKSLD', self.asset, str(self.period), broker.code, broker.name,
+            f'{broker.volume:.0f}', '', f'{broker.avg_price:.2f}',
+            f'{broker.aggr_buy:.0f}', f'{broker.aggr_sell:.0f}',
+            '0', '0', '0', '0', '0',
+            f'{broker.passive_net:.0f}', f'{broker.gross_pl:.0f}',
+        ] + ['0'] * 9
+        return (SEP.join(values) + '\n').encode('utf-8')
+
+    def step_price(self) -> bytes:
+        self.price = max(5.0, round(self.price + self.rng.choice((-5, 0, 5)), 2))
+        return self.sqt_line()
+
+    def sqt_line(self) -> bytes:
+        return f'SQT{SEP}{self.asset}{SEP}LAST{SEP}{self.price:.2f}\n'.encode('utf-8')
+
+    def random_updates(self, count: int) -> List[bytes]:
+        return [self.step_broker(self.rng.choice(self.brokers)) for _ in range(count)]
+
+    def burst(self, size: int) -> List[bytes]:
+        """Rajada como a de uma virada de período: percorre as corretoras em ordem"""
+        size = size or len(self.brokers)
+        return [self.step_broker(self.brokers[i % len(self.brokers)]) for i in range(size)]
+
+
+class SimulatorSession:
+    """Estado de uma conexão de cliente: assinaturas e acumuladores de taxa"""
+
+    def __init__(self, config: SimulatorConfig, rng: random.Random):
+        self.config = config
+        self.rng = rng
+        self.assets: Dict[str, SimulatedAsset] = {}
+        self.brksld: Dict[str, bool] = {}
+        self.sqt: Dict[str, bool] = {}
+        self.lines_sent = 0
+
+    def handle_command(self, command: str) -> List[bytes]:
+        """Interpreta um comando do cliente e retorna as linhas de resposta"""
+        if command == ServerConfig.init_command:
+            return [f'{command}{SEP}{API_VERSION}\n'.encode('utf-8')]
+        parts = command.split(SEP)
+        if len(parts) < 4 or parts[0] not in ('on', 'off'):
+            return [f'ERROR{SEP}comando desconhecido{SEP}{command}\n'.encode('utf-8')]
+
+        action, kind, asset, arg = parts[0], parts[1], parts[2], parts[3]
+        enabled = action == 'on'
+        if kind == 'BRKSLD':
+            period = int(arg) if arg.isdigit() else 0
+            state = self._asset(asset, period)
+            self.brksld[asset] = enabled
+            # Ao assinar, o servidor envia o saldo atual de todas as corretoras
+            return [state.brksld_line(b) for b in state.brokers] if enabled else []
+        if kind == 'SQT':
+            self.sqt[asset] = enabled
+            return [self._asset(asset, 0).sqt_line()] if enabled else []
+        return [f'ERROR{SEP}tipo desconhecido{SEP}{kind}\n'.encode('utf-8')]
+
+    def _asset(self, asset: str, period: int) -> SimulatedAsset:
+        if asset not in self.assets:
+            self.assets[asset] = SimulatedAsset.create(asset, period, self.config, self.rng)
+        return self.assets[asset]
+
+
+class OpenFastSimulator:
+    def __init__(self, config: SimulatorConfig):
+        self.logger = setup_logger('ABDM.Simulator')
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.sessions: List[SimulatorSession] = []
+        self.lines_sent = 0
+
+    async def serve(self) -> None:
+        server = await asyncio.start_server(self._handle_client, self.config.host, self.config.port)
+        self.logger.info(
+            f"Simulador OpenFast em {self.config.host}:{self.config.port} "
+            f"({self.config.brokers} corretoras, {self.config.rate * self.config.speed:.0f} linhas/s por ativo)"
+        )
+        stats_task = asyncio.create_task(self._report_stats())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            stats_task.cancel()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info('peername')
+        self.logger.info(f"Cliente conectado: {peer}")
+        session = SimulatorSession(self.config, self.rng)
+        self.sessions.append(session)
+        feeder = asyncio.create_task(self._feed(session, writer))
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode('utf-8').strip()
+                if not command:
+                    continue
+                self.logger.debug(f"Comando recebido de {peer}: {command!r}")
+                lines = session.handle_command(command)
+                if lines:
+                    writer.write(b''.join(lines))
+                    self._count(session, len(lines))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            feeder.cancel()
+            self.sessions.remove(session)
+            writer.close()
+            self.logger.info(f"Cliente desconectado: {peer}")
+
+    async def _feed(self, session: SimulatorSession, writer: asyncio.StreamWriter) -> None:
+        """Envia atualizações em lotes a cada tick respeitando as taxas configuradas"""
+        config = self.config
+        pending_brksld: Dict[str, float] = {}
+        pending_sqt: Dict[str, float] = {}
+        next_burst = time.monotonic() + config.burst_every if config.burst_every else None
+        last = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(config.tick)
+                now = time.monotonic()
+                elapsed, last = now - last, now
+                burst = next_burst is not None and now >= next_burst
+                if burst:
+                    next_burst = now + config.burst_every
+
+                lines: List[bytes] = []
+                for asset, state in session.assets.items():
+                    if session.brksld.get(asset):
+                        due = pending_brksld.get(asset, 0.0) + config.rate * config.speed * elapsed
+                        count = int(due)
+                        pending_brksld[asset] = due - count
+                        lines.extend(state.random_updates(count))
+                        if burst:
+                            lines.extend(state.burst(config.burst_size))
+                    if session.sqt.get(asset):
+                        due = pending_sqt.get(asset, 0.0) + config.price_rate * config.speed * elapsed
+                        count = int(due)
+                        pending_sqt[asset] = due - count
+                        lines.extend(state.step_price() for _ in range(count))
+
+                if lines:
+                    writer.write(b''.join(lines))
+                    self._count(session, len(lines))
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def _count(self, session: SimulatorSession, lines: int) -> None:
+        session.lines_sent += lines
+        self.lines_sent += lines
+
+    async def _report_stats(self, interval: float = 5.0) -> None:
+        last_total = 0
+        while True:
+            await asyncio.sleep(interval)
+            total = self.lines_sent
+            if self.sessions:
+                self.logger.info(
+                    f"{len(self.sessions)} cliente(s), {(total - last_total) / interval:,.0f} linhas/s"
+                )
+            last_total = total
+
+
+def parse_args(argv: Optional[List[str]] = None) -> SimulatorConfig:
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description="Servidor OpenFast simulado")
+    for f in fields(SimulatorConfig):
+        default = getattr(defaults, f.name)
+        arg_type = type(default) if default is not None else int
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=arg_type, default=default)
+    return SimulatorConfig(**vars(parser.parse_args(argv)))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    simulator = OpenFastSimulator(parse_args(argv))
+    try:
+        asyncio.run(simulator.serve())
+    except KeyboardInterrupt:
+        simulator.logger.info("Simulador encerrado")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,25 +16,11 @@ if exist venv\Scripts\activate.bat (
 :: Verifica e instala dependências
 echo Verificando dependências...
 python -m pip install --upgrade pip >nul 2>nul
-python -m pip install matplotlib >nul 2>nul
+python -m pip install matplotlib numpy >nul 2>nul
 
-:: Verifica e limpa o cache, se necessário
-set CACHE_FILE=data_cache.json
-if exist %CACHE_FILE% (
-    echo Verificando cache...
-    python -c "import json, os; from datetime import datetime; from pathlib import Path; \
-try: \
-    with open('%CACHE_FILE%', 'r') as f: \
-        cache = json.load(f); \
-        if 'timestamps' in cache and cache['timestamps']: \
-            last_timestamp = datetime.fromisoformat(cache['timestamps'][-1]); \
-            if last_timestamp.date() < datetime.now().date(): \
-                print('Cache é do dia anterior. Limpando...'); \
-                Path('%CACHE_FILE%').unlink(); \
-except (json.JSONDecodeError, ValueError): \
-    print('Erro ao ler o cache. Limpando...'); \
-    Path('%CACHE_FILE%').unlink()"
-)
+:: Remove o histórico além do período de retenção (os dias anteriores são mantidos)
+echo Verificando histórico...
+python -c "import start; start.prune_history()"
 
 :: Inicia a aplicação
 echo Iniciando aplicação...
@@ -1,13 +1,11 @@
 import os
 import subprocess
 import sys
-from datetime import datetime
-from pathlib import Path
-import json
 
 # Lista de dependências necessárias
 DEPENDENCIES = [
-    "matplotlib"
+    "matplotlib",
+    "numpy"
 ]
 
 # Função para verificar e instalar dependências
@@ -19,28 +17,23 @@ def check_and_install_dependencies():
             print(f"Pacote '{package}' não encontrado. Instalando...")
             subprocess.check_call([sys.executable, "-m", "pip", "install", package])
 
-# Função para verificar e limpar o cache, se necessário
-def check_and_clear_cache():
-    cache_file = Path("data_cache.json")
-    if cache_file.exists():
-        try:
-            with open(cache_file, "r") as f:
-                cache = json.load(f)
-                if "timestamps" in cache and cache["timestamps"]:
-                    last_timestamp = datetime.fromisoformat(cache["timestamps"][-1])
-                    if last_timestamp.date() < datetime.now().date():
-                        print("Cache é do dia anterior. Limpando...")
-                        cache_file.unlink()
-        except (json.JSONDecodeError, ValueError):
-            print("Erro ao ler o cache. Limpando...")
-            cache_file.unlink()
+# Função para apagar o histórico mais antigo que o período de retenção
+def prune_history():
+    # O histórico dos dias anteriores é mantido para análise pós-pregão;
+    # só as partições além de HistoryConfig.retention_days são apagadas
+    from config import HistoryConfig
+    from history_store import prune_partitions
+    config = HistoryConfig()
+    removed = prune_partitions(config.directory, config.retention_days)
+    if removed:
+        print(f"{removed} arquivos de histórico com mais de {config.retention_days} dias removidos.")
 
 # Função principal para iniciar a aplicação
 def main():
     print("Verificando dependências...")
     check_and_install_dependencies()
-    print("Verificando cache...")
-    check_and_clear_cache()
+    print("Verificando histórico...")
+    prune_history()
     print("Iniciando aplicação...")
     os.system(f"{sys.executable} main.py")
 
@@ -0,0 +1,44 @@
+"""Configuração comum dos testes: o projeto usa imports planos a partir de 'New - 2'.
+
+Uso: python -m pytest tests
+"""
+import sys
+from datetime import date, datetime, time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import DayPartition, to_ns  # noqa: E402
+
+
+SEP = '\001'
+
+
+def brksld_line(asset: str, code: str, volume: float, buy: float, sell: float,
+                passive: float = 0.0, name: str = '') -> str:
+    """Linha BRKSLD de 26 campos no layout do OpenFast"""
+    fields = ['BRKSLD', asset, '0', code, name or f'CORRETORA {code}', str(volume), '',
+              '128345.50', str(buy), str(sell)] + ['0'] * 5 + [str(passive), '0'] + ['0'] * 9
+    return SEP.join(fields)
+
+
+def at(day: date, hour: int, minute: int = 0, second: int = 0) -> int:
+    """Horário local do dia em epoch ns"""
+    return to_ns(datetime.combine(day, time(hour, minute, second)))
+
+
+@pytest.fixture
+def write_day():
+    """Grava o dia de um ativo em todas as camadas: write_day(diretório do ativo, dia, métricas, [(ts em ns, valores)])"""
+    def write(asset_dir: Path, day: date, keys, rows) -> DayPartition:
+        partition = DayPartition(asset_dir, day, keys)
+        for timestamp_ns, values in rows:
+            for segment, ts, record in partition.records(timestamp_ns, values):
+                segment.append(ts, record)
+        for segment, ts, record in partition.finish():
+            segment.append(ts, record)
+        partition.close()
+        return partition
+    return write
@@ -0,0 +1,57 @@
+"""AggregateEngine: totais incrementais contra a varredura completa (calcular_totais)."""
+import math
+import random
+
+from broker_store import BrokerStore
+from config import CORRETORAS_AGRESSIVO, CORRETORAS_VAREJO
+from models import AggregateEngine, calcular_totais
+from parsing import BrksldBatch
+
+# Nos dois grupos, só em um deles e em nenhum
+ONLY_ONE_GROUP = sorted(set(CORRETORAS_VAREJO) ^ set(CORRETORAS_AGRESSIVO))
+NAMES = [CORRETORAS_VAREJO[0], ONLY_ONE_GROUP[0], ONLY_ONE_GROUP[-1], 'OUTRA', 'MAIS UMA']
+
+
+def _assert_totals(store: BrokerStore, engine: AggregateEngine) -> None:
+    expected = calcular_totais(store)
+    for key, value in engine.totals().items():
+        assert math.isclose(value, expected[key], abs_tol=1e-6), key
+
+
+def _random_update(rng: random.Random):
+    code = str(rng.randrange(30))
+    return (code, rng.choice(NAMES), rng.uniform(0, 1e4), rng.uniform(1e5, 1.3e5),
+            rng.uniform(0, 1e4), rng.uniform(0, 1e4), rng.uniform(-1e4, 1e4), rng.uniform(-1e6, 1e6))
+
+
+def test_incremental_totals_match_full_scan():
+    rng = random.Random(11)
+    store = BrokerStore()
+    engine = AggregateEngine(store)
+    for step in range(2000):
+        store.update(*_random_update(rng), timestamp=float(step))
+        if step % 97 == 0:
+            _assert_totals(store, engine)
+    _assert_totals(store, engine)
+
+
+def test_batches_and_renames_match_full_scan():
+    rng = random.Random(5)
+    store = BrokerStore()
+    engine = AggregateEngine(store)
+    for step in range(50):
+        updates = [_random_update(rng) for _ in range(40)]
+        codes, names, volume, avg_price, buy, sell, passive, gross = (list(column) for column in zip(*updates))
+        store.apply_batch(BrksldBatch(codes, names, volume, avg_price, buy, sell, passive, gross), float(step))
+        _assert_totals(store, engine)
+
+
+def test_periodic_recompute_keeps_totals(monkeypatch):
+    monkeypatch.setattr(AggregateEngine, 'RECOMPUTE_EVERY', 25)
+    rng = random.Random(2)
+    store = BrokerStore()
+    engine = AggregateEngine(store)
+    for step in range(500):
+        store.update(*_random_update(rng), timestamp=float(step))
+    assert engine.deltas < 25
+    _assert_totals(store, engine)
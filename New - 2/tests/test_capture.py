@@ -0,0 +1,48 @@
+"""Captura do feed: gravação em sessões e reprodução."""
+import time
+
+from capture import MAGIC, RECORD_HEADER, CaptureWriter, ReplaySource, read_capture
+
+
+def _session(path, blocks):
+    writer = CaptureWriter(path)
+    for timestamp_ns, data in blocks:
+        writer.write(data, timestamp_ns)
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'feed.cap'
+    blocks = [(1_000, b'abc\n'), (2_000, memoryview(b'de')), (5_000, b'f\n')]
+    _session(path, blocks)
+    assert path.read_bytes().startswith(MAGIC)
+    assert list(read_capture(path)) == [(1_000, b'abc\n'), (2_000, b'de'), (5_000, b'f\n')]
+
+
+def test_appended_sessions_are_rebased(tmp_path):
+    # Segunda sessão com relógio monotônico de outra época (menor e muito maior)
+    path = tmp_path / 'feed.cap'
+    _session(path, [(10_000, b'a'), (20_000, b'b')])
+    _session(path, [(3_000, b'c'), (4_000, b'd')])
+    _session(path, [(9_000_000_000_000, b'e'), (9_000_000_500_000, b'f')])
+    records = list(read_capture(path))
+    assert [data for _, data in records] == [b'a', b'b', b'c', b'd', b'e', b'f']
+    assert [timestamp for timestamp, _ in records] == [10_000, 20_000, 20_000, 21_000, 21_000, 521_000]
+
+
+def test_legacy_capture_going_back_in_time_is_rebased(tmp_path):
+    path = tmp_path / 'legacy.cap'
+    with path.open('wb') as f:
+        f.write(b'ABDMCAP1')
+        for timestamp_ns, data in ((50_000, b'a'), (60_000, b'b'), (1_000, b'c')):
+            f.write(RECORD_HEADER.pack(timestamp_ns, len(data)) + data)
+    assert [timestamp for timestamp, _ in read_capture(path)] == [50_000, 60_000, 60_000]
+
+
+def test_replay_across_sessions_does_not_wait_for_epoch_gap(tmp_path):
+    path = tmp_path / 'feed.cap'
+    _session(path, [(1_000_000, b'a'), (2_000_000, b'b')])
+    _session(path, [(3_600_000_000_000, b'c')])  # Uma hora "depois" em outra época
+    started = time.monotonic()
+    assert list(ReplaySource(path, speed=1.0).chunks()) == [b'a', b'b', b'c']
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,89 @@
+"""Decimação min/max dos gráficos: MinMaxPyramid, minmax_decimate e TierRing.decimate."""
+import numpy as np
+import pytest
+
+from decimation import POINTS_PER_PIXEL, MinMaxPyramid, minmax_decimate
+from models import TierRing
+
+
+def _series(count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(count, dtype=np.int64) * 100_000_000
+    values = np.cumsum(rng.normal(size=(count, 2)), axis=0)
+    values[count // 3:count // 3 + 5, 0] = np.nan  # Lacuna
+    return timestamps, values
+
+
+def test_minmax_decimate_keeps_bin_extremes():
+    timestamps, values = _series(10_000)
+    x, y = minmax_decimate(timestamps, values[:, 0], None, 100)
+    assert len(x) <= 100 * POINTS_PER_PIXEL
+    assert np.all(np.diff(x) >= 0)
+    assert np.nanmax(y) == np.nanmax(values[:, 0]) and np.nanmin(y) == np.nanmin(values[:, 0])
+
+
+def test_minmax_decimate_short_series_unchanged():
+    timestamps, values = _series(50)
+    column = values[:, 1]
+    x, y = minmax_decimate(timestamps, column, None, 100)
+    assert x is timestamps and y is column
+
+
+def test_incremental_pyramid_matches_build():
+    timestamps, values = _series(5120)
+    incremental = MinMaxPyramid(capacity=4096, columns=2)
+    for sequence, (timestamp, row) in enumerate(zip(timestamps, values)):
+        incremental.add(sequence, int(timestamp), row)
+    built = MinMaxPyramid(capacity=4096, columns=2)
+    built.build(timestamps[-4096:], values[-4096:])
+    # build numera a partir de 0: compara os blocos da mesma posição relativa
+    offset = 5120 - 4096
+    compared = 0
+    for level_incremental, level_built in zip(incremental.levels, built.levels):
+        block = level_incremental.block
+        if offset % block:
+            continue
+        compared += 1
+        for built_id in range(4096 // block):
+            a = (built_id + offset // block) % level_incremental.size
+            b = built_id % level_built.size
+            np.testing.assert_array_equal(level_incremental.mins[a], level_built.mins[b])
+            np.testing.assert_array_equal(level_incremental.maxs[a], level_built.maxs[b])
+    assert compared == 3  # Blocos de 8, 64 e 512
+
+
+def test_pyramid_blocks_match_raw_reduction():
+    timestamps, values = _series(4000)
+    pyramid = MinMaxPyramid(capacity=4096, columns=2)
+    pyramid.build(timestamps, values)
+    first, stop, block_ts, mins, maxs = pyramid.blocks(100, 3900, 50, column=0)
+    block = (stop - first) // len(block_ts)
+    assert first % block == 0 and first >= 100 and stop <= 3900
+    reference = values[first:stop, 0].reshape(-1, block)
+    with np.errstate(invalid='ignore'):
+        np.testing.assert_array_equal(mins, np.fmin.reduce(reference, axis=1))
+        np.testing.assert_array_equal(maxs, np.fmax.reduce(reference, axis=1))
+    assert block_ts.tolist() == timestamps[first:stop:block].tolist()
+
+
+@pytest.fixture(scope='module')
+def wrapped_ring():
+    # Carga inicial e depois pontos novos até o buffer dar a volta
+    timestamps, values = _series(40_000, seed=4)
+    ring = TierRing(28_800, 2)
+    ring.fill(timestamps[:20_000], values[:20_000])
+    for timestamp, row in zip(timestamps[20_000:], values[20_000:]):
+        ring.add(int(timestamp), row)
+    return ring
+
+
+@pytest.mark.parametrize('first, stop, pixels', [(0, 28_800, 600), (123, 20_001, 500), (5000, 5900, 400)])
+def test_ring_decimate_preserves_envelope_and_endpoints(wrapped_ring, first, stop, pixels):
+    segment = wrapped_ring.matrix()[first:stop, 0]
+    segment_ts = wrapped_ring.timestamps_ns()[first:stop]
+    x, y = wrapped_ring.decimate(first, stop, 0, pixels)
+    assert len(x) <= pixels * POINTS_PER_PIXEL + 2
+    assert np.all(np.diff(x) >= 0)
+    assert x[0] == segment_ts[0] and x[-1] == segment_ts[-1]
+    assert y[0] == segment[0] and y[-1] == segment[-1]
+    assert np.nanmax(y) == np.nanmax(segment) and np.nanmin(y) == np.nanmin(segment)
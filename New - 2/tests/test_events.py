@@ -0,0 +1,100 @@
+"""EventBus e QueuedDispatcher: entrega, consolidação e políticas de descarte."""
+import pytest
+
+from events import (AggregatesChanged, BrokersChanged, ConnectionStateChanged, EventBus, PriceChanged,
+                    QueuedDispatcher, TotalsChanged)
+
+
+def test_synchronous_delivery_includes_subtypes():
+    bus = EventBus()
+    seen = []
+    bus.subscribe(TotalsChanged, seen.append)
+    bus.publish(PriceChanged('A', None, 2.0, 1.0))
+    bus.publish(AggregatesChanged('A', None, {}))
+    bus.publish(BrokersChanged('A', None, frozenset({'1'})))
+    assert [type(event) for event in seen] == [PriceChanged, AggregatesChanged]
+
+
+def test_unsubscribe_stops_delivery():
+    bus = EventBus()
+    seen = []
+    unsubscribe = bus.subscribe(PriceChanged, seen.append)
+    unsubscribe()
+    bus.publish(PriceChanged('A', None, 1.0, None))
+    assert seen == [] and not bus.has_subscribers()
+
+
+def test_totals_delivered_once_per_asset_per_drain():
+    bus = EventBus()
+    dispatcher = QueuedDispatcher()
+    calls = []
+    bus.subscribe(TotalsChanged, lambda event: calls.append(event.asset), dispatcher)
+    bus.publish(PriceChanged('A', None, 2.0, 1.0))
+    bus.publish(AggregatesChanged('A', None, {}))
+    bus.publish(PriceChanged('B', None, 5.0, 4.0))
+    bus.publish(PriceChanged('A', None, 3.0, 2.0))
+    assert dispatcher.drain() == 2
+    assert calls == ['A', 'B']
+    assert dispatcher.merged == 2
+
+
+def test_merge_keeps_first_previous_and_unions_codes():
+    bus = EventBus()
+    dispatcher = QueuedDispatcher()
+    prices, brokers, states = [], [], []
+    bus.subscribe(PriceChanged, prices.append, dispatcher)
+    bus.subscribe(BrokersChanged, brokers.append, dispatcher)
+    bus.subscribe(ConnectionStateChanged, states.append, dispatcher)
+    bus.publish(PriceChanged('A', None, 2.0, 1.0))
+    bus.publish(PriceChanged('A', None, 3.0, 2.0))
+    bus.publish(BrokersChanged('A', None, frozenset({'1'})))
+    bus.publish(BrokersChanged('A', None, frozenset({'2'})))
+    bus.publish(ConnectionStateChanged(None, 'backoff', 'connected'))
+    bus.publish(ConnectionStateChanged(None, 'connected', 'backoff'))
+    dispatcher.drain()
+    assert [(event.price, event.previous) for event in prices] == [(3.0, 1.0)]
+    assert [event.codes for event in brokers] == [frozenset({'1', '2'})]
+    assert [(event.state, event.previous) for event in states] == [('connected', 'connected')]
+
+
+@pytest.mark.parametrize('policy, kept', [('drop_oldest', [2.0, 3.0]), ('drop_newest', [1.0, 2.0])])
+def test_drop_policies(policy, kept):
+    bus = EventBus()
+    dispatcher = QueuedDispatcher(maxsize=2, policy=policy)
+    seen = []
+    bus.subscribe(PriceChanged, seen.append, dispatcher)
+    for price in (1.0, 2.0, 3.0):
+        bus.publish(PriceChanged('A', None, price, None))
+    dispatcher.drain()
+    assert [event.price for event in seen] == kept
+    assert dispatcher.dropped == 1
+
+
+def test_merge_policy_drops_oldest_key_when_full():
+    bus = EventBus()
+    dispatcher = QueuedDispatcher(maxsize=2)
+    seen = []
+    bus.subscribe(PriceChanged, seen.append, dispatcher)
+    for asset in ('A', 'B', 'C'):
+        bus.publish(PriceChanged(asset, None, 1.0, None))
+    dispatcher.drain()
+    assert [event.asset for event in seen] == ['B', 'C']
+
+
+def test_failing_handler_does_not_stop_delivery():
+    bus = EventBus()
+    dispatcher = QueuedDispatcher()
+    seen = []
+
+    def broken(event):
+        raise RuntimeError("falha do assinante")
+    bus.subscribe(PriceChanged, broken, dispatcher)
+    bus.subscribe(PriceChanged, seen.append, dispatcher)
+    bus.publish(PriceChanged('A', None, 1.0, None))
+    assert dispatcher.drain() == 2
+    assert len(seen) == 1
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        QueuedDispatcher(policy='lifo')
@@ -0,0 +1,24 @@
+"""Regressões do export.py."""
+from datetime import date
+
+import numpy as np
+
+from conftest import at
+from export import history_source, write_npy
+
+
+def test_history_keys_from_latest_partition(tmp_path, write_day):
+    # Partições com métricas diferentes: sem --keys, valem as da mais recente
+    first, second = date(2026, 3, 19), date(2026, 3, 20)
+    write_day(tmp_path / 'T', first, ['a'], [(at(first, 10), [1.0]), (at(first, 11), [2.0])])
+    write_day(tmp_path / 'T', second, ['a', 'b'], [(at(second, 10), [3.0, 30.0])])
+
+    source = history_source(tmp_path, 'T', None, None)
+    assert source.dtype.names == ('timestamp', 'a', 'b')
+    assert source.count == 3
+
+    out = tmp_path / 'out.npy'
+    write_npy(source, out)
+    data = np.load(out)
+    assert data['a'].tolist() == [1.0, 2.0, 3.0]
+    assert np.isnan(data['b'][:2]).all() and data['b'][2] == 30.0
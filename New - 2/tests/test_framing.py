@@ -0,0 +1,54 @@
+"""LineFramer: enquadramento de linhas sobre o buffer pré-alocado."""
+import random
+
+from framing import LineFramer
+
+
+def test_line_split_across_feeds_and_compaction():
+    # Buffer pequeno: as linhas parciais atravessam compactações e crescimentos
+    rng = random.Random(3)
+    framer = LineFramer(capacity=256, min_free=64)
+    lines = ['x' * rng.randint(0, 300) + str(i) for i in range(2000)]
+    data = ''.join(line + '\n' for line in lines).encode()
+    out = []
+    position = 0
+    while position < len(data):
+        size = rng.randint(1, 200)
+        framer.feed(data[position:position + size])
+        position += size
+        out.extend(framer.lines())
+    assert out == lines
+    assert len(framer) == 0
+
+
+def test_partial_line_survives_compaction():
+    framer = LineFramer(capacity=128, min_free=64)
+    framer.feed(b'a' * 100 + b'\n' + b'parcial')
+    assert list(framer.lines()) == ['a' * 100]
+    # Falta espaço no fim: a linha parcial é movida para o início do buffer
+    framer.feed(b'-continua' + b'b' * 60 + b'\n')
+    assert list(framer.lines()) == ['parcial-continua' + 'b' * 60]
+
+
+def test_tail_returns_last_received_bytes():
+    framer = LineFramer()
+    framer.feed(b'linha 1\nlin')
+    framer.feed(b'ha 2\n')
+    assert bytes(framer.tail(5)) == b'ha 2\n'
+    assert list(framer.lines()) == ['linha 1', 'linha 2']
+
+
+def test_crlf_delimiter_split_between_feeds():
+    framer = LineFramer(delimiter=b'\r\n')
+    framer.feed(b'abc\r')
+    assert list(framer.lines()) == []
+    framer.feed(b'\ndef\r\n')
+    assert list(framer.lines()) == ['abc', 'def']
+
+
+def test_crlf_stream_with_default_delimiter_keeps_carriage_return():
+    # Com o delimitador padrão, o '\r' fica na linha (como no laço antigo com split('\n'))
+    framer = LineFramer()
+    framer.feed(b'abc\r\nxy')
+    assert list(framer.lines()) == ['abc\r']
+    assert len(framer) == 2
@@ -0,0 +1,92 @@
+"""HistoryQuery: intervalos, reamostragem e séries alinhadas."""
+from datetime import date
+
+import numpy as np
+
+from conftest import at
+from history_query import HistoryQuery
+
+DAY = date(2026, 3, 20)
+SECOND = 1_000_000_000
+
+
+def test_aligned_uses_one_grid_for_assets_with_different_spans(tmp_path, write_day):
+    # A cobre 10:00:00-10:00:09, B cobre 10:00:05-10:00:19
+    write_day(tmp_path / 'A', DAY, ['x'], [(at(DAY, 10, 0, s), [float(s)]) for s in range(10)])
+    write_day(tmp_path / 'B', DAY, ['x'], [(at(DAY, 10, 0, s), [100.0 + s]) for s in range(5, 20)])
+
+    grid, values = HistoryQuery(tmp_path).aligned([('A', 'x'), ('B', 'x')], 5, None, None)
+
+    assert grid.tolist() == [at(DAY, 10, 0, s) for s in (0, 5, 10, 15)]
+    assert len(values[('A', 'x')]) == len(values[('B', 'x')]) == len(grid)
+    assert values[('A', 'x')][:2].tolist() == [4.0, 9.0]
+    assert np.isnan(values[('A', 'x')][2:]).all()
+    assert np.isnan(values[('B', 'x')][0])
+    assert values[('B', 'x')][1:].tolist() == [109.0, 114.0, 119.0]
+
+
+def _write_two_days(tmp_path, write_day):
+    # Dia 19: 09:00:00-09:00:59; dia 20: 10:00:00-10:00:59 (um ponto por segundo)
+    points = {}
+    for day, hour in ((date(2026, 3, 19), 9), (DAY, 10)):
+        points[day] = [(at(day, hour, 0, s), [float(hour * 100 + s), float(s % 7)]) for s in range(60)]
+        write_day(tmp_path / 'A', day, ['x', 'y'], points[day])
+    return points
+
+
+def test_range_crosses_partitions_and_is_inclusive(tmp_path, write_day):
+    points = _write_two_days(tmp_path, write_day)
+    query = HistoryQuery(tmp_path)
+    start, end = at(date(2026, 3, 19), 9, 0, 50), at(DAY, 10, 0, 5)
+    timestamps, columns = query.range('A', start, end)
+    expected = [point for day in sorted(points) for point in points[day] if start <= point[0] <= end]
+    assert timestamps.tolist() == [timestamp for timestamp, _ in expected]
+    assert columns['x'].tolist() == [values[0] for _, values in expected]
+    assert set(columns) == {'x', 'y'}
+
+
+def test_range_cache_invalidated_by_new_records(tmp_path, write_day):
+    _write_two_days(tmp_path, write_day)
+    query = HistoryQuery(tmp_path)
+    first = query.range('A', at(DAY, 10), None, ['x'])
+    assert query.range('A', at(DAY, 10), None, ['x']) is first
+    assert query.hits == 1
+    write_day(tmp_path / 'A', DAY, ['x', 'y'], [(at(DAY, 11), [1.0, 2.0])])
+    timestamps, _ = query.range('A', at(DAY, 10), None, ['x'])
+    assert timestamps[-1] == at(DAY, 11)
+
+
+def test_resample_matches_reference(tmp_path, write_day):
+    points = _write_two_days(tmp_path, write_day)[DAY]
+    query = HistoryQuery(tmp_path)
+    start, end = at(DAY, 10), at(DAY, 10, 0, 59)
+    values = np.array([values[0] for _, values in points])
+    for how in ('last', 'mean', 'ohlc'):
+        result = query.resample('A', 10, start, end, ['x'], how)
+        assert result.timestamps_ns.tolist() == [at(DAY, 10, 0, s) for s in range(0, 60, 10)]
+        buckets = values.reshape(6, 10)
+        column = result.columns['x']
+        if how == 'last':
+            assert result.tier == '10s'
+            assert column.tolist() == buckets[:, -1].tolist()
+        elif how == 'mean':
+            assert np.allclose(column, buckets.mean(axis=1))
+        else:
+            expected = np.stack([buckets[:, 0], buckets.max(axis=1), buckets.min(axis=1), buckets[:, -1]], axis=1)
+            assert column.tolist() == expected.tolist()
+        if how != 'last':
+            assert result.counts.tolist() == [10] * 6
+
+
+def test_resample_last_reads_open_bucket_from_raw(tmp_path, write_day):
+    # end corta o último balde de 1 min: o valor vem da camada raw, não do ponto consolidado
+    _write_two_days(tmp_path, write_day)
+    result = HistoryQuery(tmp_path).resample('A', 60, at(DAY, 10), at(DAY, 10, 0, 30), ['x'], 'last')
+    assert result.columns['x'].tolist() == [1030.0]
+
+
+def test_resample_empty_buckets_are_nan(tmp_path, write_day):
+    _write_two_days(tmp_path, write_day)
+    result = HistoryQuery(tmp_path).resample('A', 60, at(DAY, 9, 59), at(DAY, 10, 1), ['x'], 'mean')
+    assert np.isnan(result.columns['x'][0]) and np.isnan(result.columns['x'][2])
+    assert result.counts.tolist() == [0, 60, 0]
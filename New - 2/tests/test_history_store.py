@@ -0,0 +1,63 @@
+"""Partições do histórico: camadas consolidadas e o buffer circular em memória."""
+from datetime import date
+
+import numpy as np
+
+from conftest import at
+from history_store import TIERS, partition_path, partition_paths, read_segment
+from models import TierRing
+
+DAY = date(2026, 3, 20)
+STEP = 250_000_000  # 4 pontos por segundo
+
+
+def _points(count: int, start: int):
+    return [(start + i * STEP, (float(i), float(i % 13))) for i in range(count)]
+
+
+def _last_per_bucket(points, resolution):
+    buckets = {}
+    for timestamp, values in points:
+        buckets[timestamp // resolution] = (timestamp, values)
+    return [buckets[bucket] for bucket in sorted(buckets)]
+
+
+def test_rollup_tiers_keep_last_point_of_each_bucket(tmp_path, write_day):
+    points = _points(4 * 150 + 3, at(DAY, 10, 0, 7))  # 2min30s, com baldes parciais nas pontas
+    write_day(tmp_path, DAY, ['x', 'y'], points)
+    for tier, resolution in TIERS:
+        timestamps, rows = read_segment(partition_path(tmp_path, DAY, tier))
+        expected = points if not resolution else _last_per_bucket(points, resolution)
+        assert timestamps == [timestamp for timestamp, _ in expected], tier
+        assert rows == [values for _, values in expected], tier
+
+
+def test_partition_paths_select_overlapping_days(tmp_path, write_day):
+    days = [date(2026, 3, 18), date(2026, 3, 19), date(2026, 3, 20)]
+    for day in days:
+        write_day(tmp_path, day, ['x', 'y'], _points(4, at(day, 12)))
+    assert partition_paths(tmp_path, 'raw') == [partition_path(tmp_path, day, 'raw') for day in days]
+    selected = partition_paths(tmp_path, '1s', at(days[1], 0), at(days[1], 23))
+    assert selected == [partition_path(tmp_path, days[1], '1s')]
+
+
+def test_tier_ring_replaces_open_bucket_and_wraps():
+    ring = TierRing(capacity=5, columns=1, resolution=10)
+    for timestamp in range(0, 100, 4):
+        ring.add(timestamp, [float(timestamp)])
+    # Um ponto por balde de 10, o último de cada um; só os 5 mais recentes ficam
+    assert ring.full
+    assert ring.timestamps_ns().tolist() == [56, 68, 76, 88, 96]
+    assert ring.matrix()[:, 0].tolist() == [56.0, 68.0, 76.0, 88.0, 96.0]
+    timestamps, matrix = ring.window(70, 90)
+    assert timestamps.tolist() == [76, 88]
+    assert np.shares_memory(matrix, ring.matrix())
+
+
+def test_tier_ring_prepend_fills_free_space():
+    ring = TierRing(capacity=4, columns=1)
+    ring.add(10, [1.0])
+    ring.add(11, [2.0])
+    added = ring.prepend(np.array([5, 6, 7], dtype=np.int64), np.array([[0.5], [0.6], [0.7]]))
+    assert added == 2
+    assert ring.timestamps_ns().tolist() == [6, 7, 10, 11]
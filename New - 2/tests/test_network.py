@@ -0,0 +1,67 @@
+"""Reconexão da thread de leitura: backoff exponencial e reassinatura."""
+import pytest
+
+from config import ServerConfig
+from network import MarketConnection
+
+
+class ClosedSocket:
+    """Socket que aceita a conexão e é encerrado pelo servidor na primeira leitura"""
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv_into(self, buffer, nbytes=0):
+        return 0
+
+    def sendall(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+def _run(connection, results, retries):
+    """Roda o laço de leitura com _connect simulado; devolve as esperas de backoff"""
+    delays = []
+    outcomes = iter(results)
+
+    def connect():
+        connection.stats.connects += 1
+        if next(outcomes):
+            connection.socket = ClosedSocket()
+            return True
+        return False
+
+    def wait(delay):
+        delays.append(delay)
+        return len(delays) >= retries
+
+    connection._connect = connect
+    connection._stop_event.wait = wait
+    connection._running.set()
+    connection._reader_loop()
+    return delays
+
+
+@pytest.fixture
+def connection():
+    config = ServerConfig(reconnect_initial_delay=0.5, reconnect_max_delay=3.0, reconnect_jitter=0.0)
+    return MarketConnection(config, autoconnect=False)
+
+
+def test_first_retry_after_disconnect_waits_initial_delay(connection):
+    delays = _run(connection, [True, False, False, False, False], retries=5)
+    assert delays == [0.5, 1.0, 2.0, 3.0, 3.0]
+    assert connection.stats.disconnects == 1
+
+
+def test_refused_connections_back_off_from_initial_delay(connection):
+    delays = _run(connection, [False, False, False], retries=3)
+    assert delays == [0.5, 1.0, 2.0]
+
+
+def test_backoff_keeps_growing_when_connections_drop_without_data(connection):
+    # Só dados recebidos zeram o backoff
+    delays = _run(connection, [True, True, True], retries=3)
+    assert delays == [0.5, 1.0, 2.0]
@@ -0,0 +1,81 @@
+"""Parser BRKSLD em lote (parse_brksld_block + BrokerStore.apply_batch) contra o linha a linha."""
+import logging
+import math
+
+from broker_store import NUMERIC_COLUMNS
+from config import ServerConfig
+from conftest import brksld_line
+from models import calcular_totais
+from network import MarketConnection
+from parsing import parse_brksld_block
+
+
+class TickSink:
+    """Registra (código, volume) de cada atualização, como o TickRecorder"""
+
+    def __init__(self):
+        self.updates = []
+
+    def record(self, store, row, timestamp):
+        self.updates.append((store.codes[row], store.volume[row]))
+
+
+def _lines():
+    lines = []
+    for i in range(300):
+        code = str(i % 7)
+        name = 'RENOMEADA' if i == 250 else ''
+        lines.append(brksld_line('WINJ25' if i % 3 else 'WDOK25', code, 1000 + i, 500 + i, 300 + 2 * i, i * 3, name))
+    lines.append('BRKSLD' + '\001WINJ25')  # Campos insuficientes: ignorada nos dois caminhos
+    return lines
+
+
+def _connection(sink_assets=()):
+    connection = MarketConnection(ServerConfig(), autoconnect=False)
+    connection.logger.setLevel(logging.INFO)
+    sinks = {}
+    for asset in sink_assets:
+        sinks[asset] = connection._asset_state(asset).brokers.ticks = TickSink()
+    return connection, sinks
+
+
+def test_block_matches_per_line():
+    lines = _lines()
+    reference, _ = _connection()
+    for line in lines:
+        reference._process_line(line)
+    candidate, _ = _connection()
+    candidate._process_brksld_block(lines)
+
+    assert reference.assets.keys() == candidate.assets.keys()
+    for asset, state in reference.assets.items():
+        expected, actual = state.brokers, candidate.assets[asset].brokers
+        assert expected.codes == actual.codes
+        assert expected.names == actual.names
+        for column in NUMERIC_COLUMNS:
+            if column != 'timestamp':
+                assert getattr(expected, column) == getattr(actual, column), column
+        totals = candidate.assets[asset].aggregates.totals()
+        for key, value in calcular_totais(expected).items():
+            assert math.isclose(totals[key], value, abs_tol=1e-6), key
+
+
+def test_block_records_every_update():
+    # Linhas repetidas da mesma corretora no bloco chegam todas ao registro de ticks
+    lines = _lines()
+    reference, expected = _connection(('WINJ25', 'WDOK25'))
+    for line in lines:
+        reference._process_line(line)
+    candidate, actual = _connection(('WINJ25', 'WDOK25'))
+    candidate._process_brksld_block(lines)
+    for asset in expected:
+        assert actual[asset].updates == expected[asset].updates
+        assert len(actual[asset].updates) == sum(1 for line in lines[:-1] if f'\001{asset}\001' in line)
+
+
+def test_parse_keeps_repeated_lines_in_order():
+    lines = [brksld_line('WINJ25', '1', 10, 1, 0), brksld_line('WINJ25', '2', 20, 1, 0),
+             brksld_line('WINJ25', '1', 30, 1, 0)]
+    batch = parse_brksld_block(lines)['WINJ25']
+    assert batch.codes == ['1', '2', '1']
+    assert batch.volume == [10.0, 20.0, 30.0]
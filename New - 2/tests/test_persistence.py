@@ -0,0 +1,73 @@
+"""PersistenceWorker: gravação em lote e encerramento."""
+import threading
+import time
+
+import pytest
+
+from config import PersistenceConfig
+from history_store import HistorySegment, read_segment
+from persistence import _STOP, PersistenceWorker
+
+
+@pytest.fixture
+def segment(tmp_path):
+    segment = HistorySegment(tmp_path / 'a.raw.hist', ['x', 'y'])
+    yield segment
+    segment.close()
+
+
+@pytest.mark.parametrize('durability', ['none', 'interval', 'fsync'])
+def test_close_writes_every_submitted_point(segment, durability):
+    worker = PersistenceWorker(PersistenceConfig(batch_size=64, durability=durability))
+    for i in range(1000):
+        assert worker.submit(segment, i, (float(i), -float(i)))
+    assert worker.close(timeout=5.0)
+    segment.flush()
+    timestamps, rows = read_segment(segment.path)
+    assert timestamps == list(range(1000))
+    assert rows[-1] == (999.0, -999.0)
+    stats = worker.stats()
+    assert stats['written'] == 1000 and stats['dropped'] == 0 and stats['batches'] >= 1000 // 64
+
+
+def test_flush_interval_writes_without_close(segment):
+    worker = PersistenceWorker(PersistenceConfig(batch_size=10_000, flush_interval=0.05))
+    worker.submit(segment, 1, (1.0, 2.0))
+    deadline = time.monotonic() + 2.0
+    while worker.stats()['written'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert worker.stats()['written'] == 1
+    assert worker.close()
+
+
+def test_full_queue_drops_and_counts(segment):
+    worker = PersistenceWorker(PersistenceConfig(queue_size=5))
+    # Thread parada antes: nada é consumido da fila
+    worker.queue.put(_STOP)
+    worker._thread.join()
+    results = [worker.submit(segment, i, (0.0, 0.0)) for i in range(8)]
+    assert results.count(False) == 3
+    assert worker.stats()['dropped'] == 3
+
+
+def test_close_returns_promptly_when_thread_died_with_full_queue(segment):
+    worker = PersistenceWorker(PersistenceConfig(queue_size=3))
+    worker.queue.put(_STOP)
+    worker._thread.join()
+    for i in range(3):
+        worker.submit(segment, i, (0.0, 0.0))
+    started = time.monotonic()
+    assert worker.close(timeout=0.5)
+    assert time.monotonic() - started < 0.5
+
+
+def test_close_reports_stalled_writer(segment, monkeypatch):
+    release = threading.Event()
+    worker = PersistenceWorker(PersistenceConfig(batch_size=1))
+    monkeypatch.setattr(worker, '_flush', lambda *args, **kwargs: release.wait(10))
+    for i in range(3):
+        worker.submit(segment, i, (0.0, 0.0))
+    try:
+        assert worker.close(timeout=0.2) is False
+    finally:
+        release.set()
@@ -0,0 +1,81 @@
+"""Anel de snapshots em memória compartilhada: criação e segmentos já existentes."""
+import os
+import struct
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import pytest
+
+from models import MarketSnapshot
+from shm_ring import HEADER, SnapshotRingReader, SnapshotRingWriter
+
+
+@pytest.fixture
+def name():
+    return f'abdm_test_{uuid.uuid4().hex[:12]}'
+
+
+def _snapshot() -> MarketSnapshot:
+    return MarketSnapshot(timestamp=datetime.now(), assets={})
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_publish_and_read(name):
+    writer = SnapshotRingWriter(name, slots=2, slot_size=1 << 16)
+    reader = SnapshotRingReader(name)
+    try:
+        assert writer.publish(_snapshot()) == 1
+        assert isinstance(reader.read_latest(), MarketSnapshot)
+        assert reader.read_latest() is None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_live_ring_is_not_replaced(name):
+    writer = SnapshotRingWriter(name, slots=2, slot_size=1 << 16)
+    try:
+        writer.publish(_snapshot())
+        with pytest.raises(FileExistsError, match=str(os.getpid())):
+            SnapshotRingWriter(name, slots=2, slot_size=1 << 16)
+        reader = SnapshotRingReader(name)
+        assert reader.latest_seq() == 1
+        reader.close()
+    finally:
+        writer.close()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="No Windows o segmento some com o último handle")
+def test_stale_ring_is_replaced(name):
+    writer = SnapshotRingWriter(name, slots=2, slot_size=1 << 16)
+    writer.publish(_snapshot())
+    # Simula um escritor encerrado sem close(): o segmento fica com o pid morto
+    struct.pack_into('<I', writer.buf, HEADER.size - 8, _dead_pid())
+    writer.buf = None
+    writer.shm.close()
+    replacement = SnapshotRingWriter(name, slots=2, slot_size=1 << 16)
+    try:
+        reader = SnapshotRingReader(name)
+        assert reader.latest_seq() == 0
+        reader.close()
+    finally:
+        replacement.close()
+
+
+def test_foreign_segment_is_not_removed(name):
+    foreign = shared_memory.SharedMemory(name=name, create=True, size=64)
+    try:
+        with pytest.raises(FileExistsError):
+            SnapshotRingWriter(name, slots=2, slot_size=1 << 16)
+        shared_memory.SharedMemory(name=name).close()
+    finally:
+        foreign.close()
+        foreign.unlink()
@@ -0,0 +1,39 @@
+"""TickStore: gravação em lote e contabilidade de perdas."""
+import sqlite3
+
+from config import TickStoreConfig
+from tick_store import TickStore
+
+
+def _tick(code, ts):
+    return ('WINJ25', code, ts, 100.0, 1.0, 10.0, 5.0, 5.0, 0.0, 0.0)
+
+
+def test_writes_ticks_and_names(tmp_path):
+    store = TickStore(TickStoreConfig(enabled=True, path=tmp_path / 'ticks.db'))
+    store.submit_name('1', 'CORRETORA 1')
+    for i in range(10):
+        store.submit(_tick('1', float(i)))
+    store.close()
+    stats = store.stats()
+    assert stats['written'] == 10 and stats['dropped'] == 0
+    with sqlite3.connect(tmp_path / 'ticks.db') as connection:
+        assert connection.execute("SELECT COUNT(*) FROM broker_ticks").fetchone() == (10,)
+        assert connection.execute("SELECT name FROM brokers WHERE code = '1'").fetchone() == ('CORRETORA 1',)
+
+
+def test_failed_batch_counts_as_dropped_and_keeps_names(tmp_path):
+    path = tmp_path / 'ticks.db'
+    store = TickStore(TickStoreConfig(enabled=True, path=path))
+    # Sem a tabela de ticks, a gravação do lote falha
+    with sqlite3.connect(path) as connection:
+        connection.execute("DROP TABLE broker_ticks")
+    store.submit_name('7', 'CORRETORA 7')
+    for i in range(3):
+        store.submit(_tick('7', float(i)))
+    store.close()
+    stats = store.stats()
+    assert stats['written'] == 0
+    assert stats['dropped'] == 3
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT name FROM brokers WHERE code = '7'").fetchone() == ('CORRETORA 7',)
@@ -0,0 +1,279 @@
+"""Registro durável, por corretora, de cada atualização BRKSLD em SQLite.
+
+A thread de leitura só anexa uma tupla a um buffer em memória; uma thread
+própria grava os lotes com executemany em uma transação, com o banco em
+modo WAL (leituras, como o relatório, não bloqueiam a gravação).
+
+Relatório de fim de dia:
+    python tick_store.py --db ticks.db --asset WINJ25 [--day 2026-03-21] [--top 20]
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import TickStoreConfig
+from utils.flush_stats import FlushStats
+from utils.logger import setup_logger
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS broker_ticks (
+    asset TEXT NOT NULL,
+    broker TEXT NOT NULL,
+    ts REAL NOT NULL,
+    volume REAL,
+    avg_price REAL,
+    aggr_buy REAL,
+    aggr_sell REAL,
+    net_aggr REAL,
+    passive_net REAL,
+    gross_pl REAL
+);
+CREATE INDEX IF NOT EXISTS broker_ticks_asset_broker_ts ON broker_ticks (asset, broker, ts);
+CREATE TABLE IF NOT EXISTS brokers (
+    code TEXT PRIMARY KEY,
+    name TEXT
+);
+"""
+
+INSERT_TICK = "INSERT INTO broker_ticks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+UPSERT_BROKER = "INSERT INTO brokers (code, name) VALUES (?, ?) ON CONFLICT (code) DO UPDATE SET name = excluded.name"
+
+
+class TickRecorder:
+    """Gancho do BrokerStore de um ativo (BrokerStore.ticks): enfileira cada linha alterada"""
+    __slots__ = ('asset', 'tick_store', 'names')
+
+    def __init__(self, tick_store: 'TickStore', asset: str):
+        self.asset = asset
+        self.tick_store = tick_store
+        self.names: Dict[str, str] = {}  # Último nome enviado por código
+
+    def record(self, store, row: int, timestamp: float) -> None:
+        code = store.codes[row]
+        name = store.names[row]
+        if self.names.get(code) != name:
+            self.names[code] = name
+            self.tick_store.submit_name(code, name)
+        self.tick_store.submit((
+            self.asset, code, timestamp,
+            store.volume[row], store.avg_price[row], store.aggr_buy[row], store.aggr_sell[row],
+            store.net_aggr[row], store.passive_net[row], store.gross_pl[row],
+        ))
+
+
+class TickStore:
+    """Grava as atualizações das corretoras em SQLite em uma thread própria.
+
+    submit() não bloqueia: anexa a um deque limitado (append é atômico no
+    CPython) e só acorda a thread quando um lote está pronto. Acima de
+    queue_size atualizações pendentes, as novas são descartadas e contadas.
+    """
+
+    def __init__(self, config: Optional[TickStoreConfig] = None):
+        self.config = config or TickStoreConfig()
+        self.synchronous = self.config.synchronous.upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(
+                f"Modo synchronous desconhecido: {self.config.synchronous} "
+                f"(use {', '.join(SYNCHRONOUS_MODES)})"
+            )
+        self.logger = setup_logger('ABDM.TickStore')
+        self.path = Path(self.config.path)
+        self._ticks = deque()
+        self._names = deque()
+        self._wake = threading.Event()
+        self._running = True
+        self.flush_stats = FlushStats()
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name='ABDM-TickStore', daemon=True)
+        self._thread.start()
+        # A conexão é aberta na própria thread; erros de abertura aparecem aqui
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def recorder(self, asset: str) -> TickRecorder:
+        return TickRecorder(self, asset)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._ticks)
+
+    def submit(self, tick: tuple) -> bool:
+        ticks = self._ticks
+        if len(ticks) >= self.config.queue_size:
+            self.flush_stats.dropped += 1
+            dropped = self.flush_stats.dropped
+            if dropped == 1 or dropped % 10000 == 0:
+                self.logger.warning(f"Fila do registro de ticks cheia: {dropped} atualizações descartadas")
+            return False
+        ticks.append(tick)
+        if len(ticks) >= self.config.batch_size and not self._wake.is_set():
+            self._wake.set()
+        return True
+
+    def submit_name(self, code: str, name: str) -> None:
+        self._names.append((code, name))
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _run(self) -> None:
+        try:
+            connection = self._connect()
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.logger.info(f"Registro de ticks em {self.path} (WAL, synchronous={self.synchronous})")
+        next_stats = time.monotonic() + self.config.stats_interval
+        try:
+            while True:
+                self._wake.wait(self.config.flush_interval)
+                self._wake.clear()
+                running = self._running
+                while self._ticks or self._names:
+                    self._flush(connection)
+                    if len(self._ticks) < self.config.batch_size and running:
+                        break
+                if not running:
+                    break
+                if time.monotonic() >= next_stats:
+                    self._log_stats()
+                    next_stats = time.monotonic() + self.config.stats_interval
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, sql: str, rows: list) -> bool:
+        """Grava as linhas em uma transação; em erro, desfaz e retorna False"""
+        try:
+            connection.execute("BEGIN")
+            connection.executemany(sql, rows)
+            connection.execute("COMMIT")
+            return True
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self.logger.error(f"Erro ao gravar {len(rows)} linhas em {self.path}: {e}", exc_info=True)
+            return False
+
+    def _flush(self, connection: sqlite3.Connection) -> None:
+        started = time.perf_counter()
+        ticks = self._ticks
+        batch = [ticks.popleft() for _ in range(min(len(ticks), self.config.batch_size))]
+        names = self._names
+        renamed = [names.popleft() for _ in range(len(names))]
+        # Nomes em transação própria: um lote de ticks com erro não leva os nomes junto
+        if renamed and not self._write(connection, UPSERT_BROKER, renamed):
+            if self._running:
+                # Voltam para a frente da fila; nomes mais novos, enfileirados depois, prevalecem
+                names.extendleft(reversed(renamed))
+            else:
+                self.logger.error(f"{len(renamed)} nomes de corretoras não gravados no encerramento")
+        if not batch:
+            return
+        if not self._write(connection, INSERT_TICK, batch):
+            self.flush_stats.dropped += len(batch)
+            return
+        self.flush_stats.record(len(batch), time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, float]:
+        return self.flush_stats.as_dict(self.queue_depth)
+
+    def _log_stats(self) -> None:
+        self.flush_stats.log(self.logger, "Registro de ticks", "ticks", self.queue_depth)
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Grava o que estiver pendente e encerra a thread"""
+        self._running = False
+        self._wake.set()
+        self._thread.join(timeout)
+        self._log_stats()
+
+
+def broker_report(db_path: Path, asset: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None) -> List[Dict[str, object]]:
+    """Resumo por corretora no período: ticks, primeiro/último horário, saldos finais e variação.
+
+    Usa o índice (asset, broker, ts): o primeiro e o último tick de cada
+    corretora são buscas no índice, sem varrer a tabela.
+    """
+    start_ts = start.timestamp() if start is not None else float('-inf')
+    end_ts = end.timestamp() if end is not None else float('inf')
+    query = """
+        WITH span AS (
+            SELECT broker, COUNT(*) AS ticks, MIN(ts) AS first_ts, MAX(ts) AS last_ts
+            FROM broker_ticks
+            WHERE asset = :asset AND ts BETWEEN :start AND :end
+            GROUP BY broker
+        )
+        SELECT span.broker, brokers.name, span.ticks, span.first_ts, span.last_ts,
+               last.volume, last.net_aggr, last.passive_net, last.gross_pl,
+               last.net_aggr - first.net_aggr, last.passive_net - first.passive_net
+        FROM span
+        JOIN broker_ticks AS last
+          ON last.asset = :asset AND last.broker = span.broker AND last.ts = span.last_ts
+        JOIN broker_ticks AS first
+          ON first.asset = :asset AND first.broker = span.broker AND first.ts = span.first_ts
+        LEFT JOIN brokers ON brokers.code = span.broker
+        GROUP BY span.broker
+        ORDER BY last.net_aggr DESC
+    """
+    connection = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(query, {'asset': asset, 'start': start_ts, 'end': end_ts}).fetchall()
+    finally:
+        connection.close()
+    columns = ('broker', 'name', 'ticks', 'first', 'last', 'volume', 'net_aggr',
+               'passive_net', 'gross_pl', 'net_aggr_change', 'passive_net_change')
+    report = []
+    for row in rows:
+        entry = dict(zip(columns, row))
+        entry['first'] = datetime.fromtimestamp(entry['first'])
+        entry['last'] = datetime.fromtimestamp(entry['last'])
+        report.append(entry)
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Relatório por corretora a partir do registro de ticks")
+    parser.add_argument('--db', type=Path, default=TickStoreConfig().path)
+    parser.add_argument('--asset', required=True)
+    parser.add_argument('--day', type=date.fromisoformat, help="Dia do relatório (padrão: hoje)")
+    parser.add_argument('--top', type=int, default=0, help="Mostra só as N primeiras corretoras")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    day = args.day or date.today()
+    start = datetime.combine(day, dt_time())
+    report = broker_report(args.db, args.asset, start, start + timedelta(days=1))
+    if args.top:
+        report = report[:args.top]
+    print(f"{args.asset} em {day}: {len(report)} corretoras")
+    print(f"{'Código':>8} {'Nome':<24} {'Ticks':>7} {'Primeiro':>8} {'Último':>8} "
+          f"{'Net Agressão':>14} {'Var. Agressão':>14} {'Net Passivo':>14} {'Var. Passivo':>14}")
+    for entry in report:
+        print(f"{entry['broker']:>8} {(entry['name'] or '')[:24]:<24} {entry['ticks']:>7} "
+              f"{entry['first']:%H:%M:%S} {entry['last']:%H:%M:%S} "
+              f"{entry['net_aggr']:>14,.0f} {entry['net_aggr_change']:>14,.0f} "
+              f"{entry['passive_net']:>14,.0f} {entry['passive_net_change']:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import time
 import tkinter as tk
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
@@ -6,23 +7,35 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from utils.logger import setup_logger
 import matplotlib.ticker as ticker
+import numpy as np
+
+# Os timestamps chegam em UTC (datetime64 do HistoricalData); o eixo mostra o horário local
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+STATS_INTERVAL = 60.0  # Intervalo entre logs do tempo de renderização (segundos)
+X_HEADROOM = 0.05  # Folga à direita (fração do período) para novos pontos não mudarem o eixo X
 
 class ChartPanel(tk.Frame):
-    def __init__(self, parent, title):
+    def __init__(self, parent, title, scale=1e9, suffix='B'):
         super().__init__(parent)
         self.title = title
+        # Escala do eixo Y e do rótulo do valor atual (financeiro em bilhões por padrão)
+        self.scale = scale
+        self.suffix = suffix
         self.logger = setup_logger(f"Chart_{title}")
         
         # Configura grid weights
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
         
-        self.setup_chart()
         self.timestamps = []
         self.values = []
-        self.line = None
-        self.zero_line = None
-        self.value_text = None
+        self.background = None  # Figura sem os artistas animados, para o blit
+        self.render_times = []  # Segundos por atualização desde o último log
+        self.render_max = 0.0
+        self.full_draws = 0  # Desenhos completos e por blit desde o último log
+        self.blits = 0
+        self.next_stats = time.monotonic() + STATS_INTERVAL
+        self.setup_chart()
 
     def setup_chart(self):
         """Configura o gráfico inicial"""
@@ -38,16 +51,52 @@ class ChartPanel(tk.Frame):
         self.zero_line = self.ax.axhline(y=0, color='red', linestyle='-', linewidth=1.5, zorder=2)
         self.ax.grid(True, axis='y', which='both', zorder=1)
         
-        # Configuração dos eixos
-        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+        # Linha e rótulo do valor atual são criados uma vez e só atualizados; como
+        # animated, ficam fora do desenho completo e são redesenhados por blit
+        self.line, = self.ax.plot([], [], '-', color='blue', zorder=3, animated=True)
+        self.value_text = self.ax.text(
+            1.02, 0, '',
+            transform=self.ax.get_yaxis_transform(),
+            bbox=dict(
+                boxstyle='round,pad=0.5',
+                fc='white',
+                ec='gray',
+                alpha=1
+            ),
+            verticalalignment='center',
+            horizontalalignment='left',
+            zorder=5,
+            animated=True,
+            visible=False,
+        )
+
+        # Configuração dos eixos (X em números de data do matplotlib, convertidos em update)
+        self.ax.xaxis.set_major_locator(mdates.AutoDateLocator(tz=LOCAL_TZ))
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S', tz=LOCAL_TZ))
         self.ax.xaxis.set_tick_params(rotation=0)
-        self.ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'{x/1e9:.1f}B'))
+        self.ax.yaxis.set_major_formatter(ticker.FuncFormatter(self.format_value))
         self.ax.yaxis.tick_right()
         self.ax.yaxis.set_label_position('right')
         
         # Configura o canvas usando grid
         self.canvas = FigureCanvasTkAgg(self.figure, self)
         self.canvas.get_tk_widget().grid(row=0, column=0, sticky='nsew')
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event=None):
+        """Após cada desenho completo: guarda o fundo e desenha os artistas animados"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.value_text)
+
+    def plot_width(self) -> int:
+        """Largura da área do gráfico em pixels"""
+        return max(1, int(self.ax.bbox.width))
+
+    def format_value(self, value, position=None):
+        if self.scale == 1:
+            return f'{value:,.0f}{self.suffix}'
+        return f'{value / self.scale:.1f}{self.suffix}'
 
     def on_resize(self, event=None):
         """Ajusta o tamanho do gráfico quando a janela é redimensionada"""
@@ -76,65 +125,94 @@ class ChartPanel(tk.Frame):
         root = self.winfo_toplevel()
         root.attributes('-fullscreen', False)
 
+    def _x_limits_stale(self, first: float, last: float) -> bool:
+        low, high = self.ax.get_xlim()
+        # Dados fora dos limites, ou o início avançou mais de 10% do período (ex.: troca de camada)
+        return first < low or last > high or first - low > (high - low) * 0.1
+
+    def _y_limits_stale(self, ymin: float, ymax: float) -> bool:
+        low, high = self.ax.get_ylim()
+        wanted_low, wanted_high = self._y_limits(ymin, ymax)
+        # Dados fora dos limites, ou ocupando menos da metade da altura
+        return ymin < low or ymax > high or (wanted_high - wanted_low) < (high - low) * 0.5
+
+    @staticmethod
+    def _y_limits(ymin: float, ymax: float):
+        margin = (ymax - ymin) * 0.1 if ymax != ymin else abs(ymax) * 0.1
+        return min(ymin - margin, 0), max(ymax + margin, 0)
+
     def update(self, timestamps, values):
-        """Atualiza o gráfico com novos dados"""
+        """Atualiza o gráfico com novos dados.
+
+        Linha e rótulo são atualizados no lugar; só quando os dados saem dos
+        limites atuais os eixos são recalculados e a figura inteira é
+        redesenhada. Nos demais casos, restaura o fundo e redesenha por blit
+        apenas a linha e o rótulo.
+        """
+        started = time.perf_counter()
         try:
-            if not timestamps or not values:
+            if len(timestamps) == 0 or len(values) == 0:
                 self.logger.warning(f"Dados vazios para gráfico {self.title}")
                 return
 
-            # Atualiza os dados
+            # Atualiza os dados (views numpy são usadas sem cópia)
             self.timestamps = timestamps
-            self.values = [float(v) for v in values]
+            self.values = np.asarray(values, dtype=float)
+            x = mdates.date2num(timestamps)
+            self.line.set_data(x, self.values)
 
-            # Remove elementos anteriores
-            if self.line:
-                self.line.remove()
-            if hasattr(self, 'value_text') and self.value_text:
-                self.value_text.remove()
-            
-            # Plota nova linha com limites exatos
-            self.line, = self.ax.plot(self.timestamps, self.values, '-', color='blue', zorder=3)
-            
-            # Garante que a linha do zero permaneça visível
-            if self.zero_line not in self.ax.lines:
-                self.zero_line = self.ax.axhline(y=0, color='red', linestyle='-', linewidth=1.5, zorder=2)
-            
-            # Define limites exatos para o eixo X
-            if self.timestamps:
-                time_delta = (self.timestamps[-1] - self.timestamps[0]) * 0.0001  # Margem mínima
-                self.ax.set_xlim(
-                    self.timestamps[0] - time_delta,  # Pequeno ajuste para tocar borda esquerda
-                    self.timestamps[-1] + time_delta   # Pequeno ajuste para tocar borda direita
-                )
-            
-            # Adiciona texto do valor atual
-            if self.values:
-                current_value = self.values[-1]
-                self.value_text = self.ax.text(
-                    1.02, current_value,
-                    f'{current_value/1e9:.1f}B',
-                    transform=self.ax.get_yaxis_transform(),
-                    bbox=dict(
-                        boxstyle='round,pad=0.5',
-                        fc='white',
-                        ec='gray',
-                        alpha=1
-                    ),
-                    verticalalignment='center',
-                    horizontalalignment='left',
-                    zorder=5
-                )
-            
-            # Ajusta limites Y sem alterar os limites X já definidos
-            if self.values:
-                ymin, ymax = min(self.values), max(self.values)
-                margin = (ymax - ymin) * 0.1 if ymax != ymin else abs(ymax) * 0.1
-                self.ax.set_ylim(min(ymin - margin, 0), max(ymax + margin, 0))
-
-            # Atualiza o canvas
-            if self.winfo_exists():
+            current_value = self.values[-1]
+            self.value_text.set_position((1.02, current_value))
+            self.value_text.set_text(self.format_value(current_value))
+            self.value_text.set_visible(not np.isnan(current_value))
+
+            full = self.background is None
+            first, last = float(x[0]), float(x[-1])
+            if self._x_limits_stale(first, last):
+                span = last - first
+                # Margem mínima à esquerda (toca a borda) e folga à direita para os próximos pontos
+                self.ax.set_xlim(first - span * 0.0001, last + max(span * X_HEADROOM, 1 / 86400))
+                full = True
+            # Métricas sem histórico (importadas) ficam NaN: lacunas na linha
+            if not np.isnan(self.values).all():
+                ymin, ymax = float(np.nanmin(self.values)), float(np.nanmax(self.values))
+                if self._y_limits_stale(ymin, ymax):
+                    self.ax.set_ylim(*self._y_limits(ymin, ymax))
+                    full = True
+
+            if not self.winfo_exists():
+                return
+            if full:
+                # Eixos mudaram: desenho completo (on_draw guarda o novo fundo)
                 self.canvas.draw()
+                self.full_draws += 1
+            else:
+                self.canvas.restore_region(self.background)
+                self.ax.draw_artist(self.line)
+                self.ax.draw_artist(self.value_text)
+                self.canvas.blit(self.figure.bbox)
+                self.blits += 1
 
         except Exception as e:
             self.logger.error(f"Erro ao atualizar gráfico: {e}", exc_info=True)
+        finally:
+            self._record_render(time.perf_counter() - started)
+
+    def _record_render(self, elapsed: float) -> None:
+        self.render_times.append(elapsed)
+        self.render_max = max(self.render_max, elapsed)
+        now = time.monotonic()
+        if now >= self.next_stats:
+            self.next_stats = now + STATS_INTERVAL
+            self.logger.info(self.render_summary())
+            self.render_times = []
+            self.render_max = 0.0
+            self.full_draws = 0
+            self.blits = 0
+
+    def render_summary(self) -> str:
+        """Tempo de renderização do painel desde o último log"""
+        times = self.render_times
+        average = sum(times) / len(times) * 1000 if times else 0.0
+        return (f"Gráfico {self.title}: {len(times)} atualizações ({self.blits} por blit, "
+                f"{self.full_draws} completas), média {average:.2f} ms / máx {self.render_max * 1000:.2f} ms")
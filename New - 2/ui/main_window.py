@@ -2,20 +2,37 @@ import tkinter as tk
 from tkinter import ttk
 from datetime import datetime
 import logging
+import time
+from events import BrokersChanged, ConnectionStateChanged, QueuedDispatcher, TotalsChanged
 from network import MarketConnection
+from persistence import PersistenceWorker
 from config import AppConfig
 from .chart_panel import ChartPanel
-from models import HistoricalData
+from broker_store import BrokerStore
+from models import AssetSnapshot, HistoricalData, MarketData, MetricRegistry, calcular_totais
+from pathlib import Path
 from utils.logger import setup_logger
 
 class MainWindow:
     def __init__(self, root: tk.Tk, market: MarketConnection, config: AppConfig):
         self.logger = setup_logger('ABDM.UI')
+        self.created = time.perf_counter()
+        self.first_chart_logged = False
         self.root = root
         self.market = market
         self.config = config
         self.root.title("Dados das Corretoras e Resultado")
-        self.historical_data = HistoricalData()
+        # Histórico e totais são mantidos para todos os ativos assinados
+        self.selected_asset = config.asset
+        self.registry = MetricRegistry(config.metrics)
+        self.histories = {}
+        self.recorded_values = {}  # Último ponto gravado por ativo, para ignorar repetições
+        self.broker_windows = {}  # (ativo, código) -> (janela, {campo: ChartPanel})
+        self.last_snapshot = None
+        self.ui_events = QueuedDispatcher(maxsize=1024, policy='merge')
+        # O histórico é gravado fora da thread do Tk
+        self.persistence = PersistenceWorker(config.persistence)
+        self.historical_data = self._history_for(self.selected_asset)
         self.charts = {}  # Inicializa o dicionário de gráficos
         self.root.state('zoomed')  # Inicia maximizado
         self.setup_ui()
@@ -47,23 +64,18 @@ class MainWindow:
         self.main_frame.grid(row=0, column=0, sticky='nsew')
         
         # Configura o frame principal para distribuir espaço igualmente
-        self.main_frame.grid_rowconfigure(0, weight=1)
-        self.main_frame.grid_rowconfigure(1, weight=1)
         self.main_frame.grid_columnconfigure(0, weight=1)
         self.main_frame.grid_columnconfigure(1, weight=1)
         
-        # Configura os gráficos usando grid com novos títulos
+        # Um gráfico por métrica com título na configuração, em grade de 2 colunas
         self.charts = {}
-        self.charts['market_maker'] = ChartPanel(self.main_frame, "Market Maker")
-        self.charts['corporativo'] = ChartPanel(self.main_frame, "Corporativo")
-        self.charts['provedor_liquidez_varejo'] = ChartPanel(self.main_frame, "Provedor de Liquidez - Varejo")
-        self.charts['exposicao_varejo'] = ChartPanel(self.main_frame, "Exposição Varejo")
-        
-        # Reorganiza os gráficos em grade 2x2
-        self.charts['market_maker'].grid(row=0, column=0, sticky='nsew')
-        self.charts['corporativo'].grid(row=1, column=0, sticky='nsew')
-        self.charts['provedor_liquidez_varejo'].grid(row=0, column=1, sticky='nsew')
-        self.charts['exposicao_varejo'].grid(row=1, column=1, sticky='nsew')
+        chart_metrics = [metric for metric in self.config.metrics.metrics if metric.chart]
+        columns = 2 if len(chart_metrics) > 1 else 1
+        for position, metric in enumerate(chart_metrics):
+            row, column = divmod(position, columns)
+            self.main_frame.grid_rowconfigure(row, weight=1)
+            self.charts[metric.key] = ChartPanel(self.main_frame, metric.chart)
+            self.charts[metric.key].grid(row=row, column=column, sticky='nsew')
 
         # Configura tela cheia
         self.root.bind('<F11>', self.toggle_fullscreen)
@@ -80,6 +92,19 @@ class MainWindow:
         self.table_window.minsize(800, 400)
 
     def setup_tables(self, tables_frame):
+        # Seletor do ativo exibido (todos continuam assinados na mesma conexão)
+        selector_frame = ttk.Frame(tables_frame)
+        selector_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(selector_frame, text="Ativo:").pack(side=tk.LEFT)
+        self.asset_selector = ttk.Combobox(
+            selector_frame, values=self.config.assets, state='readonly', width=12
+        )
+        self.asset_selector.set(self.selected_asset)
+        self.asset_selector.pack(side=tk.LEFT, padx=5)
+        self.asset_selector.bind('<<ComboboxSelected>>', self.on_asset_selected)
+        self.connection_label = ttk.Label(selector_frame, text="Conexão: -")
+        self.connection_label.pack(side=tk.RIGHT)
+
         # Criar painel principal
         self.main_panel = ttk.PanedWindow(tables_frame, orient=tk.VERTICAL)
         self.main_panel.pack(fill=tk.BOTH, expand=True)
@@ -102,6 +127,10 @@ class MainWindow:
         for col in columns:
             self.treeview.heading(col, text=col)
             self.treeview.column(col, width=100)  # Largura inicial das colunas
+        # Linhas sem dados novos desde a última queda de conexão
+        self.treeview.tag_configure('stale', foreground='gray')
+        # Duplo clique abre a evolução da corretora (histórico por corretora)
+        self.treeview.bind('<Double-1>', self.open_broker_history)
         
         # Adicionar scrollbars para a tabela de corretoras
         brokers_scroll_y = ttk.Scrollbar(brokers_frame, orient=tk.VERTICAL, command=self.treeview.yview)
@@ -139,161 +168,230 @@ class MainWindow:
         self.root.minsize(800, 600)
 
     def start_updates(self):
-        self.market.request_broker_balance(self.config.asset, self.config.period)
-        self.market.request_last_price(self.config.asset)
+        # Eventos vindos da thread de leitura são entregues na thread do Tk por update_data
+        events = self.market.events
+        events.subscribe(ConnectionStateChanged, self.on_connection_state, self.ui_events)
+        events.subscribe(BrokersChanged, self.on_brokers_changed, self.ui_events)
+        # Preço e totais juntos: uma entrega por ativo, a tabela é refeita uma vez por drain
+        events.subscribe(TotalsChanged, self.on_totals_changed, self.ui_events)
+        for asset in self.config.assets:
+            self.market.subscribe(asset, self.config.period)
+        # A leitura do socket roda em thread própria; a UI apenas renderiza
+        self.market.start_reader()
+        self.render_selected_asset()
         self.update_data()
 
+    def _history_for(self, asset: str) -> HistoricalData:
+        """Retorna o histórico de um ativo, carregando-o na primeira vez"""
+        if asset not in self.histories:
+            # Arquivos do formato anterior, importados para as partições na primeira vez
+            legacy_file = Path('historical_data.json') if asset == self.config.asset \
+                else Path(f'historical_data_{asset}.json')
+            history = self.config.history
+            self.histories[asset] = HistoricalData(asset=asset, directory=history.directory,
+                                                   capacity=history.capacity, keys=list(self.registry.keys),
+                                                   legacy_file=legacy_file, writer=self.persistence)
+        return self.histories[asset]
+
+    def on_asset_selected(self, event=None):
+        """Troca o ativo exibido sem reconectar"""
+        asset = self.asset_selector.get()
+        if asset == self.selected_asset:
+            return
+        self.logger.info(f"Ativo exibido alterado para {asset}")
+        self.selected_asset = asset
+        self.historical_data = self._history_for(asset)
+        self.render_selected_asset()
+
     def update_data(self):
-        """Atualiza os dados nas tabelas e gráficos"""
+        """Recebe o snapshot mais recente e entrega os eventos pendentes à UI"""
         try:
-            self.logger.debug("Iniciando atualização de dados")
-            self.market.process_data()
-            
-            if hasattr(self.market, 'new_data') and self.market.new_data:
-                self.logger.info("Novos dados recebidos, atualizando interface")
-                try:
-                    self.update_broker_table()
-                    self.update_result_table()
-                    self.market.new_data = False
-                    
-                    # Agenda a próxima atualização usando after
-                    self.root.after(0, self.root.update_idletasks)
-                except Exception as e:
-                    self.logger.error(f"Erro ao atualizar interface: {e}", exc_info=True)
-            
+            snapshot = self.market.get_snapshot()
+            if snapshot is not None:
+                # Guardado para redesenhar tudo ao trocar de ativo
+                self.last_snapshot = snapshot
+                if self.selected_asset in snapshot.changed:
+                    self.logger.info(
+                        f"Novos dados recebidos ({sum(snapshot.raw_updates.values())} "
+                        f"atualizações consolidadas), atualizando interface"
+                    )
+            # Cada tabela e gráfico só é redesenhado pelos eventos que o afetam
+            self.ui_events.drain()
         except Exception as e:
             self.logger.error(f"Erro na atualização: {e}", exc_info=True)
         finally:
             # Agenda a próxima atualização
             self.root.after(100, self.update_data)
 
-    def update_broker_table(self):
+    def on_connection_state(self, event: ConnectionStateChanged):
+        self.connection_label.config(text=f"Conexão: {event.state}")
+
+    def on_brokers_changed(self, event: BrokersChanged):
+        # As janelas por corretora continuam abertas para qualquer ativo, exibido ou não
+        self.update_broker_charts(event.codes, event.asset)
+        if event.asset != self.selected_asset:
+            return
+        self.update_broker_table(event.snapshot)
+
+    def on_totals_changed(self, event):
+        """Preço ou totais mudaram: histórico de qualquer ativo, tabela e gráficos do exibido"""
+        # O histórico de todos os ativos alterados é mantido, exibidos ou não
+        recorded = self.record_history(event.snapshot)
+        if event.asset != self.selected_asset:
+            return
+        self.update_result_table(event.snapshot)
+        if recorded:
+            self.update_charts()
+
+    def render_selected_asset(self):
+        """Redesenha tabelas e gráficos do ativo selecionado"""
+        self.root.title(f"Dados das Corretoras e Resultado - {self.selected_asset}")
+        asset_snapshot = None
+        if self.last_snapshot is not None:
+            asset_snapshot = self.last_snapshot.assets.get(self.selected_asset)
+        if asset_snapshot is None:
+            asset_snapshot = AssetSnapshot(self.selected_asset, BrokerStore(), MarketData())
+        self.update_broker_table(asset_snapshot)
+        self.update_result_table(asset_snapshot)
+        self.update_charts()
+        self.update_broker_charts()
+
+    def update_broker_table(self, snapshot: AssetSnapshot):
         """Atualiza a tabela de corretoras"""
         # Limpa a tabela
         for item in self.treeview.get_children():
             self.treeview.delete(item)
-        
+
         # Insere os dados atualizados
-        for broker_data in self.market.get_broker_data().values():
-            self.treeview.insert('', 'end', values=[
-                broker_data['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                broker_data['name'],
-                broker_data['volume'],
-                broker_data['avg_price'],
-                f"{int(broker_data['aggr_buy'])}",  # Removido .0
-                f"{int(broker_data['aggr_sell'])}",  # Removido .0
-                f"{int(broker_data['net_aggr'])}",  # Removido .0
-                broker_data['passive_net'],
-                f"{int(float(broker_data['gross_pl']))}"  # Convertido para inteiro
-            ])
-
-    def update_result_table(self):
+        for broker_data in snapshot.brokers:
+            self.treeview.insert('', 'end', iid=broker_data.code, values=broker_data.to_row(),
+                                 tags=('stale',) if broker_data.stale else ())
+
+    def record_history(self, snapshot: AssetSnapshot) -> bool:
+        """Acrescenta um ponto ao histórico do ativo com os totais do snapshot; retorna se gravou"""
+        market_data = snapshot.market_data
+        brokers = snapshot.brokers
+        totals = snapshot.totals or calcular_totais(brokers, self.registry)
+
+        # Adicionar dados ao histórico apenas se houver último preço e corretoras
+        if market_data.ultimo_preco is not None and len(brokers):
+            # Usa o timestamp do último dado recebido
+            latest_timestamp = datetime.fromtimestamp(brokers.latest_timestamp())
+            
+            values = {
+                key: self.calcular_financeiro(value, market_data.ultimo_preco)
+                for key, value in totals.items()
+            }
+            # Só grava quando algum valor mudou de fato
+            if values == self.recorded_values.get(snapshot.asset):
+                return False
+            self.recorded_values[snapshot.asset] = values
+            self._history_for(snapshot.asset).add_point(latest_timestamp, values)
+            return True
+        return False
+
+    def update_result_table(self, snapshot: AssetSnapshot):
         """Atualiza a tabela de resultados"""
         # Limpa a tabela
         for item in self.resultado_treeview.get_children():
             self.resultado_treeview.delete(item)
         
-        market_data = self.market.get_market_data()
-        brokers_data = self.market.get_broker_data()
-        
-        # Calcula totais
-        # Soma do passivo líquido de todas as corretoras
-        net_saldo_passivo_liquido = sum(float(data['passive_net']) for data in brokers_data.values())
-        
-        # Soma do passivo líquido das corretoras específicas
-        corretoras_varejo = ['GENIAL', 'CM CAPITAL', 'NOVA FUTURA', 'SAFRA', 
-                            'TORO', 'INTER', 'UBS', 'GUIDE', 'CLEAR', 'IDEAL', 
-                            'XP', 'BTG', 'AGORA']
-        
-        net_saldo_passivo_varejo = sum(float(data['passive_net']) 
-                                     for data in brokers_data.values() 
-                                     if data['name'] in corretoras_varejo)
-        
-        # Soma da agressão líquida das corretoras específicas para varejo agressivo
-        corretoras_agressivo = ['GENIAL', 'CM CAPITAL', 'NOVA FUTURA', 'SAFRA', 
-                               'TORO', 'INTER', 'CLEAR', 'XP', 'BTG', 'AGORA']
-        
-        net_saldo_agressivo_varejo = sum(float(data['net_aggr']) 
-                                       for data in brokers_data.values() 
-                                       if data['name'] in corretoras_agressivo)
-        
-        net_saldo_varejo_contratos = net_saldo_passivo_varejo + net_saldo_agressivo_varejo
+        market_data = snapshot.market_data
+        totals = snapshot.totals or calcular_totais(snapshot.brokers, self.registry)
         
         # Formata o último preço, tratando caso seja None
         ultimo_preco_str = f"{int(market_data.ultimo_preco)}" if market_data.ultimo_preco is not None else "N/A"
         
         # Insere resultados
         self.resultado_treeview.insert('', 'end', values=[
-            'Último preço WINJ25',
+            f'Último preço {snapshot.asset}',
             ultimo_preco_str,
             ''
         ])
         
         # Insere net/saldo apenas se houver último preço
         if market_data.ultimo_preco is not None:
-            self.resultado_treeview.insert('', 'end', values=[
-                'Net/Saldo passivo líquido',
-                f"{net_saldo_passivo_liquido:,.0f}",
-                f"{int(self.calcular_financeiro(net_saldo_passivo_liquido, market_data.ultimo_preco)):,}"
-            ])
-            self.resultado_treeview.insert('', 'end', values=[
-                'Net/Saldo passivo Varejo',
-                f"{net_saldo_passivo_varejo:,.0f}",
-                f"{int(self.calcular_financeiro(net_saldo_passivo_varejo, market_data.ultimo_preco)):,}"
-            ])
-            self.resultado_treeview.insert('', 'end', values=[
-                'Net/Saldo Agressivo Varejo',
-                f"{net_saldo_agressivo_varejo:,.0f}",
-                f"{int(self.calcular_financeiro(net_saldo_agressivo_varejo, market_data.ultimo_preco)):,}"
-            ])
-            self.resultado_treeview.insert('', 'end', values=[
-                'Net/Saldo Varejo',
-                f"{net_saldo_varejo_contratos:,.0f}",
-                f"{int(self.calcular_financeiro(net_saldo_varejo_contratos, market_data.ultimo_preco)):,}"
-            ])
-        
-        # Usa o timestamp do último dado recebido
-        latest_timestamp = max(d['timestamp'] for d in brokers_data.values())
-        
-        # Adicionar dados ao histórico apenas se houver último preço
-        if market_data.ultimo_preco is not None:
-            latest_timestamp = max(d['timestamp'] for d in brokers_data.values())
-            
-            self.historical_data.add_point(latest_timestamp, {
-                'passive_liquido': self.calcular_financeiro(net_saldo_passivo_liquido, market_data.ultimo_preco),
-                'passive_varejo': self.calcular_financeiro(net_saldo_passivo_varejo, market_data.ultimo_preco),
-                'aggressive_varejo': self.calcular_financeiro(net_saldo_agressivo_varejo, market_data.ultimo_preco),
-                'net_varejo': self.calcular_financeiro(net_saldo_varejo_contratos, market_data.ultimo_preco)
-            })
-            
-            # Atualizar gráficos imediatamente após adicionar dados
-            self.update_charts()
+            for metric in self.config.metrics.metrics:
+                value = totals.get(metric.key, 0)
+                self.resultado_treeview.insert('', 'end', values=[
+                    metric.label,
+                    f"{value:,.0f}",
+                    f"{int(self.calcular_financeiro(value, market_data.ultimo_preco)):,}"
+                ])
 
     def update_charts(self):
         """Atualiza os gráficos com dados históricos"""
         try:
-            # Define os dados financeiros para cada gráfico
-            chart_data_mapping = {
-                'market_maker': 'passive_liquido',
-                'provedor_liquidez_varejo': 'passive_varejo',
-                'corporativo': 'aggressive_varejo',
-                'exposicao_varejo': 'net_varejo'
-            }
-
-            for chart_name, data_key in chart_data_mapping.items():
-                chart = self.charts[chart_name]
-                data = getattr(self.historical_data, data_key, [])
-                if hasattr(self.historical_data, 'timestamps') and len(self.historical_data.timestamps) > 0:
-                    self.logger.debug(f"Atualizando gráfico {chart_name} com {len(data)} pontos")
-                    # Copia os dados para evitar problemas de concorrência
-                    timestamps = list(self.historical_data.timestamps)
-                    values = list(data)
-                    # Atualiza o gráfico com os dados correspondentes
-                    self._update_single_chart(chart, timestamps, values)
+            if len(self.historical_data) > 0:
+                # Views sem cópia (o histórico só é alterado na thread da UI), na
+                # camada mais grossa que ainda preenche a largura de cada gráfico,
+                # reduzidas a mínimo e máximo por pixel
+                windows = {}
+                for key, chart in self.charts.items():
+                    width = chart.plot_width()
+                    if width not in windows:
+                        windows[width] = self.historical_data.window(width)
+                    window = windows[width]
+                    self._update_single_chart(chart, *window.decimated(key, width))
+                if windows and not self.first_chart_logged:
+                    self.first_chart_logged = True
+                    self.logger.info(
+                        f"Primeiro gráfico em {(time.perf_counter() - self.created) * 1000:.0f} ms "
+                        f"desde a abertura da janela ({len(window)} pontos, camada {window.tier})"
+                    )
 
         except Exception as e:
             self.logger.error(f"Erro ao atualizar gráficos: {e}", exc_info=True)
 
+    def _broker_history(self, asset: str):
+        get_history = getattr(self.market, 'get_broker_history', None)
+        return get_history(asset) if get_history is not None else None
+
+    def open_broker_history(self, event=None):
+        """Abre uma janela com a evolução da corretora selecionada"""
+        code = self.treeview.focus()
+        if not code:
+            return
+        asset = self.selected_asset
+        history = self._broker_history(asset)
+        if history is None:
+            self.logger.info("Histórico por corretora desativado (AppConfig.broker_history)")
+            return
+        key = (asset, code)
+        if key in self.broker_windows:
+            self.broker_windows[key][0].lift()
+            return
+
+        name = self.treeview.set(code, 'Corretora')
+        window = tk.Toplevel(self.root)
+        window.title(f"{name} - {asset}")
+        window.grid_columnconfigure(0, weight=1)
+        charts = {}
+        for row, field_name in enumerate(history.field_names):
+            window.grid_rowconfigure(row, weight=1)
+            charts[field_name] = ChartPanel(window, f"{name} - {field_name}", scale=1, suffix='')
+            charts[field_name].grid(row=row, column=0, sticky='nsew')
+        window.protocol('WM_DELETE_WINDOW', lambda: self._close_broker_window(key))
+        self.broker_windows[key] = (window, charts)
+        self.update_broker_charts()
+
+    def _close_broker_window(self, key):
+        window, _ = self.broker_windows.pop(key)
+        window.destroy()
+
+    def update_broker_charts(self, codes=None, asset=None):
+        """Atualiza as janelas de corretoras abertas (só as do ativo e dos códigos informados, se houver)"""
+        for (window_asset, code), (window, charts) in self.broker_windows.items():
+            if asset is not None and window_asset != asset:
+                continue
+            history = self._broker_history(window_asset)
+            if history is None or (codes is not None and code not in codes):
+                continue
+            for field_name, chart in charts.items():
+                timestamps, values = history.last(code, field_name, history.capacity)
+                if timestamps:
+                    self._update_single_chart(chart, timestamps, values)
+
     def _update_single_chart(self, chart, timestamps, values):
         """Função auxiliar para atualizar um único gráfico"""
         try:
@@ -301,6 +399,15 @@ class MainWindow:
         except Exception as e:
             self.logger.error(f"Erro ao atualizar gráfico individual: {e}", exc_info=True)
 
+    def close(self):
+        """Grava os pontos pendentes e fecha os históricos abertos"""
+        if not self.persistence.close():
+            # A thread ainda pode escrever nos segmentos: fechá-los agora perderia os pontos
+            self.logger.error("Históricos não fechados: gravação em segundo plano não terminou")
+            return
+        for history in self.histories.values():
+            history.close()
+
     def calcular_financeiro(self, net_saldo, ultimo_preco):
         """Calcula o valor financeiro"""
         if ultimo_preco is not None and net_saldo is not None:
@@ -0,0 +1,42 @@
+from typing import Dict, List
+
+
+class FlushStats:
+    """Contadores e latência dos lotes de um gravador em segundo plano (PersistenceWorker, TickStore)"""
+
+    def __init__(self):
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.latencies: List[float] = []  # Segundos dos lotes desde o último log
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+
+    def record(self, written: int, latency: float) -> None:
+        self.written += written
+        self.batches += 1
+        self.latency_last = latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latencies.append(latency)
+
+    def as_dict(self, queue_depth: int) -> Dict[str, float]:
+        latencies = self.latencies
+        return {
+            'queue_depth': queue_depth,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'flush_ms_last': self.latency_last * 1000,
+            'flush_ms_avg': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'flush_ms_max': self.latency_max * 1000,
+        }
+
+    def log(self, logger, name: str, unit: str, queue_depth: int) -> None:
+        """Registra o resumo e reinicia a média de latência do período"""
+        stats = self.as_dict(queue_depth)
+        logger.info(
+            f"{name}: fila {stats['queue_depth']}, {stats['written']} {unit} gravados "
+            f"em {stats['batches']} lotes, {stats['dropped']} descartados, flush "
+            f"médio {stats['flush_ms_avg']:.2f} ms / máx {stats['flush_ms_max']:.2f} ms"
+        )
+        self.latencies = []